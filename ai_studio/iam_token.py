@@ -0,0 +1,172 @@
+import asyncio
+import json
+import re
+import time
+from datetime import datetime
+from typing import Optional
+
+from utils.http_client import endpoint_timeout, get_http_session
+
+IAM_URL = "https://iam.api.cloud.yandex.net/iam/v1/tokens"
+
+
+def _parse_expires_at(value: str) -> float:
+    """expiresAt из ответа IAM (RFC 3339, до наносекунд) -> unix time"""
+    match = re.fullmatch(r"(.+?)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)", value.strip())
+    if match is None:
+        raise ValueError(f"Некорректный expiresAt: {value}")
+    head, fraction, zone = match.groups()
+    # fromisoformat понимает не больше 6 знаков дробной части
+    fraction = (fraction or "")[:6].ljust(6, "0")
+    zone = "+00:00" if zone == "Z" else zone
+    return datetime.fromisoformat(f"{head}.{fraction}{zone}").timestamp()
+
+
+class IamTokenProvider:
+    """
+    IAM токен Yandex Cloud с отслеживанием срока жизни
+
+    Токен хранится в памяти вместе с expiresAt и заранее (за refresh_margin
+    секунд до истечения) обновляется фоновой задачей по OAuth токену.
+    Фоновая задача запускается после первого полученного токена (или сразу,
+    если есть начальный токен с неизвестным сроком) и спит не меньше
+    retry_interval, даже если refresh_margin больше срока жизни токена.
+    get_token() на горячем пути не делает запросов; обновление - под одним
+    замком, одновременные вызовы ждут один общий запрос к IAM.
+    """
+
+    def __init__(
+        self,
+        oauth_token: Optional[str] = None,
+        iam_token: Optional[str] = None,
+        refresh_margin: float = 3600.0,
+        retry_interval: float = 30.0
+    ):
+        """
+        Args:
+            oauth_token: OAuth токен для получения IAM (None - только статичный iam_token)
+            iam_token: Начальный IAM токен (например, из IAM_TOKEN), срок жизни неизвестен
+            refresh_margin: За сколько секунд до истечения обновлять токен
+            retry_interval: Пауза перед повтором после неудачного обновления
+        """
+        self.oauth_token = oauth_token
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+
+        self._token = iam_token
+        self._expires_at: Optional[float] = None  # None - срок неизвестен
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        # Счетчики
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.forced_refreshes = 0
+
+    def _is_fresh(self) -> bool:
+        if self._token is None:
+            return False
+        if self._expires_at is None:
+            return True
+        return time.time() < self._expires_at - 60
+
+    async def get_token(self) -> str:
+        """Текущий токен; запрос к IAM только если токена нет или он истек"""
+        if self._is_fresh():
+            self._ensure_background_refresh()
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self, stale_token: Optional[str] = None) -> str:
+        """
+        Обновить токен (одновременные вызовы делят один запрос)
+
+        Args:
+            stale_token: Токен, который отверг сервер (401). Если его уже
+                заменили, новый запрос к IAM не делается.
+        """
+        if self.oauth_token is None:
+            if self._token is None:
+                raise ValueError("IAM_TOKEN или OAUTH_TOKEN должны быть заданы в переменных окружения")
+            return self._token
+
+        async with self._lock:
+            if stale_token is not None:
+                if self._token != stale_token:
+                    return self._token
+                self.forced_refreshes += 1
+            elif self._is_fresh() and self._expires_at is not None:
+                # Пока ждали замок, токен уже обновили
+                return self._token
+
+            try:
+                self._token, self._expires_at = await self._fetch()
+            except Exception:
+                self.refresh_errors += 1
+                raise
+            self.refreshes += 1
+            print(f"[IAM Token] Получен новый IAM токен, действует до {datetime.fromtimestamp(self._expires_at)}")
+            self._ensure_background_refresh()
+            return self._token
+
+    async def _fetch(self) -> tuple[str, float]:
+        """Запрос нового токена в IAM по OAuth токену"""
+        payload = json.dumps({"yandexPassportOauthToken": self.oauth_token})
+        session = get_http_session()
+        async with session.post(IAM_URL, data=payload, timeout=endpoint_timeout("iam")) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Ошибка получения IAM токена: {error_text}")
+            result = await response.json()
+
+        iam_token = result.get("iamToken")
+        if iam_token is None:
+            raise ValueError("[IamTokenProvider] IAM токен не получен в ответе")
+        expires_at = result.get("expiresAt")
+        # Без expiresAt считаем по максимальному сроку жизни IAM токена - 12 часов
+        expires_at = _parse_expires_at(expires_at) if expires_at else time.time() + 12 * 3600
+        return iam_token, expires_at
+
+    def _ensure_background_refresh(self) -> None:
+        if self.oauth_token is not None and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Фоновое обновление токена до истечения срока"""
+        while True:
+            if self._expires_at is None:
+                # Срок начального токена неизвестен - сразу получаем свой
+                delay = 0.0
+            else:
+                # Не чаще раза в retry_interval, даже если refresh_margin больше срока жизни токена
+                delay = max(self.retry_interval, self._expires_at - self.refresh_margin - time.time())
+            await asyncio.sleep(delay)
+            try:
+                async with self._lock:
+                    self._token, self._expires_at = await self._fetch()
+                self.refreshes += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"[IAM Token] Ошибка фонового обновления: {e}")
+                await asyncio.sleep(self.retry_interval)
+
+    async def stop(self) -> None:
+        """Остановить фоновое обновление"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def stats(self) -> dict:
+        return {
+            "expires_in": None if self._expires_at is None else round(self._expires_at - time.time()),
+            "refreshes": self.refreshes,
+            "forced_refreshes": self.forced_refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
@@ -2,9 +2,17 @@ import os
 import aiohttp
 from pathlib import Path
 import asyncio
+import time
 from abc import ABC, abstractmethod
 import json
 
+from ai_studio.iam_token import IamTokenProvider
+from utils.http_client import close_http_session, endpoint_timeout, get_http_session
+from utils.ogg_opus import concat_ogg_opus
+from utils.rate_limit import AdaptiveTokenBucket
+from utils.retry import retry_with_backoff
+from utils.text_utils import split_text_for_tts
+
 
 class BaseSpeechService(ABC):
     @abstractmethod
@@ -17,37 +25,24 @@ class BaseSpeechService(ABC):
         """Преобразовать аудиофайл в текст"""
         pass
 
-async def _refresh_iam_token() -> str:
-    """
-    Обновляет IAM токен, используя OAUTH токен из переменных окружения.
-    Возвращает новый IAM токен и устанавливает его в переменную окружения.
-    """
-    oauth_token = os.environ.get('OAUTH_TOKEN')
-    if not oauth_token:
-        raise ValueError("OAUTH_TOKEN не найден в переменных окружения")
-
-    url = "https://iam.api.cloud.yandex.net/iam/v1/tokens"
-    payload = json.dumps({"yandexPassportOauthToken": oauth_token})
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, data=payload) as response:
-            if response.status != 200:
-                error_text = await response.text()
-                raise Exception(f"Ошибка получения IAM токена: {error_text}")
-            
-            result = await response.json()
+class SpeechKitHTTPError(Exception):
+    """Ошибочный HTTP-ответ SpeechKit"""
 
-            # print(f"[IAM Token][_refresh_iam_token] Получен IAM токен: {result=}")
-            iam_token = result.get("iamToken")
-            
-            if iam_token is None:
-                raise ValueError("[_refresh_iam_token] IAM токен не получен в ответе")
-            else:
-                print(f"[IAM Token][_refresh_iam_token] Успешно получен IAM токен: не покажу :DDD!")
+    def __init__(self, status: int, body: bytes, retry_after: str | None = None):
+        super().__init__(f"SpeechKit HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+
+    @property
+    def retryable(self) -> bool:
+        """Троттлинг или временная ошибка сервера - можно повторить"""
+        return self.status == 429 or self.status >= 500
 
-            # Устанавливаем новый токен в переменную окружения
-            os.environ['IAM_TOKEN'] = iam_token
-            return iam_token
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, SpeechKitHTTPError):
+        return e.retryable
+    return isinstance(e, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
 
 
 class YandexSpeechService(BaseSpeechService):
@@ -65,30 +60,109 @@ class YandexSpeechService(BaseSpeechService):
             raise ValueError("FOLDER_ID должен быть задан в переменных окружения")
         if not self.iam_token and not self.oauth_token:
             raise ValueError("IAM_TOKEN или OAUTH_TOKEN должны быть заданы в переменных окружения")
+
+        # IAM токен в памяти, обновляется в фоне до истечения срока
+        self.token_provider = IamTokenProvider(
+            oauth_token=self.oauth_token or None,
+            iam_token=self.iam_token or None,
+            refresh_margin=float(os.environ.get("IAM_REFRESH_MARGIN", "3600"))
+        )
+
+        # Длинный текст синтезируем кусками параллельно (лимит API - 5000 символов на запрос)
+        self.tts_chunk_max_chars = int(os.environ.get("TTS_CHUNK_MAX_CHARS", "500"))
+        self.tts_chunk_concurrency = int(os.environ.get("TTS_CHUNK_CONCURRENCY", "4"))
+
+        # Лимит запросов в секунду на каждый API (по квоте), подстраивается под 429/5xx
+        burst = float(os.environ.get("SPEECHKIT_BURST", "5"))
+        self.limiters = {
+            api: AdaptiveTokenBucket(
+                rate=quota,
+                capacity=burst,
+                min_rate=float(os.environ.get("SPEECHKIT_MIN_RATE", "1")),
+                increase_step=max(1.0, quota / 20)
+            )
+            for api, quota in (
+                ("tts", float(os.environ.get("SPEECHKIT_TTS_RATE", "40"))),
+                ("stt", float(os.environ.get("SPEECHKIT_STT_RATE", "40"))),
+            )
+        }
+        # Повторы при 429/5xx и сетевых ошибках (TTS и STT идемпотентны)
+        self.retries = int(os.environ.get("SPEECHKIT_RETRIES", "3"))
+        self.retry_base_delay = float(os.environ.get("SPEECHKIT_RETRY_BASE_DELAY", "0.2"))
+        self.retry_max_delay = float(os.environ.get("SPEECHKIT_RETRY_MAX_DELAY", "5"))
+        self.deadline = float(os.environ.get("SPEECHKIT_DEADLINE", "30"))
+        self.retried = 0
+
+    async def close(self) -> None:
+        """Остановить фоновое обновление IAM токена"""
+        await self.token_provider.stop()
     
-    async def _make_request(self, url: str, headers: dict, **kwargs) -> aiohttp.ClientResponse:
+    async def _post(self, url: str, token: str, timeout: aiohttp.ClientTimeout, **kwargs) -> tuple[int, bytes, str | None]:
+        """POST в SpeechKit: статус, тело и Retry-After"""
+        # Общая сессия процесса: соединение с SpeechKit переиспользуется между запросами
+        session = get_http_session()
+        async with session.post(url, headers={"Authorization": f"Bearer {token}"}, timeout=timeout, **kwargs) as response:
+            # Читаем тело ответа сразу
+            return response.status, await response.read(), response.headers.get("Retry-After")
+
+    async def _make_request(self, url: str, timeout: aiohttp.ClientTimeout, **kwargs) -> bytes:
         """Выполняет запрос с автоматическим обновлением токена при необходимости"""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, **kwargs) as response:
-                if response.status == 401:  # Unauthorized - токен истек
-                    print(f"[IAM Token] Токен истек, начинаем обновление...")
-                    self.iam_token = await _refresh_iam_token()
-                    print(f"[IAM Token] Токен успешно обновлен")
-                    headers["Authorization"] = f"Bearer {self.iam_token}"
-                    print(f"[IAM Token] Повторяем запрос с новым токеном")
-                    # Создаем новую сессию для повторного запроса
-                    async with aiohttp.ClientSession() as retry_session:
-                        async with retry_session.post(url, headers=headers, **kwargs) as retry_response:
-                            print(f"[IAM Token] Повторный запрос выполнен со статусом: {retry_response.status}")
-                            # Читаем тело ответа сразу
-                            content = await retry_response.read()
-                            return content
-                # Читаем тело ответа сразу
-                content = await response.read()
-                return content
+        token = await self.token_provider.get_token()
+        status, content, retry_after = await self._post(url, token, timeout, **kwargs)
 
-    async def text_to_speech(self, text: str, output_file: str = "output.ogg", voice: str = "alena", lang: str = "ru-RU") -> Path:
-        headers = {"Authorization": f"Bearer {self.iam_token}"}
+        if status == 401:
+            # Unauthorized - токен отозван или истек раньше срока (обычно его заранее обновляет провайдер)
+            print(f"[IAM Token] Токен отвергнут (401), обновляем...")
+            token = await self.token_provider.refresh(stale_token=token)
+            print(f"[IAM Token] Повторяем запрос с новым токеном")
+            status, content, retry_after = await self._post(url, token, timeout, **kwargs)
+            print(f"[IAM Token] Повторный запрос выполнен со статусом: {status}")
+
+        if status >= 400:
+            raise SpeechKitHTTPError(status, content, retry_after)
+        return content
+
+    async def _call(self, api: str, url: str, **kwargs) -> bytes:
+        """Запрос к API (tts/stt) через лимитер, с повторами и общим дедлайном"""
+        limiter = self.limiters[api]
+        timeout = endpoint_timeout(api)
+
+        async def attempt() -> bytes:
+            await limiter.acquire()
+            try:
+                content = await self._make_request(url, timeout, **kwargs)
+            except SpeechKitHTTPError as e:
+                if e.retryable:
+                    limiter.on_throttle()
+                raise
+            limiter.on_success()
+            return content
+
+        def on_retry(e: Exception, delay: float) -> None:
+            self.retried += 1
+            print(f"[SpeechKit] {api}: {e}, повтор через {delay:.2f} с")
+
+        return await retry_with_backoff(
+            attempt,
+            is_retryable=_is_retryable,
+            retries=self.retries,
+            base_delay=self.retry_base_delay,
+            max_delay=self.retry_max_delay,
+            deadline=time.monotonic() + self.deadline,
+            retry_after=lambda e: getattr(e, "retry_after", None),
+            on_retry=on_retry
+        )
+
+    def stats(self) -> dict:
+        """Состояние лимитеров (скорость, очередь, ожидание) и число повторов"""
+        return {
+            "tts": self.limiters["tts"].stats(),
+            "stt": self.limiters["stt"].stats(),
+            "retried": self.retried,
+        }
+
+    async def _synthesize(self, text: str, voice: str, lang: str) -> bytes:
+        """Один запрос синтеза, ответ - Ogg Opus"""
         data = {
             "text": text,
             "lang": lang,
@@ -97,26 +171,43 @@ class YandexSpeechService(BaseSpeechService):
             "folderId": self.folder_id
         }
         
-        content = await self._make_request(self.TTS_URL, headers, data=data)
+        content = await self._call("tts", self.TTS_URL, data=data)
         if not content:  # Если контент пустой, значит была ошибка
             raise RuntimeError("TTS request failed: Empty response")
-            
+        return content
+
+    async def text_to_speech(self, text: str, output_file: str = "output.ogg", voice: str = "alena", lang: str = "ru-RU") -> Path:
+        content = await self.synthesize(text, voice=voice, lang=lang)
         output_path = Path(output_file)
         output_path.write_bytes(content)
         return output_path
 
+    async def synthesize(self, text: str, voice: str = "alena", lang: str = "ru-RU") -> bytes:
+        """Синтез речи в память (Ogg Opus), без записи на диск"""
+        chunks = split_text_for_tts(text, self.tts_chunk_max_chars)
+        if len(chunks) <= 1:
+            content = await self._synthesize(text, voice, lang)
+        else:
+            # Куски синтезируются параллельно (не больше tts_chunk_concurrency сразу)
+            # и склеиваются в один Ogg Opus поток по порядку, без перекодирования
+            semaphore = asyncio.Semaphore(self.tts_chunk_concurrency)
+
+            async def synthesize_chunk(chunk: str) -> bytes:
+                async with semaphore:
+                    return await self._synthesize(chunk, voice, lang)
+
+            parts = await asyncio.gather(*(synthesize_chunk(chunk) for chunk in chunks))
+            content = concat_ogg_opus(list(parts))
+        return content
+
     async def speech_to_text(self, audio_data: bytes) -> str:
         """Преобразование аудио в текст"""
-        headers = {
-            "Authorization": f"Bearer {self.iam_token}",
-        }
-        
         params = {
             "lang": "ru-RU",
             "folderId": self.folder_id
         }
         
-        content = await self._make_request(self.STT_URL, headers, params=params, data=audio_data)
+        content = await self._call("stt", self.STT_URL, params=params, data=audio_data)
         if not content:  # Если контент пустой, значит была ошибка
             raise Exception("STT error: Empty response")
             
@@ -137,4 +228,6 @@ if __name__ == "__main__":
         # STT пример (раскомментируй, если есть файл test.ogg)
         # recognized_text = await service.speech_to_text(Path("test.ogg"))
         # print(f"Распознанный текст: {recognized_text}")
+        await service.close()
+        await close_http_session()
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,29 @@
+"""index jokes.updated_at
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-05-06 12:00:00
+
+Дозагрузка изменившихся анекдотов в JokeService (updated_at > последнего).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_jokes_updated_at", "jokes", ["updated_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_jokes_updated_at", table_name="jokes")
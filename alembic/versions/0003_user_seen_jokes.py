@@ -0,0 +1,36 @@
+"""user_seen_jokes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-05-06 13:00:00
+
+Анекдоты, которые пользователь уже получил (SeenSet), для выдачи без повторов.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_seen_jokes",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("seen", sa.LargeBinary(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.telegram_id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("user_seen_jokes")
@@ -0,0 +1,90 @@
+"""jokes text_hash, minhash and joke_lsh_buckets
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-05-06 14:00:00
+
+Дедупликация при загрузке: точные дубли по text_hash, почти-дубли по MinHash + LSH.
+Уже загруженные анекдоты получают хэш, сигнатуру и корзины до уникального
+ограничения; из точных дублей хэш получает анекдот с меньшим id, у остальных
+остается NULL (как у анекдотов, загруженных до дедупликации).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.minhash import lsh_buckets, minhash_signature, signature_to_bytes
+from utils.text_utils import joke_text_hash
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 1000
+
+
+def _backfill() -> None:
+    """Посчитать text_hash, minhash и корзины LSH для уже загруженных анекдотов"""
+    if op.get_context().as_sql:
+        # alembic upgrade --sql: хэши считаются в Python, в SQL-скрипт их не выписать
+        return
+    bind = op.get_bind()
+    update = sa.text("UPDATE jokes SET text_hash = :text_hash, minhash = :minhash WHERE id = :id")
+    insert_buckets = sa.text(
+        "INSERT INTO joke_lsh_buckets (bucket, joke_id) VALUES (:bucket, :joke_id) ON CONFLICT DO NOTHING"
+    )
+    seen_hashes = set()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text("SELECT id, text FROM jokes WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BACKFILL_BATCH},
+        ).all()
+        if not rows:
+            break
+        updates = []
+        buckets = []
+        for joke_id, text in rows:
+            text_hash = joke_text_hash(text)
+            if text_hash in seen_hashes:
+                # Точный дубль более раннего анекдота - без хэша и в LSH не попадает
+                continue
+            seen_hashes.add(text_hash)
+            signature = minhash_signature(text)
+            updates.append({"id": joke_id, "text_hash": text_hash, "minhash": signature_to_bytes(signature)})
+            buckets.extend({"bucket": bucket, "joke_id": joke_id} for bucket in lsh_buckets(signature))
+        if updates:
+            bind.execute(update, updates)
+        if buckets:
+            bind.execute(insert_buckets, buckets)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("jokes", sa.Column("text_hash", sa.String(length=64), nullable=True))
+    op.add_column("jokes", sa.Column("minhash", sa.LargeBinary(), nullable=True))
+    op.create_table(
+        "joke_lsh_buckets",
+        sa.Column("bucket", sa.BigInteger(), nullable=False),
+        sa.Column("joke_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["joke_id"], ["jokes.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("bucket", "joke_id"),
+    )
+    op.create_index("ix_joke_lsh_buckets_joke_id", "joke_lsh_buckets", ["joke_id"])
+    _backfill()
+    # Имя как у ограничения, которое Postgres создает для unique=True
+    op.create_unique_constraint("jokes_text_hash_key", "jokes", ["text_hash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("jokes_text_hash_key", "jokes", type_="unique")
+    op.drop_index("ix_joke_lsh_buckets_joke_id", table_name="joke_lsh_buckets")
+    op.drop_table("joke_lsh_buckets")
+    op.drop_column("jokes", "minhash")
+    op.drop_column("jokes", "text_hash")
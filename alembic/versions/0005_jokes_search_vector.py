@@ -0,0 +1,41 @@
+"""jokes.search_vector with GIN index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-05-06 15:00:00
+
+Полнотекстовый поиск /joke_search. Колонка генерируемая (STORED):
+Postgres заполняет ее для существующих строк при добавлении.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "jokes",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('russian', text)", persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_jokes_search_vector", "jokes", ["search_vector"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_jokes_search_vector", table_name="jokes")
+    op.drop_column("jokes", "search_vector")
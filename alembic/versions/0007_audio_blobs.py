@@ -0,0 +1,37 @@
+"""audio_blobs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-05-06 17:00:00
+
+Хранилище аудио между воркером и ботом (TTS_IN_MEMORY=1, AUDIO_BLOB_STORE=postgres).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "audio_blobs",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_audio_blobs_created_at", "audio_blobs", ["created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_audio_blobs_created_at", table_name="audio_blobs")
+    op.drop_table("audio_blobs")
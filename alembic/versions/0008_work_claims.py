@@ -0,0 +1,35 @@
+"""work_claims
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-05-07 12:00:00
+
+Короткие заявки на работу между воркерами (схлопывание TTS) вместо
+pg_advisory_xact_lock, который держал соединение на все время синтеза.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "work_claims",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("work_claims")
@@ -1,4 +1,5 @@
 import os
+import json
 import logging
 import asyncio
 import sys
@@ -10,7 +11,8 @@ from aiogram import Bot, Dispatcher, types, F, Router
 from aiogram.filters import CommandStart, Command
 from aiogram.types import BotCommand, BotCommandScopeDefault
 
-from db.database import Database
+from db.database import Database, db_stats
+from db.engine import dispose_engines
 from services.bot_service import BotService
 from services.client_rabbitmq_service import ClientRabbitMQService
 from services.billing_service import BillingService
@@ -20,7 +22,9 @@ from models.balance import Balance
 from models.task import Task
 
 from middleware import UserRegistrationMiddleware, BalanceMiddleware
-from routers.joke_router import joke_router, setup_joke_router
+from routers.joke_router import (
+    ASYNC_RESULT_DELIVERY, deliver_task_result, joke_router, joke_router_stats, setup_joke_router, stop_joke_router
+)
 from routers.balance_router import balance_router, setup_balance_router
 
 # Настройка логирования
@@ -40,6 +44,9 @@ client_rabbitmq_service = ClientRabbitMQService()
 bot_service = BotService(bot)
 billing_service = BillingService()
 
+# Как часто писать счетчики бота в лог (BOT_STATS), секунды; 0 - не писать
+BOT_STATS_INTERVAL = float(os.environ.get("BOT_STATS_INTERVAL", "60"))
+
 # Создаем роутеры для организации обработчиков
 main_router = Router()
 message_router = Router()
@@ -53,6 +60,7 @@ balance_router.message.middleware(UserRegistrationMiddleware(db))
 # Регистрируем middleware для callback-запросов
 # balance_router.callback_query.middleware(BalanceMiddleware(db))
 balance_router.callback_query.middleware(UserRegistrationMiddleware(db))
+joke_router.callback_query.middleware(UserRegistrationMiddleware(db))
 
 # Инициализируем роутеры со всеми зависимостями
 setup_joke_router(
@@ -72,7 +80,8 @@ async def command_start_handler(message: types.Message) -> Any:
         f"👋 Привет, {message.from_user.full_name}!\n\n"
         f"Я бот для работы с текстом и голосом. Вот что я умею:\n\n"
         f"🎭 /joke - расскажу случайный анекдот\n"
-        f"🎙️ /joke_voice - расскажу анекдот голосом\n\n"
+        f"🎙️ /joke_voice - расскажу анекдот голосом\n"
+        f"🔎 /joke_search - найду анекдот по словам\n\n"
         f"💰 /balance - покажу твой текущий баланс\n"
         f"❓ /help - подробная справка по командам\n\n"
         f"Начни с команды /joke, чтобы получить свой первый анекдот! 😊"
@@ -93,7 +102,8 @@ async def help_command(message: types.Message) -> None:
         "❓ /help - Показать эту справку\n\n"
         "🎭 <b>Анекдоты:</b>\n"
         "   /joke - Расскажу случайный анекдот\n"
-        "   /joke_voice - Расскажу анекдот голосом\n\n"
+        "   /joke_voice - Расскажу анекдот голосом\n"
+        "   /joke_search &lt;слова&gt; - Найду анекдоты по словам\n\n"
         "💰 <b>Баланс:</b>\n"
         "   /balance - Покажу твой текущий баланс\n\n"
         "💡 <b>Совет:</b> Начни с команды /joke, чтобы получить свой первый анекдот!\n\n"
@@ -110,9 +120,16 @@ async def set_bot_commands() -> None:
         BotCommand(command="balance", description="Показать баланс"),
         BotCommand(command="joke", description="Получить случайный анекдот"),
         BotCommand(command="joke_voice", description="Получить озвученный анекдот"),
+        BotCommand(command="joke_search", description="Найти анекдот по словам"),
     ]
     await bot.set_my_commands(commands)
 
+async def report_stats() -> None:
+    """Периодически пишет в лог счетчики бота"""
+    while True:
+        await asyncio.sleep(BOT_STATS_INTERVAL)
+        await db.log(SYSTEM_USER_ID, "BOT_STATS", json.dumps({**db_stats(), **joke_router_stats()}))
+
 async def main() -> None:
     """Точка входа в приложение"""
     logger.info("Starting bot...")
@@ -144,9 +161,23 @@ async def main() -> None:
         )
     await asyncio.gather(*(notify_admin(admin) for admin in admins))
     
+    # Результаты /joke_voice без ожидания воркера приходят в свою очередь
+    if ASYNC_RESULT_DELIVERY:
+        await client_rabbitmq_service.consume_results(deliver_task_result)
+    
     # Запускаем поллинг
     logger.info("Starting polling...")
-    await dp.start_polling(bot)
+    stats_task = asyncio.create_task(report_stats()) if BOT_STATS_INTERVAL > 0 else None
+    try:
+        await dp.start_polling(bot)
+    finally:
+        if stats_task is not None:
+            stats_task.cancel()
+        await stop_joke_router()
+        await client_rabbitmq_service.close()
+        # Дописываем буферизованные логи перед выходом
+        await db.close()
+        await dispose_engines()
 
 if __name__ == "__main__":
     # Запускаем бота
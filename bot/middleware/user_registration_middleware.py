@@ -3,6 +3,7 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import types, BaseMiddleware
 
 from db.database import Database
+from db.user_cache import user_cache
 from models.user import User
 from models.balance import Balance
 
@@ -31,20 +32,26 @@ class UserRegistrationMiddleware(BaseMiddleware):
         user_id = event.from_user.id
         username = event.from_user.username or event.from_user.full_name or str(user_id)
         
-        # Получаем или создаем пользователя
-        user: User = await self.db.get_user(user_id)
+        # Сначала смотрим в кэш, при промахе - один JOIN-запрос за пользователем и балансом
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            user, balance = cached
+        else:
+            user, balance = await self.db.get_user_with_balance(user_id)
+            
+            if not user:
+                logger.info(f"Creating new user: {user_id}, username: {username}")
+                user = await self.db.create_user(user_id, username)
+                await self.db.log(user_id, "USER_CREATED", f"User created: {username}", print_log=True)
+            
+            if balance is None:
+                # Этот метод создаст баланс, если его нет
+                balance = await self.db.get_balance_object(user_id)
+            
+            user_cache.put(user_id, user, balance)
         
-        if not user:
-            logger.info(f"Creating new user: {user_id}, username: {username}")
-            user = await self.db.create_user(user_id, username)
-            await self.db.log(user_id, "USER_CREATED", f"User created: {username}", print_log=True)
-        
-        # Добавляем пользователя в контекст для обработчиков
+        # Добавляем пользователя и баланс в контекст для обработчиков
         data["user"] = user
-        
-        # Получаем объект баланса через метод БД
-        # Этот метод создаст баланс, если его нет
-        balance: Balance = await self.db.get_balance_object(user_id)
         data["balance"] = balance
         
         # Безопасно получаем тип контента
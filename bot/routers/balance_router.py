@@ -69,10 +69,17 @@ async def topup_balance_callback(callback: types.CallbackQuery, user: User, bala
     #     return
     
     # Пополняем баланс на 5 токенов
-    new_balance = await billing_service._update_balance(user_id=user.telegram_id, amount=5)
+    new_balance = await billing_service._update_balance(
+        user_id=user.telegram_id,
+        amount=5,
+        reason="Пополнение баланса кнопкой"
+    )
+    if new_balance is None:
+        await callback.answer("Ошибка: баланс не найден.", show_alert=True)
+        return
     
     # Обновляем сообщение
-    last_updated = balance.updated_at.strftime("%Y-%m-%d %H:%M:%S")
+    last_updated = new_balance.updated_at.strftime("%Y-%m-%d %H:%M:%S")
     keyboard = get_balance_keyboard()
     
     await callback.message.edit_text(
@@ -1,18 +1,23 @@
 import logging
+import os
 import uuid
-from aiogram import Router, types
-from aiogram.filters import Command
+from collections import OrderedDict
+from aiogram import Router, types, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from models.user import User
 from models.task import Task
 from models.balance import Balance
 
 from services.joke_service import JokeService
-from services.ai_service import AIService
-from services.task_service import TaskService
+from services.joke_pool import JokePool
+from services.seen_jokes_service import SeenJokesService
+from models.joke import Joke
 from services.client_rabbitmq_service import ClientRabbitMQService
 from services.bot_service import BotService
 from services.billing_service import BillingService
 from db.database import Database
+from utils.text_utils import join_within_limit
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +28,23 @@ joke_router = Router()
 db: Database = None
 client_rabbitmq_service: ClientRabbitMQService = None
 joke_service: JokeService = None
+joke_pool: JokePool = None
+seen_jokes_service: SeenJokesService = None
 bot_service: BotService = None
 billing_service: BillingService = None
 
+# Сколько анекдотов показываем на странице поиска
+SEARCH_PAGE_SIZE = 3
+# Лимит длины текста сообщения в Telegram
+TELEGRAM_MESSAGE_MAX_CHARS = 4096
+# Последний поиск пользователя для кнопки "Ещё": user_id -> (запрос, курсор)
+search_state: OrderedDict[int, tuple[str, str]] = OrderedDict()
+SEARCH_STATE_MAX_USERS = 10000
+
+# /joke_voice без ожидания воркера: обработчик только ставит задачу,
+# голосовое и списание делает потребитель очереди результатов (deliver_task_result)
+ASYNC_RESULT_DELIVERY = os.environ.get("ASYNC_RESULT_DELIVERY", "0") == "1"
+
 def generate_task_id(user_id: int, message_id: int) -> str:
     """Генерирует уникальный идентификатор задачи в формате user_id_message_id_uuid"""
     return f"{user_id}_{message_id}_{uuid.uuid4()}"
@@ -37,12 +56,35 @@ def setup_joke_router(
     billing_service_instance: BillingService
 ):
     """Инициализация роутера со всеми необходимыми зависимостями"""
-    global db, client_rabbitmq_service, joke_service, bot_service, billing_service
+    global db, client_rabbitmq_service, joke_service, joke_pool, seen_jokes_service, bot_service, billing_service
     db = db_instance
     client_rabbitmq_service = client_rabbitmq_service_instance
     bot_service = bot_service_instance
     billing_service = billing_service_instance
     joke_service = JokeService(db)  # Создаем joke_service после инициализации db
+    joke_pool = JokePool(joke_service)  # Анекдоты берем из заранее заполненного пула
+    seen_jokes_service = SeenJokesService(db)
+
+def joke_router_stats() -> dict:
+    """Счетчики роутера для BOT_STATS (пул анекдотов)"""
+    return {"joke_pool": joke_pool.stats() if joke_pool is not None else None}
+
+async def stop_joke_router() -> None:
+    """Остановить фоновый долив пула анекдотов (при остановке бота)"""
+    if joke_pool is not None:
+        await joke_pool.stop()
+
+async def pick_joke_for_user(user_id: int) -> Joke | None:
+    """Случайный анекдот, который пользователь еще не получал"""
+    seen = await seen_jokes_service.get(user_id)
+    joke = await joke_pool.get_joke(seen=seen)
+    if joke is None and len(seen):
+        # Пользователь получил все анекдоты - начинаем круг заново
+        seen.clear()
+        joke = await joke_pool.get_joke(seen=seen)
+    if joke is not None:
+        await seen_jokes_service.mark_seen(user_id, joke.id)
+    return joke
 
 # ================================
 
@@ -56,7 +98,7 @@ async def joke_handler(message: types.Message, user: User, balance: Balance):
         await message.answer(str_report)
         return
 
-    joke = await joke_service.get_random_joke()
+    joke = await pick_joke_for_user(user.telegram_id)
     if not joke:
         await message.answer("Извините, у меня закончились анекдоты 😢")
         return
@@ -67,7 +109,7 @@ async def joke_handler(message: types.Message, user: User, balance: Balance):
     # достать текст любого анекдота будет стоит 1 токен
     task = await db.create_task(task_id=task_id, user_id=user.telegram_id, task_type="just_text_form_db", payload=joke.text, 
                                 cost=1) # hardcoded bad(
-    task, new_balance = await billing_service.charge_for_task(task_id=task_id)
+    await billing_service.charge_for_task(task_id=task_id, user_id=user.telegram_id, cost=task.cost)
 
     res = f"💰 Стоимость анекдота: {task.cost} токен\n{joke.text}"
     await message.answer(res)
@@ -86,7 +128,7 @@ async def joke_voice_handler(
         await message.answer(str_report)
         return
     
-    joke = await joke_service.get_random_joke()
+    joke = await pick_joke_for_user(user.telegram_id)
     if not joke:
         await message.answer("Извините, у меня закончились анекдоты 😢")
         return
@@ -94,6 +136,17 @@ async def joke_voice_handler(
     # Генерируем task_id
     task_id = generate_task_id(user.telegram_id, message.message_id)
     
+    if ASYNC_RESULT_DELIVERY:
+        # Только ставим задачу - результат придет в deliver_task_result
+        await client_rabbitmq_service.submit_task(
+            task_id=task_id,
+            user_id=user.telegram_id,
+            message_id=message.message_id,
+            text=joke.text
+        )
+        await message.answer("🎙️ Озвучиваю анекдот, голосовое придет через несколько секунд")
+        return
+
     # Отправляем в очередь
     result = await client_rabbitmq_service.process_message(
         task_id=task_id,
@@ -103,9 +156,99 @@ async def joke_voice_handler(
     )
 
     logger.info(f"[text_handler] Final result from user {user.telegram_id}: {result=}")
-    await bot_service.send_result_to_user(user.telegram_id, result)
+    await finish_joke_voice(user.telegram_id, task_id, joke.text, result)
+
+async def finish_joke_voice(user_id: int, task_id: str, joke_text: str, result: dict) -> None:
+    """
+    Отправить результат /joke_voice, списать токены и прислать текст анекдота
+
+    Успешный результат сначала помечается доставленным (COMPLETED -> DELIVERED):
+    повторно пришедший результат (очередь результатов доставляет хотя бы
+    один раз) не отправляется и не оплачивается второй раз. Если отправить
+    не получилось, отметка снимается, и результат можно доставить снова.
+    """
+    success = result["status"] == "success"
+    if success and not await db.claim_task_delivery(task_id):
+        logger.info(f"Result for task {task_id} already delivered, skipping")
+        return
+
+    try:
+        delivered = await bot_service.send_result_to_user(user_id, result)
+    except BaseException:
+        if success:
+            await db.release_task_delivery(task_id)
+        raise
+    if not success:
+        # Задача не выполнена (например, отменена по таймауту) - не списываем
+        return
+    if not delivered:
+        # Аудио потерялось - не списываем, задачу можно доставить повторно
+        await db.release_task_delivery(task_id)
+        return
     
-    task, new_balance = await billing_service.charge_for_task(task_id=task_id)
+    cost = result.get("cost") or 0
+    await billing_service.charge_for_task(task_id=task_id, user_id=user_id, cost=cost)
+
+    res = f"💰 Стоимость анекдота: {cost} токенов\n<tg-spoiler>{joke_text}</tg-spoiler>"
+    await bot_service.bot.send_message(user_id, res, parse_mode="HTML")
 
-    res = f"💰 Стоимость анекдота: {task.cost} токенов\n<tg-spoiler>{joke.text}</tg-spoiler>"
-    await message.answer(res, parse_mode="HTML") 
\ No newline at end of file
+async def deliver_task_result(result: dict) -> None:
+    """Результат задачи из очереди результатов (режим ASYNC_RESULT_DELIVERY)"""
+    task = await db.get_task(result["task_id"])
+    if task is None:
+        logger.warning(f"Result for unknown task {result['task_id']}")
+        return
+    logger.info(f"[deliver_task_result] Result for user {task.user_id}: {result=}")
+    # Пользователь и текст анекдота - из самой задачи
+    await finish_joke_voice(task.user_id, task.id, task.payload, result)
+
+# ================================
+
+def get_search_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура с кнопкой следующей страницы поиска"""
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="➡️ Ещё", callback_data="joke_search_more")
+    ]])
+
+async def send_search_page(message: types.Message, user: User, query: str, cursor: str | None = None) -> None:
+    """Найти страницу анекдотов и отправить пользователю (поиск бесплатный)"""
+    jokes, next_cursor = await joke_service.search(query, limit=SEARCH_PAGE_SIZE, cursor=cursor)
+    if not jokes:
+        await message.answer("Ничего не нашлось 🤷" if cursor is None else "Больше ничего не нашлось 🤷")
+        return
+
+    if next_cursor:
+        search_state[user.telegram_id] = (query, next_cursor)
+        search_state.move_to_end(user.telegram_id)
+        while len(search_state) > SEARCH_STATE_MAX_USERS:
+            search_state.popitem(last=False)
+    else:
+        search_state.pop(user.telegram_id, None)
+
+    # Длинные анекдоты обрезаем, чтобы страница уложилась в одно сообщение Telegram
+    res = join_within_limit([joke.text for joke in jokes], "\n\n———\n\n", TELEGRAM_MESSAGE_MAX_CHARS)
+    await message.answer(res, reply_markup=get_search_keyboard() if next_cursor else None)
+
+@joke_router.message(Command("joke_search"))
+async def joke_search_handler(message: types.Message, command: CommandObject, user: User):
+    """Обработчик команды /joke_search <запрос>"""
+    logger.info(f"Joke search command from user {user.telegram_id}")
+    
+    query = (command.args or "").strip()
+    if not query:
+        await message.answer("Напиши, что искать: /joke_search Штирлиц")
+        return
+    
+    await send_search_page(message, user, query)
+
+@joke_router.callback_query(F.data == "joke_search_more")
+async def joke_search_more_callback(callback: types.CallbackQuery, user: User):
+    """Обработчик кнопки следующей страницы поиска"""
+    state = search_state.get(user.telegram_id)
+    if state is None:
+        await callback.answer("Поиск устарел, повтори /joke_search", show_alert=True)
+        return
+    
+    query, cursor = state
+    await callback.answer()
+    await send_search_page(callback.message, user, query, cursor)
@@ -1,27 +1,58 @@
+import asyncio
 import os
-from datetime import datetime
-from typing import Optional, List
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional, List, Tuple, Union
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from models.user import User, SYSTEM_USER_ID, UserRole
 from models.balance import Balance, START_BALANCE
 from models.log import Log
+from models.transaction import Transaction
+from models.seen_joke import UserSeenJokes
+from models.telegram_file import TelegramFile
+from models.audio_blob import AudioBlob
+from models.work_claim import WorkClaim
 from models.task import Task, TaskStatusEnum
+from db.log_buffer import LogBuffer
+from db.engine import get_engine
+from db.user_cache import user_cache
+
+# Один буфер логов на процесс - его делят все экземпляры Database
+_log_buffer: Optional[LogBuffer] = None
+
+
+def _get_shared_log_buffer(session_factory: async_sessionmaker) -> LogBuffer:
+    """Получить (или создать) общий для процесса буфер логов"""
+    global _log_buffer
+    if _log_buffer is None:
+        _log_buffer = LogBuffer(
+            session_factory,
+            max_batch=int(os.environ.get("LOG_BUFFER_MAX_BATCH", "500")),
+            flush_interval=float(os.environ.get("LOG_BUFFER_FLUSH_INTERVAL", "1.0")),
+            max_size=int(os.environ.get("LOG_BUFFER_MAX_SIZE", "10000")),
+            overflow_policy=os.environ.get("LOG_BUFFER_OVERFLOW_POLICY", "drop_oldest")
+        )
+    return _log_buffer
+
+
+def db_stats() -> dict:
+    """Счетчики процесса для WORKER_STATS / BOT_STATS и /metrics: буфер логов, кэш пользователей"""
+    stats = {"user_cache": user_cache.stats()}
+    if _log_buffer is not None:
+        stats["log_buffer"] = _log_buffer.stats()
+    return stats
+
 
 class Database:
     def __init__(self):
-        # Создаем engine с пулом соединений
-        self.engine = create_async_engine(
-            os.environ["DATABASE_URL"],
-            echo=True,
-            pool_size=20,
-            max_overflow=10,
-            pool_timeout=30,
-            pool_pre_ping=True
-        )
+        # Engine с пулом соединений общий для всего процесса (см. db/engine.py)
+        self.engine = get_engine()
         
         # Создаем фабрику сессий
         self.async_session = async_sessionmaker(
@@ -31,6 +62,21 @@ class Database:
             autoflush=False
         )
 
+        # Буферизованная запись логов (включается через LOG_BUFFER_ENABLED=1)
+        self.log_buffer: Optional[LogBuffer] = None
+        if os.environ.get("LOG_BUFFER_ENABLED", "0") == "1":
+            self.log_buffer = _get_shared_log_buffer(self.async_session)
+
+    async def close(self) -> None:
+        """
+        Сбросить буфер логов (вызывать при остановке сервиса)
+
+        Буфер общий для процесса, поэтому закрывается для всех экземпляров:
+        дальнейшие log() других Database пишут в БД напрямую.
+        """
+        if self.log_buffer is not None:
+            await self.log_buffer.close()
+
     async def get_session(self) -> AsyncSession:
         """Получить новую сессию"""
         return self.async_session()
@@ -44,6 +90,28 @@ class Database:
             )
             return result.scalar_one_or_none()
 
+    async def get_user_with_balance(self, telegram_id: int) -> Tuple[Optional[User], Optional[Balance]]:
+        """Получить пользователя и его баланс одним запросом (LEFT JOIN)"""
+        async with await self.get_session() as session:
+            result = await session.execute(
+                select(User, Balance)
+                .outerjoin(Balance, Balance.user_id == User.telegram_id)
+                .where(User.telegram_id == telegram_id)
+            )
+            row = result.first()
+            if row is None:
+                return None, None
+            return row[0], row[1]
+
+    async def update_user_role(self, telegram_id: int, role: UserRole) -> None:
+        """Изменить роль пользователя"""
+        async with await self.get_session() as session:
+            await session.execute(
+                update(User).where(User.telegram_id == telegram_id).values(role=role)
+            )
+            await session.commit()
+        user_cache.invalidate(telegram_id)
+
     async def create_user(self, telegram_id: int, username: str, role: UserRole = UserRole.CHILL_BOY) -> User:
         """Создать нового пользователя"""
         async with await self.get_session() as session:
@@ -86,17 +154,81 @@ class Database:
             return balance
 
     async def update_balance(self, user_id: int, amount: int) -> None:
-        """Обновить баланс пользователя"""
+        """Обновить баланс пользователя (атомарно, без чтения в Python)"""
+        async with await self.get_session() as session:
+            await session.execute(
+                update(Balance)
+                .where(Balance.user_id == user_id)
+                .values(balance=Balance.balance + amount)
+            )
+            await session.commit()
+        user_cache.invalidate(user_id)
+
+    async def adjust_balance(
+        self,
+        user_id: int,
+        delta: int,
+        reason: str,
+        task_id: Optional[str] = None
+    ) -> Optional[Balance]:
+        """
+        Атомарно изменить баланс и записать транзакцию в одной БД-транзакции
+
+        Баланс меняется одним UPDATE ... RETURNING прямо в Postgres, поэтому
+        параллельные пополнения/списания не теряют обновления.
+
+        Args:
+            user_id: ID пользователя
+            delta: Сумма изменения (положительная - пополнение, отрицательная - списание)
+            reason: Причина изменения баланса
+            task_id: ID задачи, за которую списываются средства
+
+        Returns:
+            Balance: Обновленный баланс или None, если баланса нет
+        """
         async with await self.get_session() as session:
             result = await session.execute(
-                select(Balance).where(Balance.user_id == user_id)
+                update(Balance)
+                .where(Balance.user_id == user_id)
+                .values(
+                    balance=Balance.balance + delta,
+                    updated_at=func.timezone("utc", func.now())
+                )
+                .returning(Balance)
             )
-            if balance := result.scalar_one_or_none():
-                balance.balance += amount
-                await session.commit()
+            balance = result.scalar_one_or_none()
+            if balance is None:
+                await session.rollback()
+                return None
+
+            # Аудит пишем в той же транзакции, что и изменение баланса
+            session.add(Transaction(
+                user_id=user_id,
+                type="credit" if delta >= 0 else "debit",
+                amount=delta,
+                reason=reason,
+                task_id=task_id
+            ))
+            session.add(Log(
+                user_id=user_id,
+                action="BALANCE_UPDATE",
+                details=f"Amount: {delta}, Reason: {reason}, New balance: {balance.balance}"
+            ))
+            await session.commit()
+
+        # Кэш middleware сразу видит новый баланс
+        user_cache.update_balance(user_id, balance)
+        return balance
 
     async def log(self, user_id: Optional[int], action: str, details: Optional[str] = None, print_log: bool = False) -> None:
         """Логирование действий в БД"""
+        # Буфер общий на процесс: после close() в любом экземпляре Database пишем напрямую
+        if self.log_buffer is not None and not self.log_buffer.closed:
+            await self.log_buffer.put(user_id or SYSTEM_USER_ID, action, details)
+            if print_log:
+                print(f"[LOG] {action}: {details}", flush=True)
+            return
+
         async with await self.get_session() as session:
             log_entry = Log(
                 user_id=user_id or SYSTEM_USER_ID,
@@ -146,6 +278,69 @@ class Database:
                 return task
             return None
 
+    async def claim_task(self, task_id: str) -> bool:
+        """
+        Взять задачу в работу (PROCESSING)
+
+        Только из CREATED или PROCESSING (повторная доставка после падения воркера);
+        False - задача отменена, уже выполнена или не найдена.
+        """
+        async with await self.get_session() as session:
+            result = await session.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status.in_([TaskStatusEnum.CREATED, TaskStatusEnum.PROCESSING]))
+                .values(status=TaskStatusEnum.PROCESSING)
+                .returning(Task.id)
+            )
+            await session.commit()
+            return result.scalar_one_or_none() is not None
+
+    async def complete_task(self, task_id: str, result: Optional[str], cost: Optional[int]) -> bool:
+        """Завершить задачу (PROCESSING -> COMPLETED); False - ее успели отменить, результат не нужен"""
+        async with await self.get_session() as session:
+            query_result = await session.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status == TaskStatusEnum.PROCESSING)
+                .values(status=TaskStatusEnum.COMPLETED, result=result, cost=cost, finished_at=datetime.utcnow())
+                .returning(Task.id)
+            )
+            await session.commit()
+            return query_result.scalar_one_or_none() is not None
+
+    async def cancel_task(self, task_id: str) -> bool:
+        """Отменить задачу, если она еще не завершена; False - уже завершена или не найдена"""
+        async with await self.get_session() as session:
+            result = await session.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status.in_([TaskStatusEnum.CREATED, TaskStatusEnum.PROCESSING]))
+                .values(status=TaskStatusEnum.CANCELLED, finished_at=datetime.utcnow())
+                .returning(Task.id)
+            )
+            await session.commit()
+            return result.scalar_one_or_none() is not None
+
+    async def claim_task_delivery(self, task_id: str) -> bool:
+        """Отметить выполненную задачу доставленной (COMPLETED -> DELIVERED); False - уже доставлена или не выполнена"""
+        async with await self.get_session() as session:
+            result = await session.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status == TaskStatusEnum.COMPLETED)
+                .values(status=TaskStatusEnum.DELIVERED)
+                .returning(Task.id)
+            )
+            await session.commit()
+            return result.scalar_one_or_none() is not None
+
+    async def release_task_delivery(self, task_id: str) -> None:
+        """Снять отметку доставки (DELIVERED -> COMPLETED), если отправить результат не удалось"""
+        async with await self.get_session() as session:
+            await session.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status == TaskStatusEnum.DELIVERED)
+                .values(status=TaskStatusEnum.COMPLETED)
+            )
+            await session.commit()
+
     async def get_task(self, task_id: str) -> Optional[Task]:
         """Получить задачу по ID"""
         async with await self.get_session() as session:
@@ -174,6 +369,128 @@ class Database:
             return list(result.scalars().all())
     
 
+    async def get_seen_jokes(self, user_id: int) -> Optional[bytes]:
+        """Получить сериализованное множество просмотренных анекдотов"""
+        async with await self.get_session() as session:
+            result = await session.execute(
+                select(UserSeenJokes.seen).where(UserSeenJokes.user_id == user_id)
+            )
+            return result.scalar_one_or_none()
+
+    async def save_seen_jokes(self, user_id: int, seen: bytes) -> None:
+        """Сохранить множество просмотренных анекдотов (upsert)"""
+        async with await self.get_session() as session:
+            stmt = pg_insert(UserSeenJokes).values(user_id=user_id, seen=seen, updated_at=datetime.utcnow())
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[UserSeenJokes.user_id],
+                    set_={"seen": stmt.excluded.seen, "updated_at": stmt.excluded.updated_at}
+                )
+            )
+            await session.commit()
+
+    async def get_telegram_file_id(self, key: str) -> Optional[str]:
+        """Получить file_id ранее загруженного в Telegram файла"""
+        async with await self.get_session() as session:
+            result = await session.execute(
+                select(TelegramFile.file_id).where(TelegramFile.key == key)
+            )
+            return result.scalar_one_or_none()
+
+    async def save_telegram_file_id(self, key: str, file_id: str) -> None:
+        """Сохранить file_id загруженного в Telegram файла (upsert)"""
+        async with await self.get_session() as session:
+            stmt = pg_insert(TelegramFile).values(key=key, file_id=file_id, created_at=datetime.utcnow())
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[TelegramFile.key],
+                    set_={"file_id": stmt.excluded.file_id, "created_at": stmt.excluded.created_at}
+                )
+            )
+            await session.commit()
+
+    async def delete_telegram_file_id(self, key: str) -> None:
+        """Забыть file_id (Telegram его больше не принимает)"""
+        async with await self.get_session() as session:
+            await session.execute(delete(TelegramFile).where(TelegramFile.key == key))
+            await session.commit()
+
+    async def save_audio_blob(self, blob_id: str, data: Union[bytes, memoryview]) -> None:
+        """Сохранить аудио для передачи боту"""
+        async with await self.get_session() as session:
+            session.add(AudioBlob(id=blob_id, data=data))
+            await session.commit()
+
+    async def pop_audio_blob(self, blob_id: str) -> Optional[bytes]:
+        """Забрать аудио и сразу удалить (один запрос DELETE ... RETURNING)"""
+        async with await self.get_session() as session:
+            result = await session.execute(
+                delete(AudioBlob).where(AudioBlob.id == blob_id).returning(AudioBlob.data)
+            )
+            await session.commit()
+            return result.scalar_one_or_none()
+
+    async def delete_stale_audio_blobs(self, older_than: datetime) -> int:
+        """Удалить аудио, которые никто не забрал (бот упал или не дождался ответа)"""
+        async with await self.get_session() as session:
+            result = await session.execute(delete(AudioBlob).where(AudioBlob.created_at < older_than))
+            await session.commit()
+            return result.rowcount
+
+    async def try_claim(self, name: str, ttl: float) -> bool:
+        """
+        Взять заявку на работу по имени на ttl секунд
+
+        Заявка - строка в work_claims, соединение держится только на время
+        одного INSERT. Чужая протухшая заявка (процесс упал) перехватывается.
+        """
+        now = func.timezone("utc", func.now())
+        expires_at = now + timedelta(seconds=ttl)
+        async with await self.get_session() as session:
+            stmt = pg_insert(WorkClaim).values(name=name, expires_at=expires_at)
+            result = await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[WorkClaim.name],
+                    set_={"expires_at": stmt.excluded.expires_at},
+                    where=WorkClaim.expires_at < now
+                ).returning(WorkClaim.name)
+            )
+            await session.commit()
+            return result.scalar_one_or_none() is not None
+
+    async def release_claim(self, name: str) -> None:
+        """Отпустить заявку на работу"""
+        async with await self.get_session() as session:
+            await session.execute(delete(WorkClaim).where(WorkClaim.name == name))
+            await session.commit()
+
+    @asynccontextmanager
+    async def claim(
+        self,
+        name: str,
+        timeout: float = 30.0,
+        ttl: float = 60.0,
+        poll_interval: float = 0.2
+    ) -> AsyncIterator[bool]:
+        """
+        Межпроцессная заявка на работу по имени (см. try_claim)
+
+        Пока заявка занята другим процессом, опрашиваем ее раз в poll_interval,
+        не держа соединение из пула. Отдает True, если заявку взяли, и False,
+        если за timeout секунд она не освободилась (работу можно сделать
+        без заявки). Взятая заявка отпускается на выходе.
+        """
+        deadline = time.monotonic() + timeout
+        claimed = await self.try_claim(name, ttl)
+        while not claimed and time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+            claimed = await self.try_claim(name, ttl)
+        try:
+            yield claimed
+        finally:
+            if claimed:
+                await self.release_claim(name)
+
     async def ensure_system_user_exists(self) -> User:
         """Проверяет наличие системного пользователя и создает его при необходимости"""
         system_user = await self.get_user(SYSTEM_USER_ID)
@@ -0,0 +1,70 @@
+import os
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+# Общие для процесса engine: ключ - URL + настройки пула
+_engines: dict[tuple, AsyncEngine] = {}
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def engine_settings_from_env() -> dict:
+    """Настройки пула соединений из переменных окружения"""
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        "echo": _env_bool("DB_ECHO", False),
+        "statement_cache_size": int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100")),
+    }
+
+
+def get_engine(url: Optional[str] = None, **overrides) -> AsyncEngine:
+    """
+    Получить общий engine для URL и настроек пула
+
+    Все сервисы процесса (бот, биллинг, воркер и т.д.) получают один и тот же
+    engine, поэтому число соединений с Postgres ограничено одним пулом.
+
+    Args:
+        url: URL базы данных (по умолчанию DATABASE_URL)
+        **overrides: Переопределение настроек из engine_settings_from_env()
+
+    Returns:
+        AsyncEngine: Общий engine
+    """
+    url = url or os.environ["DATABASE_URL"]
+    settings = {**engine_settings_from_env(), **overrides}
+    key = (url, tuple(sorted(settings.items())))
+
+    engine = _engines.get(key)
+    if engine is None:
+        connect_args = {}
+        if url.startswith("postgresql+asyncpg"):
+            # Кэш подготовленных выражений asyncpg (0 - выключен, нужно для pgbouncer)
+            connect_args["statement_cache_size"] = settings["statement_cache_size"]
+
+        engine = create_async_engine(
+            url,
+            echo=settings["echo"],
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_pre_ping=True,
+            connect_args=connect_args
+        )
+        _engines[key] = engine
+    return engine
+
+
+async def dispose_engines() -> None:
+    """Закрыть все пулы соединений (вызывать при остановке процесса)"""
+    for engine in _engines.values():
+        await engine.dispose()
+    _engines.clear()
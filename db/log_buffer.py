@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models.log import Log
+
+logger = logging.getLogger(__name__)
+
+# Политики переполнения буфера
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # выкидываем самую старую запись
+OVERFLOW_DROP_NEW = "drop_new"  # выкидываем новую запись
+OVERFLOW_BLOCK = "block"  # ждем, пока фоновый сброс освободит место (backpressure)
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEW, OVERFLOW_BLOCK)
+
+
+class LogBuffer:
+    """
+    Write-behind буфер для таблицы logs
+
+    Записи копятся в памяти и сбрасываются в БД одним многострочным INSERT,
+    когда набирается max_batch записей, прошло flush_interval секунд
+    или вызван close().
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        max_batch: int = 500,
+        flush_interval: float = 1.0,
+        max_size: int = 10000,
+        overflow_policy: str = OVERFLOW_DROP_OLDEST
+    ):
+        """
+        Args:
+            session_factory: Фабрика сессий SQLAlchemy
+            max_batch: Максимальное число записей в одном INSERT
+            flush_interval: Максимальное время (сек) жизни записи в буфере
+            max_size: Максимальное число записей в памяти
+            overflow_policy: Что делать при переполнении (drop_oldest, drop_new, block)
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+
+        self._records: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # Счетчики
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _ensure_started(self) -> None:
+        """Запускает фоновый сброс при первой записи"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def put(self, user_id: int, action: str, details: Optional[str] = None) -> None:
+        """Положить запись лога в буфер"""
+        if self._closed:
+            raise RuntimeError("LogBuffer is closed")
+        self._ensure_started()
+
+        if len(self._records) >= self.max_size:
+            if self.overflow_policy == OVERFLOW_DROP_NEW:
+                self.dropped += 1
+                return
+            if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+                self._records.popleft()
+                self.dropped += 1
+            else:
+                # Backpressure: будим сброс и ждем свободного места
+                while len(self._records) >= self.max_size:
+                    self._space.clear()
+                    self._wakeup.set()
+                    await self._space.wait()
+
+        # Время фиксируем в момент события, а не в момент сброса
+        self._records.append({
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "created_at": datetime.utcnow()
+        })
+        if len(self._records) >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        """Фоновый цикл: сброс по размеру или по таймеру"""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Сбросить все накопленные записи в БД"""
+        async with self._flush_lock:
+            while self._records:
+                batch = [self._records.popleft() for _ in range(min(self.max_batch, len(self._records)))]
+                self._space.set()
+
+                started = time.perf_counter()
+                try:
+                    async with self.session_factory() as session:
+                        await session.execute(insert(Log), batch)
+                        await session.commit()
+                except Exception as e:
+                    # Повторно не ставим: при недоступной БД буфер иначе не ограничен
+                    self.failed_flushes += 1
+                    self.dropped += len(batch)
+                    logger.error(f"Failed to flush {len(batch)} log records: {e}")
+                    continue
+
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self.flushed += len(batch)
+                self.flush_count += 1
+                self.last_flush_ms = elapsed_ms
+                self.total_flush_ms += elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    async def close(self) -> None:
+        """Остановить фоновый сброс и записать остаток буфера"""
+        self._closed = True
+        if self._task is not None:
+            # Не отменяем задачу посреди INSERT - просто будим и ждем выхода из цикла
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Счетчики буфера"""
+        return {
+            "queued": len(self._records),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "batches": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.flush_count if self.flush_count else 0.0,
+        }
@@ -0,0 +1,96 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from models.user import User
+from models.balance import Balance
+
+
+class UserCache:
+    """
+    TTL + LRU кэш снимков пользователя и баланса по telegram_id
+
+    Используется в UserRegistrationMiddleware, чтобы не ходить в БД
+    на каждое сообщение. Все изменения баланса и роли в процессе идут
+    через Database, который обновляет или сбрасывает запись кэша.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        """
+        Args:
+            max_size: Максимальное число пользователей в кэше
+            ttl: Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[int, tuple[float, User, Balance]] = OrderedDict()
+
+        # Счетчики
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, telegram_id: int) -> Optional[tuple[User, Balance]]:
+        """Получить (пользователь, баланс) из кэша или None"""
+        item = self._items.get(telegram_id)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, user, balance = item
+        if expires_at < time.monotonic():
+            del self._items[telegram_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(telegram_id)
+        self.hits += 1
+        return user, balance
+
+    def put(self, telegram_id: int, user: User, balance: Balance) -> None:
+        """Положить снимок пользователя и баланса в кэш"""
+        if self.max_size <= 0:
+            return
+        self._items[telegram_id] = (time.monotonic() + self.ttl, user, balance)
+        self._items.move_to_end(telegram_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def update_balance(self, telegram_id: int, balance: Balance) -> None:
+        """Обновить баланс в кэше, если пользователь там есть"""
+        item = self._items.get(telegram_id)
+        if item is not None:
+            expires_at, user, _ = item
+            self._items[telegram_id] = (expires_at, user, balance)
+
+    def invalidate(self, telegram_id: int) -> None:
+        """Сбросить запись пользователя"""
+        if self._items.pop(telegram_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Сбросить весь кэш"""
+        self._items.clear()
+
+    def stats(self) -> dict:
+        """Счетчики кэша"""
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# Общий для процесса кэш
+user_cache = UserCache(
+    max_size=int(os.environ.get("USER_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.environ.get("USER_CACHE_TTL", "60"))
+)
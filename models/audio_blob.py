@@ -0,0 +1,12 @@
+from sqlalchemy import String, DateTime, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from .base import Base
+
+class AudioBlob(Base):
+    """Аудио, переданное от воркера боту через БД (одноразово: бот забирает и удаляет)"""
+    __tablename__ = "audio_blobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, LargeBinary, ForeignKey, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -8,5 +10,23 @@ class Joke(Base):
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
     category = Column(String(50), nullable=True)
+    # sha256 нормализованного текста - для дедупликации при загрузке
+    text_hash = Column(String(64), unique=True, nullable=True)
+    # MinHash сигнатура (utils/minhash.py) - для поиска почти-дублей
+    minhash = deferred(Column(LargeBinary, nullable=True))
+    # Полнотекстовый поиск: генерируемая колонка + GIN индекс (см. JokeService.search)
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('russian', text)", persisted=True)))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now()) 
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+
+    __table_args__ = (
+        Index("ix_jokes_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+
+class JokeLshBucket(Base):
+    """LSH-индекс по MinHash: корзина -> анекдоты с такой полосой сигнатуры"""
+    __tablename__ = "joke_lsh_buckets"
+
+    bucket = Column(BigInteger, primary_key=True)
+    joke_id = Column(Integer, ForeignKey("jokes.id", ondelete="CASCADE"), primary_key=True, index=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from .base import Base
+
+class UserSeenJokes(Base):
+    """Анекдоты, которые пользователь уже получил (сериализованный utils.seen_set.SeenSet)"""
+    __tablename__ = "user_seen_jokes"
+
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.telegram_id"), primary_key=True)
+    seen: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -12,6 +12,7 @@ class TaskStatusEnum(str, Enum):
     COMPLETED = "completed"
     ERROR = "error"
     CANCELLED = "cancelled"
+    DELIVERED = "delivered"  # результат отправлен пользователю и оплачен
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -8,5 +8,7 @@ class TaskTypeEnum(str, Enum):
 class RabbitMQQueueEnum(str, Enum):
     """Названия очередей RabbitMQ"""
     TASK_PROCESSING = "tasks"  # Очередь для задач на обработку (бот -> воркер)
+    TASK_RESULTS = "task_results"  # Результаты задач без ожидания ответа (воркер -> бот)
+    TASK_RESULTS_FAILED = "task_results_failed"  # Результаты, которые бот так и не смог обработать
     # Для ответов используются временные очереди, создаваемые клиентом с уникальными именами 
     
\ No newline at end of file
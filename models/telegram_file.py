@@ -0,0 +1,12 @@
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from .base import Base
+
+class TelegramFile(Base):
+    """Уже загруженные в Telegram файлы: ключ контента -> file_id для повторной отправки"""
+    __tablename__ = "telegram_files"
+
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    file_id: Mapped[str] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
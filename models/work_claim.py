@@ -0,0 +1,11 @@
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from .base import Base
+
+class WorkClaim(Base):
+    """Кто из процессов сейчас выполняет работу по ключу (например, озвучку текста); протухает по expires_at"""
+    __tablename__ = "work_claims"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
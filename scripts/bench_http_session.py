@@ -0,0 +1,90 @@
+"""
+Бенчмарк HTTP-клиента: новая aiohttp-сессия на запрос против общей сессии
+
+Поднимает локальный stub-сервер (aiohttp.web), который отвечает как TTS
+(POST -> ~20 КБ байт), и меряет задержку одного запроса:
+- как было: ClientSession() на каждый вызов (новое TCP-соединение)
+- как стало: общая сессия из utils/http_client.py (keep-alive, пул, кэш DNS)
+
+Сервер локальный и без TLS, поэтому выигрыш здесь - только TCP-рукопожатие
+и создание сессии; на реальном SpeechKit добавляются TLS и DNS.
+
+    PYTHONPATH=. python3 scripts/bench_http_session.py
+"""
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from utils.http_client import close_http_session, endpoint_timeout, get_http_session
+
+HOST = "localhost"
+PORT = 8765
+ITERATIONS = 500
+CONCURRENCY = 16
+PAYLOAD = b"\x00" * 20_000
+
+
+async def synthesize(request: web.Request) -> web.Response:
+    await request.read()
+    return web.Response(body=PAYLOAD, content_type="audio/ogg")
+
+
+async def call_new_session(url: str) -> bytes:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data={"text": "анекдот"}) as response:
+            return await response.read()
+
+
+async def call_shared_session(url: str) -> bytes:
+    session = get_http_session()
+    async with session.post(url, data={"text": "анекдот"}, timeout=endpoint_timeout("tts")) as response:
+        return await response.read()
+
+
+async def measure(name: str, call, url: str) -> None:
+    # Последовательно: задержка одного вызова
+    latencies = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        await call(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    # Параллельно: пропускная способность
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited():
+        async with semaphore:
+            await call(url)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(ITERATIONS)))
+    rps = ITERATIONS / (time.perf_counter() - started)
+
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {name:<24} p50 {p50:7.3f} ms   p99 {p99:7.3f} ms   {rps:8.0f} req/s (x{CONCURRENCY})")
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post("/tts", synthesize)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    url = f"http://{HOST}:{PORT}/tts"
+    print(f"{ITERATIONS} запросов к {url}")
+    try:
+        await measure("новая сессия на запрос", call_new_session, url)
+        await measure("общая сессия", call_shared_session, url)
+    finally:
+        await close_http_session()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Бенчмарк полнотекстового поиска анекдотов
+
+На таблицах 10k / 100k / 1M строк сравнивает:
+- ILIKE '%слово%' (полный проход по таблице)
+- tsvector + GIN индекс + keyset по (rank, id), как в JokeService.search
+
+Создает и удаляет временную таблицу bench_jokes, таблицу jokes не трогает.
+
+    set -a && source .env
+    PYTHONPATH=. python3 scripts/bench_joke_search.py
+"""
+import asyncio
+import os
+import random
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+SIZES = [10_000, 100_000, 1_000_000]
+ITERATIONS = 50
+PAGE_SIZE = 3
+
+WORDS = [
+    "штирлиц", "мюллер", "вовочка", "учительница", "теща", "зять", "доктор", "пациент",
+    "программист", "чукча", "поручик", "ржевский", "наташа", "бал", "муж", "жена",
+    "командировка", "медведь", "заяц", "волк", "лиса", "колобок", "студент", "экзамен",
+    "профессор", "гаишник", "водитель", "бабушка", "внук", "кот", "собака", "начальник",
+]
+QUERIES = ["штирлиц", "поручик ржевский", "теща зять", "программист", "медведь заяц"]
+
+
+async def measure(conn, name: str, search) -> None:
+    for query in QUERIES:
+        await search(conn, query)
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await search(conn, random.choice(QUERIES))
+    avg_ms = (time.perf_counter() - started) * 1000 / ITERATIONS
+    print(f"  {name:<28} {avg_ms:8.3f} ms")
+
+
+async def bench_size(conn, size: int) -> None:
+    await conn.execute(text("DROP TABLE IF EXISTS bench_jokes"))
+    await conn.execute(text(
+        "CREATE UNLOGGED TABLE bench_jokes ("
+        " id serial PRIMARY KEY,"
+        " text text NOT NULL,"
+        " search_vector tsvector GENERATED ALWAYS AS (to_tsvector('russian', text)) STORED)"
+    ))
+    # Каждый анекдот - 30 слов: ~2% из словаря запросов, остальное - "шум"
+    await conn.execute(text(
+        "INSERT INTO bench_jokes (text) "
+        "SELECT (SELECT string_agg(CASE WHEN random() < 0.02 "
+        "                               THEN (CAST(:words AS text[]))[1 + floor(random() * :n_words)::int] "
+        "                               ELSE 'слово' || floor(random() * 100000)::int END, ' ') "
+        "        FROM generate_series(1, 30) WHERE g > 0) "
+        "FROM generate_series(1, :n) g"
+    ), {"words": WORDS, "n_words": len(WORDS), "n": size})
+    await conn.execute(text("CREATE INDEX ON bench_jokes USING gin (search_vector)"))
+    await conn.execute(text("ANALYZE bench_jokes"))
+
+    async def ilike(conn, query):
+        pattern = f"%{query.split()[0]}%"
+        return (await conn.execute(text(
+            "SELECT id, text FROM bench_jokes WHERE text ILIKE :p ORDER BY id DESC LIMIT :limit"
+        ), {"p": pattern, "limit": PAGE_SIZE})).all()
+
+    async def fulltext(conn, query):
+        return (await conn.execute(text(
+            "SELECT id, text, ts_rank(search_vector, q) AS rank "
+            "FROM bench_jokes, websearch_to_tsquery('russian', :q) q "
+            "WHERE search_vector @@ q ORDER BY rank DESC, id DESC LIMIT :limit"
+        ), {"q": query, "limit": PAGE_SIZE + 1})).all()
+
+    print(f"\n{size} строк")
+    await measure(conn, "ILIKE", ilike)
+    await measure(conn, "tsvector + GIN", fulltext)
+
+    await conn.execute(text("DROP TABLE bench_jokes"))
+
+
+async def main():
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    async with engine.begin() as conn:
+        for size in SIZES:
+            await bench_size(conn, size)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Бенчмарк выбора случайного анекдота
+
+Сравнивает на таблицах 10k / 100k / 1M строк:
+- ORDER BY random() LIMIT 1 (старый способ)
+- TABLESAMPLE SYSTEM + повтор при пустой выборке
+- случайный id из массива в памяти + выборка по первичному ключу (JokeService)
+
+Создает и удаляет временную таблицу bench_jokes, таблицу jokes не трогает.
+
+    set -a && source .env
+    PYTHONPATH=. python3 scripts/bench_random_joke.py
+"""
+import asyncio
+import os
+import random
+import time
+from array import array
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+SIZES = [10_000, 100_000, 1_000_000]
+ITERATIONS = 200
+
+
+async def measure(conn, name: str, pick) -> None:
+    # Прогрев
+    for _ in range(10):
+        await pick(conn)
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await pick(conn)
+    avg_ms = (time.perf_counter() - started) * 1000 / ITERATIONS
+    print(f"  {name:<28} {avg_ms:8.3f} ms")
+
+
+async def bench_size(conn, size: int) -> None:
+    await conn.execute(text("DROP TABLE IF EXISTS bench_jokes"))
+    await conn.execute(text(
+        "CREATE UNLOGGED TABLE bench_jokes (id serial PRIMARY KEY, text text NOT NULL, category varchar(50))"
+    ))
+    await conn.execute(text(
+        "INSERT INTO bench_jokes (text, category) "
+        "SELECT md5(g::text) || repeat(' анекдот', 20), 'general' FROM generate_series(1, :n) g"
+    ), {"n": size})
+    await conn.execute(text("ANALYZE bench_jokes"))
+
+    async def order_by_random(conn):
+        return (await conn.execute(text("SELECT * FROM bench_jokes ORDER BY random() LIMIT 1"))).first()
+
+    async def tablesample(conn):
+        # Доля страниц ~ на 20 строк; при пустой выборке пробуем еще раз
+        percent = min(100.0, 2000.0 / size)
+        while True:
+            row = (await conn.execute(text(
+                f"SELECT * FROM bench_jokes TABLESAMPLE SYSTEM ({percent}) LIMIT 1"
+            ))).first()
+            if row is not None:
+                return row
+
+    ids = array("q", (row[0] for row in await conn.execute(text("SELECT id FROM bench_jokes ORDER BY id"))))
+
+    async def in_memory_ids(conn):
+        joke_id = ids[random.randrange(len(ids))]
+        return (await conn.execute(text("SELECT * FROM bench_jokes WHERE id = :id"), {"id": joke_id})).first()
+
+    print(f"\n{size} строк (id в памяти: {ids.itemsize * len(ids) / 1024:.0f} KiB)")
+    await measure(conn, "ORDER BY random()", order_by_random)
+    await measure(conn, "TABLESAMPLE SYSTEM", tablesample)
+    await measure(conn, "id из памяти + PK", in_memory_ids)
+
+    await conn.execute(text("DROP TABLE bench_jokes"))
+
+
+async def main():
+    engine = create_async_engine(os.environ["DATABASE_URL"])
+    async with engine.begin() as conn:
+        for size in SIZES:
+            await bench_size(conn, size)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
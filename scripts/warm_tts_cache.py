@@ -0,0 +1,164 @@
+"""
+Фоновая пред-озвучка анекдотов (прогрев кэша TTS)
+
+Идет по анекдотам в порядке приоритета - сначала самые востребованные
+(по числу задач с их текстом), затем новые - и отправляет их на озвучку
+через обычный путь воркера (RabbitMQ RPC -> TaskService -> кэш TTS).
+Уже озвученные анекдоты пропускаются без запроса. Прогресс сохраняется
+в чекпоинт, после перезапуска обход продолжается с того же места.
+
+    docker-compose exec bot python3 scripts/warm_tts_cache.py [--concurrency 4] [--rate 2] [--restart]
+"""
+import argparse
+import asyncio
+import json
+import os
+import uuid
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from db.database import Database
+from db.engine import dispose_engines
+from models.joke import Joke
+from models.task import Task
+from models.user import SYSTEM_USER_ID
+from services.tts_params import TTS_VOICE, TTS_LANG, TTS_FORMAT
+from services.client_rabbitmq_service import ClientRabbitMQService
+from utils.audio_cache import AudioCache, tts_cache_key
+from utils.rate_limit import TokenBucket
+
+CHECKPOINT_PATH = Path("data/warmup/checkpoint.json")
+CHUNK_SIZE = 50
+
+
+def load_checkpoint() -> dict:
+    if CHECKPOINT_PATH.exists():
+        return json.loads(CHECKPOINT_PATH.read_text(encoding="utf-8"))
+    return {"phase": "popular", "popular_offset": 0, "new_last_id": None}
+
+
+def save_checkpoint(checkpoint: dict) -> None:
+    CHECKPOINT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = CHECKPOINT_PATH.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(checkpoint), encoding="utf-8")
+    tmp_path.replace(CHECKPOINT_PATH)
+
+
+class Warmup:
+    def __init__(self, db: Database, concurrency: int, rate: float, audio_cache: AudioCache):
+        self.db = db
+        self.rabbitmq_service = ClientRabbitMQService()
+        self.audio_cache = audio_cache
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate, capacity=max(1.0, rate))
+        self.stats = {"synthesized": 0, "cached": 0, "errors": 0}
+
+    async def _warm_one(self, joke_id: int, text: str) -> None:
+        key = tts_cache_key(text, TTS_VOICE, TTS_LANG, TTS_FORMAT)
+        if await self.audio_cache.contains(key):
+            self.stats["cached"] += 1
+            return
+
+        async with self.semaphore:
+            # Бюджет запросов к API TTS
+            await self.bucket.acquire()
+            task_id = f"warmup_{joke_id}_{uuid.uuid4()}"
+            result = await self.rabbitmq_service.process_message(
+                task_id=task_id, user_id=SYSTEM_USER_ID, message_id=0, text=text
+            )
+        if result.get("status") == "success":
+            self.stats["synthesized"] += 1
+        else:
+            self.stats["errors"] += 1
+            print(f"Ошибка озвучки анекдота {joke_id}: {result.get('message')}")
+
+    async def _warm_chunk(self, jokes: list[tuple[int, str]]) -> None:
+        results = await asyncio.gather(
+            *(self._warm_one(joke_id, text) for joke_id, text in jokes), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                self.stats["errors"] += 1
+                print(f"Ошибка озвучки: {result}")
+
+    async def _popular_jokes(self) -> list[int]:
+        """id анекдотов по убыванию числа задач пользователей с их текстом"""
+        async with self.db.async_session() as session:
+            served = func.count(Task.id)
+            result = await session.execute(
+                select(Joke.id)
+                .join(Task, Task.payload == Joke.text)
+                # Задачи самого прогрева (от системного пользователя) популярность не считаем
+                .where(Task.user_id != SYSTEM_USER_ID)
+                .group_by(Joke.id)
+                .order_by(served.desc(), Joke.id.desc())
+            )
+            return list(result.scalars())
+
+    async def _load_texts(self, joke_ids: list[int]) -> list[tuple[int, str]]:
+        async with self.db.async_session() as session:
+            result = await session.execute(select(Joke.id, Joke.text).where(Joke.id.in_(joke_ids)))
+            texts = dict(result.all())
+        return [(joke_id, texts[joke_id]) for joke_id in joke_ids if joke_id in texts]
+
+    async def run(self, checkpoint: dict) -> None:
+        if checkpoint["phase"] == "popular":
+            popular = await self._popular_jokes()
+            offset = checkpoint["popular_offset"]
+            while offset < len(popular):
+                chunk = popular[offset:offset + CHUNK_SIZE]
+                await self._warm_chunk(await self._load_texts(chunk))
+                offset += len(chunk)
+                checkpoint["popular_offset"] = offset
+                save_checkpoint(checkpoint)
+                print(f"[popular] {offset}/{len(popular)} {self.stats}")
+            checkpoint["phase"] = "new"
+            save_checkpoint(checkpoint)
+
+        # Затем все остальные - от новых к старым (популярные уже в кэше и пропустятся)
+        while True:
+            async with self.db.async_session() as session:
+                stmt = select(Joke.id, Joke.text).order_by(Joke.id.desc()).limit(CHUNK_SIZE)
+                if checkpoint["new_last_id"] is not None:
+                    stmt = stmt.where(Joke.id < checkpoint["new_last_id"])
+                jokes = (await session.execute(stmt)).all()
+            if not jokes:
+                break
+            await self._warm_chunk([(joke_id, text) for joke_id, text in jokes])
+            checkpoint["new_last_id"] = jokes[-1][0]
+            save_checkpoint(checkpoint)
+            print(f"[new] id < {checkpoint['new_last_id']} {self.stats}")
+
+        checkpoint["phase"] = "done"
+        save_checkpoint(checkpoint)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Пред-озвучка анекдотов в кэш TTS")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("WARMUP_CONCURRENCY", "4")))
+    parser.add_argument("--rate", type=float, default=float(os.environ.get("WARMUP_RATE", "2")),
+                        help="запросов к TTS в секунду")
+    parser.add_argument("--restart", action="store_true", help="начать обход заново, игнорируя чекпоинт")
+    args = parser.parse_args()
+
+    checkpoint = load_checkpoint()
+    if args.restart or checkpoint["phase"] == "done":
+        checkpoint = {"phase": "popular", "popular_offset": 0, "new_last_id": None}
+
+    db = Database()
+    await db.ensure_system_user_exists()
+    audio_cache = AudioCache(
+        cache_dir=os.environ.get("TTS_CACHE_DIR", "/app/data/audio/cache"),
+        max_bytes=int(os.environ.get("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))
+    )
+    warmup = Warmup(db, args.concurrency, args.rate, audio_cache)
+    await warmup.run(checkpoint)
+    print(f"\nГотово: {warmup.stats}")
+    await warmup.rabbitmq_service.close()
+    await db.close()
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,17 @@
-from typing import Union, Tuple
+import asyncio
+import hashlib
+import os
+import shutil
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional, Union, Tuple
 from ai_studio.speech_service import YandexSpeechService
+from db.database import Database
+from utils.audio_cache import AudioCache, tts_cache_key
+from utils.single_flight import SingleFlight
 from utils.file_utils import FileManager
 from utils.storage import LocalStorage
+from services.tts_params import TTS_VOICE, TTS_LANG, TTS_FORMAT
 
 
 class AIService:
@@ -9,8 +19,34 @@ class AIService:
         self.speech_service = YandexSpeechService()
         self.file_manager = FileManager(LocalStorage())
 
+        # Кэш синтезированного аудио: одинаковый текст не озвучиваем повторно
+        self.audio_cache = None
+        if os.environ.get("TTS_CACHE_ENABLED", "1") == "1":
+            self.audio_cache = AudioCache(
+                cache_dir=os.environ.get("TTS_CACHE_DIR", "/app/data/audio/cache"),
+                max_bytes=int(os.environ.get("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))
+            )
+
+        # Одинаковые одновременные запросы к SpeechKit в пределах процесса схлопываются в один
+        self.tts_flight = SingleFlight()
+        self.stt_flight = SingleFlight()
+
+        # Между воркерами TTS схлопывается через заявку в Postgres (work_claims):
+        # второй воркер ждет, пока заявка освободится, и берет готовый файл из общего кэша.
+        # Соединение из пула на время синтеза не держится
+        self.db = None
+        self.cross_worker_wait_timeout = float(os.environ.get("TTS_SINGLE_FLIGHT_LOCK_TIMEOUT", "30"))
+        self.cross_worker_claim_ttl = float(os.environ.get("TTS_SINGLE_FLIGHT_CLAIM_TTL", "120"))
+        self.cross_worker_collapsed = 0
+        if self.audio_cache is not None and os.environ.get("TTS_SINGLE_FLIGHT_CROSS_WORKER", "0") == "1":
+            self.db = Database()
+
     async def text_to_speech(self, text: str, user_id: int, task_id: str) -> str:
         """Преобразование текста в речь"""
+        key = tts_cache_key(text, TTS_VOICE, TTS_LANG, TTS_FORMAT)
+        if self.audio_cache is not None:
+            return await self.tts_flight.do(key, lambda: self._cached_text_to_speech(key, text))
+
         # Получаем правильный путь через get_file_path
         audio_path = self.file_manager.storage.get_file_path(
             user_id=user_id,
@@ -21,17 +57,104 @@ class AIService:
         )
         
         # Используем существующий сервис для создания аудио
-        result_path = await self.speech_service.text_to_speech(text, output_file=audio_path)
+        result_path = await self.tts_flight.do(
+            key,
+            lambda: self.speech_service.text_to_speech(text, output_file=audio_path, voice=TTS_VOICE, lang=TTS_LANG)
+        )
+        if Path(result_path) != Path(audio_path):
+            # Запрос схлопнулся с чужим - копируем его результат в свой файл
+            await asyncio.to_thread(shutil.copyfile, result_path, audio_path)
         
         # Преобразуем Path в строку
-        return str(result_path)
+        return str(audio_path)
+
+    async def synthesize_audio(self, text: str) -> bytes:
+        """
+        Текст в речь в память (без временных файлов)
+
+        На диск пишется только постоянный кэш: при попадании аудио читается
+        из него, при промахе синтезируется в память и кладется в кэш.
+        """
+        key = tts_cache_key(text, TTS_VOICE, TTS_LANG, TTS_FORMAT)
+        return await self.tts_flight.do(("audio", key), lambda: self._synthesize_audio(key, text))
+
+    async def _synthesize_audio(self, key: str, text: str) -> bytes:
+        if self.audio_cache is None:
+            return await self.speech_service.synthesize(text, voice=TTS_VOICE, lang=TTS_LANG)
+
+        audio = await self._read_cached(key)
+        if audio is not None:
+            return audio
+
+        async with self._cross_worker_claim(key):
+            # Пока ждали заявку, другой воркер мог уже озвучить этот текст
+            if self.db is not None:
+                audio = await self._read_cached(key)
+                if audio is not None:
+                    self.cross_worker_collapsed += 1
+                    return audio
+            audio = await self.speech_service.synthesize(text, voice=TTS_VOICE, lang=TTS_LANG)
+            await self.audio_cache.put_bytes(key, audio)
+            return audio
+
+    async def _read_cached(self, key: str) -> Optional[bytes]:
+        """Аудио из кэша или None (нет в кэше или файл успели вытеснить)"""
+        cached_path = await self.audio_cache.get(key)
+        if cached_path is None:
+            return None
+        try:
+            return await asyncio.to_thread(cached_path.read_bytes)
+        except FileNotFoundError:
+            return None
+
+    def _cross_worker_claim(self, key: str):
+        """Заявка на озвучку key между воркерами (если включена)"""
+        if self.db is None:
+            return nullcontext()
+        return self.db.claim(f"tts:{key}", timeout=self.cross_worker_wait_timeout, ttl=self.cross_worker_claim_ttl)
+
+    async def _cached_text_to_speech(self, key: str, text: str) -> str:
+        """TTS через кэш: при попадании - готовый файл без запроса в Yandex"""
+        cached_path = await self.audio_cache.get(key)
+        if cached_path is not None:
+            return str(cached_path)
+
+        async with self._cross_worker_claim(key):
+            # Пока ждали заявку, другой воркер мог уже озвучить этот текст
+            if self.db is not None:
+                cached_path = await self.audio_cache.get(key)
+                if cached_path is not None:
+                    self.cross_worker_collapsed += 1
+                    return str(cached_path)
+            return await self._synthesize_to_cache(key, text)
+
+    async def _synthesize_to_cache(self, key: str, text: str) -> str:
+        """Озвучить текст в Yandex и положить файл в кэш"""
+        # Пишем во временный файл и атомарно переносим в кэш
+        temp_path = self.audio_cache.temp_path_for(key)
+        await self.speech_service.text_to_speech(text, output_file=temp_path, voice=TTS_VOICE, lang=TTS_LANG)
+        return str(await self.audio_cache.put(key, temp_path))
 
     async def speech_to_text(self, audio_content: bytes) -> str:
         """Преобразование речи в текст"""
         # Используем существующий сервис для распознавания
-        text = await self.speech_service.speech_to_text(audio_content)
+        key = hashlib.sha256(audio_content).hexdigest()
+        text = await self.stt_flight.do(key, lambda: self.speech_service.speech_to_text(audio_content))
         return text
 
+    def stats(self) -> dict:
+        """Счетчики схлопывания запросов и кэша TTS"""
+        stats = {
+            "tts_single_flight": self.tts_flight.stats(),
+            "stt_single_flight": self.stt_flight.stats(),
+            "tts_cross_worker_collapsed": self.cross_worker_collapsed,
+            "iam_token": self.speech_service.token_provider.stats(),
+            "speechkit": self.speech_service.stats(),
+        }
+        if self.audio_cache is not None:
+            stats["audio_cache"] = self.audio_cache.stats()
+        return stats
+
     def calculate_cost(self, content: Union[str, bytes], operation: str) -> int:
         """Расчет стоимости операции"""
         if operation == "tts":
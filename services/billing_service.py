@@ -1,9 +1,9 @@
 import sys
 from datetime import datetime
+from typing import Optional
 from db.database import Database
 from models.user import User
 from models.balance import Balance
-from models.task import Task
 
 class BillingService:
     """Простой сервис для работы с балансом пользователей в боте"""
@@ -51,7 +51,7 @@ class BillingService:
         last_updated = balance.updated_at.strftime("%Y-%m-%d %H:%M:%S")
         return f"💰 Ваш текущий баланс: {balance.balance} кредитов\n📊 Последнее обновление: {last_updated}"
     
-    async def _update_balance(self, user_id: int, amount: float, reason: str = None) -> Balance:
+    async def _update_balance(self, user_id: int, amount: float, reason: str, task_id: str = None) -> Balance:
         """
         Обновляет баланс пользователя
         
@@ -59,56 +59,43 @@ class BillingService:
             user_id: ID пользователя
             amount: Сумма изменения (положительная - пополнение, отрицательная - списание)
             reason: Причина изменения баланса
+            task_id: ID задачи, если изменение связано с задачей
             
         Returns:
-            tuple: (успешно, сообщение)
+            Balance: Обновленный баланс (None, если баланс не найден)
         """
-        # Получаем текущий баланс
-        old_balance = await self.db.get_balance_object(user_id)
-        if not old_balance:
-            return False, "Ошибка: баланс не найден."
-        
-        # Обновляем баланс
-        await self.db.update_balance(user_id, amount)
-        
-        # Логируем транзакцию
-        await self.db.log(
-            user_id=user_id,
-            action="BALANCE_UPDATE",
-            details=f"Amount: {amount}, Reason: {reason}, Previous balance: {old_balance.balance}"
-        )
-        
-        # Получаем обновленный баланс
-        new_balance = await self.db.get_balance_object(user_id)
-        
-        return new_balance
+        # Изменение баланса и запись транзакции - один запрос в одной транзакции БД
+        return await self.db.adjust_balance(user_id, amount, reason=reason, task_id=task_id)
                 
-    async def charge_for_task(self, task_id: str, reason: str = None) -> tuple[Task, Balance]:
+    async def charge_for_task(
+        self,
+        task_id: str,
+        user_id: int,
+        cost: Optional[int],
+        reason: str = None
+    ) -> Optional[Balance]:
         """
         Списывает средства с баланса пользователя за выполнение задачи
-        
+
+        Пользователя и стоимость передает вызывающий (они уже известны
+        из задачи или результата воркера): списание - один запрос к БД.
+
         Args:
             task_id: ID задачи
+            user_id: ID пользователя
+            cost: Стоимость задачи (None - задача бесплатная)
             reason: Причина списания средств
-            
+
         Returns:
-            tuple: (успешно, сообщение)
+            Balance: Обновленный баланс (None, если списывать нечего или баланс не найден)
         """
-        # Получаем задачу по ID
-        task = await self.db.get_task(task_id)
-        if not task:
-            return False, "Ошибка: задача не найдена."
-        
-        # Получаем ID пользователя и стоимость из задачи
-        user_id = task.user_id
-        cost = task.cost
-        
-        # Списываем средства с баланса пользователя
+        if not cost:
+            return None
         if not reason:
             reason = f"Оплата задачи {task_id}"
-        
+
         # Отрицательное значение для списания
-        return task, await self._update_balance(user_id, -cost, reason)
+        return await self._update_balance(user_id, -cost, reason, task_id=task_id)
     
     def str_report_balance(self, balance: Balance) -> tuple[bool, str]:
         """
@@ -5,12 +5,15 @@ import sys
 import aio_pika
 from aiogram import Bot
 from aiogram.types import BufferedInputFile
+from aiogram.exceptions import TelegramBadRequest
 from db.database import Database
 from models.task import Task, TaskStatusEnum
 from models.task_types import TaskTypeEnum, RabbitMQQueueEnum
 from utils.file_utils import FileManager
 from services.client_rabbitmq_service import ClientRabbitMQService
 from utils.utils import log_debug
+from utils.audio_cache import tts_cache_key
+from services.tts_params import TTS_VOICE, TTS_LANG, TTS_FORMAT
 import asyncio
 
 # Настраиваем буферизацию вывода
@@ -24,15 +27,76 @@ class BotService:
         self.db = Database()
         self.file_manager = FileManager()
         self.rabbitmq_service = ClientRabbitMQService()
+        # Ключ аудио -> file_id в Telegram (копия таблицы telegram_files в памяти)
+        self._file_ids: dict[str, str] = {}
 
-    async def send_result_to_user(self, user_id: int, result: dict) -> None:
-        """Отправка результата пользователю"""
+    async def _get_file_id(self, key: str) -> str | None:
+        """file_id уже загруженного аудио (сначала из памяти, потом из БД)"""
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            file_id = await self.db.get_telegram_file_id(key)
+            if file_id is not None:
+                self._file_ids[key] = file_id
+        return file_id
+
+    async def send_voice(
+        self,
+        user_id: int,
+        key: str,
+        result_file: str | None = None,
+        audio: bytes | memoryview | None = None
+    ) -> bool:
+        """
+        Отправить голосовое сообщение
+
+        Если такое аудио уже загружалось, отправляем по file_id - без чтения
+        файла с диска и повторной загрузки. Если Telegram не принял file_id,
+        забываем его и загружаем файл заново. Аудио берется из памяти (audio,
+        пришло в RPC-ответе), а если его нет - из файла result_file.
+
+        Returns:
+            bool: False - аудио не нашлось (блоб уже удален), пользователю ушло сообщение об ошибке
+        """
+        file_id = await self._get_file_id(key)
+        if file_id is not None:
+            try:
+                await self.bot.send_voice(user_id, file_id)
+                return True
+            except TelegramBadRequest as e:
+                log_debug(f"file_id для {key} устарел ({e}), загружаем файл заново")
+                self._file_ids.pop(key, None)
+                await self.db.delete_telegram_file_id(key)
+
+        if audio is not None:
+            audio_content = audio
+            filename = f"{key[:16]}.ogg"
+        elif result_file is None or result_file.startswith("memory:"):
+            # Аудио было только в памяти воркера, а блоб с ним уже удален (устарел или забран)
+            log_debug(f"Аудио {key} не найдено: блоб удален, файла нет ({result_file})")
+            await self.bot.send_message(user_id, "Не удалось получить аудио, попробуйте еще раз")
+            return False
+        else:
+            log_debug(f"Получение аудиофайла из {result_file}")
+            audio_content = await self.file_manager.get_audio(result_file)
+            filename = os.path.basename(result_file)
+        
+        # Создаем InputFile из байтов
+        voice_file = BufferedInputFile(audio_content, filename=filename)
+        message = await self.bot.send_voice(user_id, voice_file)
+        
+        if message.voice is not None:
+            self._file_ids[key] = message.voice.file_id
+            await self.db.save_telegram_file_id(key, message.voice.file_id)
+        return True
+
+    async def send_result_to_user(self, user_id: int, result: dict) -> bool:
+        """Отправка результата пользователю; False - отправлено только сообщение об ошибке"""
         log_debug(f"Обработка результата для пользователя {user_id}: {result}")
         
         # Если статус ошибка, отправляем сообщение об ошибке
         if result["status"] != "success":
             await self.bot.send_message(user_id, result["message"])
-            return
+            return False
         
         # Получаем детальную информацию о задаче из базы данных
         task_id = result["task_id"]
@@ -41,12 +105,12 @@ class BotService:
         if not task:
             log_debug(f"Задача {task_id} не найдена в базе данных")
             await self.bot.send_message(user_id, "Ошибка: задача не найдена в базе данных")
-            return
+            return False
             
-        if task.status != TaskStatusEnum.COMPLETED:
+        if task.status not in (TaskStatusEnum.COMPLETED, TaskStatusEnum.DELIVERED):
             log_debug(f"Задача {task_id} не завершена: {task.status}")
             await self.bot.send_message(user_id, f"Задача в процессе обработки. Статус: {task.status}")
-            return
+            return False
         
         # Получаем информацию о стоимости из базы данных
         cost = task.cost
@@ -58,16 +122,12 @@ class BotService:
         if task_type == TaskTypeEnum.TEXT:
             # Это был TTS запрос (преобразование текста в аудио)
             result_file = task.result
-            log_debug(f"Получение аудиофайла из {result_file}")
-            audio_content = await self.file_manager.get_audio(result_file)
-            
-            # Создаем InputFile из байтов
-            filename = os.path.basename(result_file)
-            voice_file = BufferedInputFile(audio_content, filename=filename)
             
-            # Отправляем аудио и сообщение
+            # Отправляем аудио (по file_id, если такое аудио уже отправлялось) и сообщение
             log_debug(f"Отправка голосового сообщения пользователю {user_id}")
-            await self.bot.send_voice(user_id, voice_file)
+            key = tts_cache_key(task.payload, TTS_VOICE, TTS_LANG, TTS_FORMAT)
+            if not await self.send_voice(user_id, key, result_file=result_file, audio=result.get("audio")):
+                return False
             await self.bot.send_message(user_id, "Текст успешно преобразован в речь")
             
         elif task_type == TaskTypeEnum.VOICE:
@@ -77,4 +137,5 @@ class BotService:
             await self.bot.send_message(user_id, text_result)
         
         # Отправляем информацию о стоимости
-        # await self.bot.send_message(user_id, f"💰 Стоимость: {cost} кредитов")
\ No newline at end of file
+        # await self.bot.send_message(user_id, f"💰 Стоимость: {cost} кредитов")
+        return True
@@ -2,6 +2,7 @@ import os
 import json
 import uuid
 import sys
+import time
 import aio_pika
 from aiogram import Bot
 from aiogram.types import BufferedInputFile
@@ -9,7 +10,9 @@ from db.database import Database
 from models.task import TaskStatusEnum
 from models.task_types import TaskTypeEnum, RabbitMQQueueEnum
 from utils.file_utils import FileManager
+from services.result_transport import DEADLINE_HEADER, parse_result_message
 import asyncio
+from typing import Awaitable, Callable
 
 # Настраиваем буферизацию вывода
 sys.stdout.reconfigure(line_buffering=True)
@@ -19,14 +22,40 @@ def log_debug(message: str):
     print(f"[DEBUG] {message}", flush=True)
     sys.stdout.flush()
 
+# Сколько каналов держим для публикации RPC-запросов
+RPC_PUBLISH_CHANNELS = int(os.environ.get("RPC_PUBLISH_CHANNELS", "4"))
+# Сколько секунд ждем ответ воркера по умолчанию
+RPC_TIMEOUT = float(os.environ.get("RPC_TIMEOUT", "60"))
+# Сколько результатов из очереди TASK_RESULTS обрабатываем одновременно
+RESULTS_PREFETCH = int(os.environ.get("RESULTS_PREFETCH", "32"))
+# Через сколько секунд вернуть в очередь результат, который не удалось обработать
+RESULTS_RETRY_DELAY = float(os.environ.get("RESULTS_RETRY_DELAY", "1"))
+
 class ClientRabbitMQService:
-    """Сервис для работы с RabbitMQ и выполнения RPC запросов"""
+    """
+    Сервис для работы с RabbitMQ и выполнения RPC запросов
+
+    Ответы воркеров приходят в одну общую очередь ответов с одним
+    долгоживущим потребителем; ожидающие вызовы находятся по correlation_id
+    в словаре futures. Запросы публикуются через небольшой пул каналов,
+    поэтому один вызов - это одна публикация, и вызовов одновременно
+    может быть сколько угодно.
+
+    Без ожидания ответа (submit_task) задача уходит с reply_to на общую
+    очередь TASK_RESULTS, а результаты обрабатывает consume_results.
+    """
     
     def __init__(self):
         self._connection = None
         self.db = Database()
         self.file_manager = FileManager()
 
+        self._rpc_lock = asyncio.Lock()
+        self._consume_channel = None
+        self._callback_queue = None
+        self._publish_channels: asyncio.Queue = asyncio.Queue()
+        self._futures: dict[str, asyncio.Future] = {}
+
     async def _get_connection(self):
         """Получение или создание подключения к RabbitMQ"""
         if self._connection is None or self._connection.is_closed:
@@ -35,57 +64,151 @@ class ClientRabbitMQService:
                 timeout=30  # 30 секунд таймаут на подключение
             )
         return self._connection
-    
-    async def send_rpc_request(self, routing_key: str, data: dict) -> dict:
-        """Отправка RPC запроса и ожидание ответа"""
-        # Получаем соединение
-        connection = await self._get_connection()
-        channel = await connection.channel()
-        
-        # Создаем временную эксклюзивную очередь для ответа
-        # Она удалится автоматически после закрытия соединения
-        callback_queue = await channel.declare_queue("", exclusive=True)
+
+    async def _ensure_rpc(self) -> None:
+        """Один раз на процесс: очередь ответов с потребителем и пул каналов публикации"""
+        if self._callback_queue is not None:
+            return
+        async with self._rpc_lock:
+            if self._callback_queue is not None:
+                return
+            connection = await self._get_connection()
+
+            # Общая эксклюзивная очередь для всех ответов, удалится при закрытии соединения
+            self._consume_channel = await connection.channel()
+            callback_queue = await self._consume_channel.declare_queue("", exclusive=True, auto_delete=True)
+            await callback_queue.consume(self._on_reply, no_ack=True)
+            # Очередь результатов должна существовать до первой задачи submit_task
+            await self._consume_channel.declare_queue(RabbitMQQueueEnum.TASK_RESULTS)
+
+            for _ in range(RPC_PUBLISH_CHANNELS):
+                self._publish_channels.put_nowait(await connection.channel())
+            self._callback_queue = callback_queue
+            log_debug(f"RPC: очередь ответов {callback_queue.name}, каналов публикации: {RPC_PUBLISH_CHANNELS}")
+
+    async def _on_reply(self, message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        """Ответ воркера: отдать результат ожидающему вызову по correlation_id"""
+        future = self._futures.pop(message.correlation_id, None)
+        if future is None or future.done():
+            # Вызов уже не ждет ответа (или ответ чужой)
+            log_debug(f"Ответ без ожидающего запроса: {message.correlation_id}")
+            return
+        try:
+            future.set_result(await parse_result_message(message))
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+
+    async def send_rpc_request(self, routing_key: str, data: dict, timeout: float | None = None) -> dict:
+        """
+        Отправка RPC запроса и ожидание ответа
+
+        Args:
+            routing_key: Очередь воркера
+            data: Тело запроса
+            timeout: Сколько секунд ждать ответ (по умолчанию RPC_TIMEOUT). Столько же
+                живет сообщение в очереди (expiration), дедлайн уходит воркеру в заголовке.
+
+        Raises:
+            asyncio.TimeoutError: Воркер не ответил за timeout
+        """
+        timeout = timeout or RPC_TIMEOUT
+        await self._ensure_rpc()
         
         # Генерируем correlation_id для отслеживания запроса
         correlation_id = str(uuid.uuid4())
         
         # Добавляем correlation_id в данные запроса
         data["correlation_id"] = correlation_id
-        
-        log_debug(f"Отправка RPC запроса в очередь {routing_key}")
-        
-        # Отправляем запрос, указав reply_to на временную очередь
-        await channel.default_exchange.publish(
-            aio_pika.Message(
-                body=json.dumps(data).encode(),
-                correlation_id=correlation_id,
-                reply_to=callback_queue.name
-            ),
-            routing_key=routing_key
-        )
-        
-        log_debug(f"Ожидание ответа в очереди {callback_queue.name}")
-        
-        # Ожидаем ответ из временной очереди
-        async with callback_queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                # Проверяем correlation_id чтобы получить только наш ответ
-                if message.correlation_id == correlation_id:
-                    await message.ack()
-                    result = json.loads(message.body.decode())
-                    log_debug(f"Получен ответ на запрос")
-                    return result
-                    
-                # Игнорируем чужие сообщения
-                await message.ack()
-
-    async def process_message(self, task_id: str, user_id: int, message_id: int, text: str | None = None, voice_file_id: str | None = None) -> dict:
-        """Обработка входящего сообщения"""
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[correlation_id] = future
+        try:
+            log_debug(f"Отправка RPC запроса в очередь {routing_key}")
+            channel = await self._publish_channels.get()
+            try:
+                # Отправляем запрос, указав reply_to на общую очередь ответов
+                await channel.default_exchange.publish(
+                    aio_pika.Message(
+                        body=json.dumps(data).encode(),
+                        correlation_id=correlation_id,
+                        reply_to=self._callback_queue.name,
+                        # Брокер сам выбросит сообщение, которое пролежало в очереди дольше timeout
+                        expiration=timeout,
+                        headers={DEADLINE_HEADER: time.time() + timeout}
+                    ),
+                    routing_key=routing_key
+                )
+            finally:
+                self._publish_channels.put_nowait(channel)
+
+            result = await asyncio.wait_for(future, timeout)
+            log_debug(f"Получен ответ на запрос")
+            return result
+        finally:
+            self._futures.pop(correlation_id, None)
+
+    async def consume_results(self, on_result: Callable[[dict], Awaitable[None]]) -> None:
+        """
+        Запустить потребителя очереди TASK_RESULTS (результаты задач из submit_task)
+
+        on_result вызывается для каждого результата (до RESULTS_PREFETCH
+        одновременно), в result всегда есть task_id. Сообщение подтверждается
+        после on_result: если процесс упадет посередине, результат придет
+        еще раз, поэтому on_result должен быть идемпотентным (см.
+        Database.claim_task_delivery). Если разобрать результат или выполнить
+        on_result не удалось, сообщение через RESULTS_RETRY_DELAY секунд
+        возвращается в очередь; после второй неудачи оно перекладывается в
+        очередь TASK_RESULTS_FAILED, а не теряется.
+        """
+        connection = await self._get_connection()
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=RESULTS_PREFETCH)
+        results_queue = await channel.declare_queue(RabbitMQQueueEnum.TASK_RESULTS)
+        await channel.declare_queue(RabbitMQQueueEnum.TASK_RESULTS_FAILED)
+
+        async def on_message(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+            try:
+                result = await parse_result_message(message)
+                # correlation_id результата - это task_id
+                result.setdefault("task_id", message.correlation_id)
+                await on_result(result)
+            except Exception as e:
+                log_debug(f"Ошибка обработки результата задачи {message.correlation_id}: {e}")
+                if not message.redelivered:
+                    await asyncio.sleep(RESULTS_RETRY_DELAY)
+                    await message.reject(requeue=True)
+                    return
+                await channel.default_exchange.publish(
+                    aio_pika.Message(
+                        body=message.body,
+                        headers=message.headers,
+                        content_type=message.content_type,
+                        correlation_id=message.correlation_id
+                    ),
+                    routing_key=RabbitMQQueueEnum.TASK_RESULTS_FAILED
+                )
+            await message.ack()
+
+        await results_queue.consume(on_message)
+        log_debug(f"Потребитель результатов запущен: {RabbitMQQueueEnum.TASK_RESULTS}")
+
+    async def close(self) -> None:
+        """Закрыть соединение (вызывать при остановке процесса)"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        if self._connection is not None and not self._connection.is_closed:
+            await self._connection.close()
+        self._connection = None
+        self._callback_queue = None
+        self._consume_channel = None
+        self._publish_channels = asyncio.Queue()
+
+    async def _create_task(self, task_id: str, user_id: int, text: str | None, voice_file_id: str | None) -> dict:
+        """Создать задачу в БД и собрать сообщение для воркера"""
         # Пользователь уже создан через middleware, нет необходимости проверять
         
-        # Генерируем ID задачи
-        # task_id = f"{user_id}_{message_id}"
-        
         # Определяем тип задачи и создаем её
         if text:
             task_type = TaskTypeEnum.TEXT
@@ -99,21 +222,70 @@ class ClientRabbitMQService:
         # Создаем задачу
         task = await self.db.create_task(task_id, user_id, task_type, payload)
         
-        # Отправляем задачу в очередь
-        task_data = {
+        # Сообщение для воркера
+        return {
             "user_id": task.user_id,
             "type": task.type,
             "task_id": task.id,
             "data": task.payload
         }
+
+    async def submit_task(self, task_id: str, user_id: int, message_id: int, text: str | None = None, voice_file_id: str | None = None, timeout: float | None = None) -> None:
+        """
+        Отправить задачу воркеру, не дожидаясь результата
+
+        Результат придет в очередь TASK_RESULTS (см. consume_results) с
+        correlation_id = task_id. Дедлайн (timeout, по умолчанию RPC_TIMEOUT)
+        уходит воркеру только заголовком, без expiration: просроченную
+        задачу воркер отменит и ответит ошибкой, и пользователь узнает об этом.
+        """
+        timeout = timeout or RPC_TIMEOUT
+        task_data = await self._create_task(task_id, user_id, text, voice_file_id)
+        await self._ensure_rpc()
+
+        log_debug(f"Отправка задачи {task_id} на обработку без ожидания")
+        channel = await self._publish_channels.get()
+        try:
+            await channel.default_exchange.publish(
+                aio_pika.Message(
+                    body=json.dumps(task_data).encode(),
+                    correlation_id=task_id,
+                    reply_to=RabbitMQQueueEnum.TASK_RESULTS,
+                    headers={DEADLINE_HEADER: time.time() + timeout}
+                ),
+                routing_key=RabbitMQQueueEnum.TASK_PROCESSING
+            )
+        finally:
+            self._publish_channels.put_nowait(channel)
+
+    async def process_message(self, task_id: str, user_id: int, message_id: int, text: str | None = None, voice_file_id: str | None = None, timeout: float | None = None) -> dict:
+        """Обработка входящего сообщения"""
+        task_data = await self._create_task(task_id, user_id, text, voice_file_id)
+        task_type = task_data["type"]
         
         log_debug(f"Отправка задачи {task_id} на обработку")
         
         # Отправляем RPC запрос воркеру и получаем результат
-        result = await self.send_rpc_request(
-            routing_key=RabbitMQQueueEnum.TASK_PROCESSING,
-            data=task_data
-        )
+        try:
+            result = await self.send_rpc_request(
+                routing_key=RabbitMQQueueEnum.TASK_PROCESSING,
+                data=task_data,
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            # Ответа уже никто не ждет - воркер не возьмет задачу, если еще не начал
+            await self.db.cancel_task(task_id)
+            log_debug(f"Задача {task_id} отменена: воркер не ответил вовремя")
+            return {
+                "status": "error",
+                "message": "Не удалось обработать запрос вовремя, попробуйте позже",
+                "task_id": task_id,
+                "type": task_type
+            }
+        except asyncio.CancelledError:
+            # Вызывающий отменен (например, остановка бота) - отменяем и задачу
+            await asyncio.shield(self.db.cancel_task(task_id))
+            raise
         
         log_debug(f"Получен результат обработки задачи {task_id}: {result}")
         
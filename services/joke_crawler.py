@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+
+
+@dataclass
+class JokeSource:
+    """Сайт с анекдотами"""
+    name: str
+    url: str  # первая страница
+    css_class: str  # класс div с текстом анекдота
+    page_url: Optional[str] = None  # шаблон следующих страниц с {page}, None - одна страница
+    max_pages: int = 1
+    category: str = "general"
+
+    def url_for_page(self, page: int) -> str:
+        if page == 1 or not self.page_url:
+            return self.url
+        return self.page_url.format(page=page)
+
+
+def parse_jokes_html(html: str, css_class: str, category: str) -> list[dict]:
+    """Достать анекдоты из HTML страницы (выполняется в пуле потоков)"""
+    soup = BeautifulSoup(html, "html.parser")
+    jokes = []
+    for joke in soup.find_all("div", class_=css_class):
+        text = joke.text.strip()
+        if text:
+            jokes.append({"text": text, "category": category})
+    return jokes
+
+
+class ValidatorCache:
+    """ETag / Last-Modified уже скачанных страниц (для условных запросов), хранится в JSON"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._items: dict[str, dict] = {}
+        if path is not None and path.exists():
+            self._items = json.loads(path.read_text(encoding="utf-8"))
+
+    def headers(self, url: str) -> dict:
+        item = self._items.get(url, {})
+        headers = {}
+        if item.get("etag"):
+            headers["If-None-Match"] = item["etag"]
+        if item.get("last_modified"):
+            headers["If-Modified-Since"] = item["last_modified"]
+        return headers
+
+    def update(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        if etag or last_modified:
+            self._items[url] = {"etag": etag, "last_modified": last_modified}
+
+    def save(self) -> None:
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self._items, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+class JokeCrawler:
+    """
+    Асинхронный краулер анекдотов
+
+    Страницы качаются параллельно с ограничением на хост (семафор + token bucket),
+    повторно скачанные страницы отсекаются условными запросами (ETag /
+    If-Modified-Since), HTML разбирается в пуле потоков, анекдоты отдаются
+    потоком через async-итератор - его можно сразу передать в JokeService.add_jokes.
+    """
+
+    def __init__(
+        self,
+        sources: list[JokeSource],
+        per_host_concurrency: int = 2,
+        per_host_rate: float = 1.0,
+        validator_cache: Optional[ValidatorCache] = None,
+        parse_workers: int = 4,
+        timeout: float = 10.0,
+        queue_size: int = 1000
+    ):
+        """
+        Args:
+            sources: Сайты для обхода
+            per_host_concurrency: Сколько одновременных запросов к одному хосту
+            per_host_rate: Сколько запросов в секунду к одному хосту
+            validator_cache: Кэш ETag/Last-Modified (None - без условных запросов)
+            parse_workers: Потоков для разбора HTML
+            timeout: Таймаут запроса в секундах
+            queue_size: Сколько анекдотов держим в очереди до записи в БД
+        """
+        self.sources = sources
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.validator_cache = validator_cache or ValidatorCache()
+        self.parse_workers = parse_workers
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.queue_size = queue_size
+
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+
+        # Счетчики
+        self.stats = {"fetched": 0, "not_modified": 0, "errors": 0, "jokes": 0}
+
+    def _host_limits(self, url: str) -> tuple[asyncio.Semaphore, TokenBucket]:
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+            self._buckets[host] = TokenBucket(self.per_host_rate, capacity=self.per_host_concurrency)
+        return self._semaphores[host], self._buckets[host]
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[tuple[str, dict]]:
+        """
+        Скачать страницу; None - страница не изменилась или ошибка
+
+        Returns:
+            (HTML, валидаторы ETag/Last-Modified). Валидаторы сохраняет
+            вызывающий, когда убедится, что страница не пустая.
+        """
+        semaphore, bucket = self._host_limits(url)
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                async with session.get(url, headers=self.validator_cache.headers(url)) as response:
+                    if response.status == 304:
+                        self.stats["not_modified"] += 1
+                        return None
+                    if response.status == 404:
+                        # Страницы кончились: пустой HTML останавливает пагинацию
+                        return "", {}
+                    response.raise_for_status()
+                    html = await response.text()
+                    self.stats["fetched"] += 1
+                    validators = {
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                    }
+                    return html, validators
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.stats["errors"] += 1
+                logger.warning(f"Ошибка при запросе к {url}: {e}")
+                return None
+
+    async def _crawl_source(
+        self,
+        session: aiohttp.ClientSession,
+        source: JokeSource,
+        executor: ThreadPoolExecutor,
+        queue: asyncio.Queue
+    ) -> None:
+        """Обойти страницы одного сайта (несколько страниц параллельно)"""
+        loop = asyncio.get_running_loop()
+        pages = iter(range(1, source.max_pages + 1))
+        exhausted = False
+
+        async def worker():
+            nonlocal exhausted
+            for page in pages:
+                if exhausted:
+                    return
+                url = source.url_for_page(page)
+                fetched = await self._fetch(session, url)
+                if fetched is None:
+                    continue
+                html, validators = fetched
+                jokes = await loop.run_in_executor(
+                    executor, parse_jokes_html, html, source.css_class, source.category
+                )
+                if not jokes:
+                    # Пустая страница - дальше страниц нет. Ее валидаторы не храним:
+                    # иначе в следующий раз будет 304 и обход пойдет дальше нее
+                    exhausted = True
+                    return
+                self.validator_cache.update(url, **validators)
+                for joke in jokes:
+                    await queue.put(joke)
+                self.stats["jokes"] += len(jokes)
+
+        await asyncio.gather(*(worker() for _ in range(self.per_host_concurrency)))
+
+    async def crawl(self) -> AsyncIterator[dict]:
+        """Обойти все сайты, отдавая анекдоты по мере разбора страниц"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        done = object()
+
+        async def produce():
+            try:
+                with ThreadPoolExecutor(max_workers=self.parse_workers) as executor:
+                    async with aiohttp.ClientSession(
+                        timeout=self.timeout, headers={"User-Agent": USER_AGENT}
+                    ) as session:
+                        await asyncio.gather(*(
+                            self._crawl_source(session, source, executor, queue)
+                            for source in self.sources
+                        ))
+            except Exception as e:
+                logger.error(f"Ошибка краулера: {e}")
+            finally:
+                self.validator_cache.save()
+            # При отмене сюда не доходим - потребитель уже не читает очередь
+            await queue.put(done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                yield item
+        finally:
+            if not producer.done():
+                producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
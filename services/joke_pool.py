@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from models.joke import Joke
+from services.joke_service import JokeService
+from utils.seen_set import SeenSet
+
+logger = logging.getLogger(__name__)
+
+# Ключ общего пула (без категории)
+ALL_CATEGORIES = None
+# Сколько просмотренных пользователем анекдотов из пула пропускаем, прежде чем идти в БД
+MAX_SEEN_SKIPS = 8
+
+
+class JokePool:
+    """
+    Пул заранее выбранных случайных анекдотов поверх JokeService
+
+    Для каждой категории (и общий) хранится кольцевой буфер из size анекдотов.
+    Обработчик забирает анекдот без обращения к БД, а фоновая задача доливает
+    буфер пачкой, когда в нем остается меньше low_water анекдотов.
+    """
+
+    def __init__(
+        self,
+        joke_service: JokeService,
+        size: int = None,
+        refill_batch: int = None,
+        low_water: int = None,
+        max_age: float = None
+    ):
+        """
+        Args:
+            joke_service: Сервис анекдотов
+            size: Емкость буфера каждого пула
+            refill_batch: Сколько анекдотов достаем из БД за один запрос
+            low_water: Порог, ниже которого пул доливается
+            max_age: Через сколько секунд анекдот в буфере считается устаревшим
+        """
+        self.joke_service = joke_service
+        self.size = size or int(os.environ.get("JOKE_POOL_SIZE", "200"))
+        self.refill_batch = refill_batch or int(os.environ.get("JOKE_POOL_REFILL_BATCH", "50"))
+        self.low_water = low_water or int(os.environ.get("JOKE_POOL_LOW_WATER", "50"))
+        self.max_age = max_age or float(os.environ.get("JOKE_POOL_MAX_AGE", "600"))
+
+        self._pools: dict[Optional[str], deque] = {}
+        self._refill_needed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        # Счетчики
+        self.served = 0
+        self.underflows = 0
+        self.stale_dropped = 0
+        self.seen_skipped = 0
+        self.seen_fallbacks = 0
+        self.refills = 0
+
+    def _pool(self, category: Optional[str]) -> deque:
+        pool = self._pools.get(category)
+        if pool is None:
+            # Кольцевой буфер: при переполнении самые старые анекдоты вытесняются
+            pool = self._pools[category] = deque(maxlen=self.size)
+        return pool
+
+    def _ensure_started(self) -> None:
+        """Запускает фоновый долив при первом обращении"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def get_joke(
+        self,
+        category: Optional[str] = ALL_CATEGORIES,
+        seen: Optional[SeenSet] = None
+    ) -> Optional[Joke]:
+        """
+        Взять случайный анекдот из пула (при пустом пуле или если пользователь
+        видел MAX_SEEN_SKIPS анекдотов подряд - напрямую из БД)
+
+        Args:
+            category: Категория анекдота (None - любая)
+            seen: Уже просмотренные пользователем анекдоты, их пропускаем
+        """
+        self._ensure_started()
+        pool = self._pool(category)
+
+        deadline = time.monotonic() - self.max_age
+        skipped = []
+        try:
+            while pool and len(skipped) < MAX_SEEN_SKIPS:
+                fetched_at, joke = pool.popleft()
+                if fetched_at < deadline:
+                    self.stale_dropped += 1
+                    continue
+                if seen and joke.id in seen:
+                    # Этот пользователь анекдот уже видел, другим он подойдет
+                    self.seen_skipped += 1
+                    skipped.append((fetched_at, joke))
+                    continue
+
+                if len(pool) < self.low_water:
+                    self._refill_needed.set()
+                self.served += 1
+                return joke
+        finally:
+            # Пропущенные возвращаем в конец общего пула
+            pool.extend(skipped)
+
+        if len(skipped) >= MAX_SEEN_SKIPS:
+            # Пул не пуст, просто пользователь видел все, что мы успели просмотреть:
+            # это не недолив, доливаем только если пул и правда опустел
+            self.seen_fallbacks += 1
+            if len(pool) < self.low_water:
+                self._refill_needed.set()
+        else:
+            # Пул пуст - идем в БД синхронно и просим фоновый долив
+            self.underflows += 1
+            self._refill_needed.set()
+        if category is ALL_CATEGORIES:
+            return await self.joke_service.get_random_joke(seen=seen)
+        return await self.joke_service.get_joke_by_category(category, seen=seen)
+
+    async def refill(self) -> None:
+        """Долить до полного все пулы, где анекдотов меньше low_water"""
+        for category, pool in list(self._pools.items()):
+            if len(pool) >= self.low_water:
+                continue
+            while len(pool) < self.size:
+                count = min(self.refill_batch, self.size - len(pool))
+                jokes = await self.joke_service.get_random_jokes(count, category)
+                if not jokes:
+                    break
+                fetched_at = time.monotonic()
+                pool.extend((fetched_at, joke) for joke in jokes)
+                self.refills += 1
+
+    async def _run(self) -> None:
+        """Фоновый цикл долива"""
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            try:
+                await self.refill()
+            except Exception as e:
+                logger.error(f"Joke pool refill failed: {e}")
+                await asyncio.sleep(1)
+
+    async def stop(self) -> None:
+        """Остановить фоновый долив"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """Счетчики пула"""
+        return {
+            "pools": {category or "*": len(pool) for category, pool in self._pools.items()},
+            "served": self.served,
+            "underflows": self.underflows,
+            "stale_dropped": self.stale_dropped,
+            "seen_skipped": self.seen_skipped,
+            "seen_fallbacks": self.seen_fallbacks,
+            "refills": self.refills,
+        }
@@ -1,37 +1,399 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.ext.asyncio import AsyncSession
-from models.joke import Joke
+import asyncio
+import base64
+import os
 import random
-from sqlalchemy import func, select
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterable, Iterable, Optional, Union
+
+from sqlalchemy import BigInteger, any_, bindparam, func, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models.joke import Joke, JokeLshBucket
+from utils.seen_set import SeenSet, UnseenCursor
+from utils.text_utils import joke_text_hash
+from utils.minhash import minhash_signature, lsh_buckets, similarity, signature_to_bytes, signature_from_bytes
+
+# Сколько раз пробуем взять случайный id, если анекдот успели удалить
+MAX_PICK_ATTEMPTS = 3
+# Сколько анекдотов вставляем одним INSERT при массовой загрузке
+ADD_JOKES_BATCH_SIZE = 1000
+# Порог похожести (оценка Жаккара по MinHash), выше которого анекдот считается дублем
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("JOKE_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# Кэш результатов поиска по популярным запросам
+SEARCH_CACHE_SIZE = int(os.environ.get("JOKE_SEARCH_CACHE_SIZE", "256"))
+SEARCH_CACHE_TTL = float(os.environ.get("JOKE_SEARCH_CACHE_TTL", "60"))
+# Сколько случайных id пробуем, прежде чем идти по обходу непросмотренных
+MAX_UNSEEN_SAMPLES = 8
+
 
 class JokeService:
-    def __init__(self, db):
+    def __init__(self, db, refresh_interval: float = None):
+        """
+        Args:
+            db: Экземпляр Database
+            refresh_interval: Как часто (сек) подтягивать новые id анекдотов
+        """
         self.db = db
-    
-    async def get_random_joke(self) -> Joke:
-        """Получить случайный анекдот"""
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.environ.get("JOKE_IDS_REFRESH_INTERVAL", "60")
+        )
+
+        # Компактные массивы id: случайный выбор - O(1) + выборка по первичному ключу
+        self._ids = array("q")
+        self._ids_by_category: dict[str, array] = {}
+        self._max_id = 0
+        self._max_updated_at: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+        # (запрос, limit, cursor) -> (истекает, анекдоты, следующий cursor)
+        self._search_cache: OrderedDict[tuple, tuple[float, list[Joke], Optional[str]]] = OrderedDict()
+
+    async def _refresh_ids(self, full: bool = False) -> None:
+        """
+        Подтянуть id анекдотов в память
+
+        По умолчанию догружает только новые id (id > max_id). Если какой-то старый
+        анекдот изменился (updated_at), его категория могла поменяться - тогда
+        перечитываем все id целиком.
+        """
+        async with self._refresh_lock:
+            session = self.db.async_session()
+            async with session:
+                if not full and self._max_updated_at is not None:
+                    changed = await session.execute(
+                        select(Joke.id)
+                        .where(Joke.id <= self._max_id, Joke.updated_at > self._max_updated_at)
+                        .limit(1)
+                    )
+                    full = changed.first() is not None
+
+                if full:
+                    self._ids = array("q")
+                    self._ids_by_category = {}
+                    self._max_id = 0
+
+                result = await session.execute(
+                    select(Joke.id, Joke.category)
+                    .where(Joke.id > self._max_id)
+                    .order_by(Joke.id)
+                )
+                for joke_id, category in result:
+                    self._ids.append(joke_id)
+                    if category is not None:
+                        self._ids_by_category.setdefault(category, array("q")).append(joke_id)
+                    self._max_id = joke_id
+
+                max_updated_at = await session.scalar(select(func.max(Joke.updated_at)))
+                if max_updated_at is not None:
+                    self._max_updated_at = max_updated_at
+
+            self._refreshed_at = time.monotonic()
+
+    async def _ensure_ids(self) -> None:
+        """Обновить id, если прошло больше refresh_interval"""
+        if not self._ids or time.monotonic() - self._refreshed_at > self.refresh_interval:
+            await self._refresh_ids()
+
+    @staticmethod
+    def _pick_id(ids: array, seen: Optional[SeenSet] = None, key: Optional[str] = None) -> Optional[int]:
+        """
+        Случайный id, которого нет в seen
+
+        Сначала несколько случайных проб. Если не повезло - продолжаем
+        псевдослучайный обход ids, сохраненный в seen.cursors[key] (и вместе
+        с seen в БД): каждая позиция за круг проверяется один раз, поэтому
+        в среднем на выбор приходится O(1) проверок при любой доле
+        просмотренных. Новые анекдоты обход не сбрасывают.
+
+        Args:
+            ids: Отсортированные id анекдотов
+            seen: Просмотренные пользователем
+            key: Ключ обхода (категория; None - все анекдоты)
+        """
+        if not ids:
+            return None
+        if not seen:
+            return ids[random.randrange(len(ids))]
+
+        for _ in range(MAX_UNSEEN_SAMPLES):
+            joke_id = ids[random.randrange(len(ids))]
+            if joke_id not in seen:
+                return joke_id
+
+        cursor = seen.cursors.get(key)
+        if cursor is None or not cursor.matches(ids):
+            # Первый обход или позиции анекдотов сдвинулись - начинаем новый
+            cursor = seen.cursors[key] = UnseenCursor(len(ids), ids[-1])
+        else:
+            # Новые анекдоты в конце списка - дописываем их позиции в обход
+            cursor.grow(len(ids))
+        while (index := cursor.next_index()) is not None:
+            joke_id = ids[index]
+            if joke_id not in seen:
+                return joke_id
+        # Обход закончился - непросмотренных нет
+        return None
+
+    async def _pick(self, category: Optional[str] = None, seen: Optional[SeenSet] = None) -> Optional[Joke]:
+        """Случайный анекдот: случайный id из памяти + выборка по первичному ключу"""
+        for attempt in range(MAX_PICK_ATTEMPTS):
+            ids = self._ids if category is None else self._ids_by_category.get(category)
+            joke_id = self._pick_id(ids, seen, category)
+            if joke_id is None:
+                return None
+
+            session = self.db.async_session()
+            async with session:
+                joke = await session.get(Joke, joke_id)
+            if joke is not None and (category is None or joke.category == category):
+                return joke
+
+            # Анекдот удалили или сменили категорию - перечитываем id целиком
+            await self._refresh_ids(full=True)
+        return None
+
+    async def get_random_jokes(self, count: int, category: Optional[str] = None) -> list[Joke]:
+        """Получить пачку случайных анекдотов одним запросом (могут повторяться)"""
+        await self._ensure_ids()
+        ids = self._ids if category is None else self._ids_by_category.get(category)
+        if not ids:
+            return []
+
+        picked = [ids[random.randrange(len(ids))] for _ in range(count)]
         session = self.db.async_session()
         async with session:
-            result = await session.execute(
-                select(Joke).order_by(func.random()).limit(1)
-            )
-            return result.scalar_one_or_none()
-    
-    async def get_joke_by_category(self, category: str) -> Joke:
-        """Получить случайный анекдот по категории"""
+            result = await session.execute(select(Joke).where(Joke.id.in_(set(picked))))
+            jokes = {joke.id: joke for joke in result.scalars()}
+        # Сохраняем порядок (и повторы) случайной выборки
+        return [jokes[joke_id] for joke_id in picked if joke_id in jokes]
+
+    async def get_random_joke(self, seen: Optional[SeenSet] = None) -> Joke:
+        """Получить случайный анекдот (не из seen, если передано)"""
+        await self._ensure_ids()
+        return await self._pick(seen=seen)
+
+    async def get_joke_by_category(self, category: str, seen: Optional[SeenSet] = None) -> Joke:
+        """Получить случайный анекдот по категории (не из seen, если передано)"""
+        await self._ensure_ids()
+        return await self._pick(category, seen=seen)
+
+    @staticmethod
+    def _encode_cursor(rank: float, joke_id: int) -> str:
+        return base64.urlsafe_b64encode(f"{rank!r}:{joke_id}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[float, int]:
+        rank, joke_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return float(rank), int(joke_id)
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 5,
+        cursor: Optional[str] = None
+    ) -> tuple[list[Joke], Optional[str]]:
+        """
+        Полнотекстовый поиск анекдотов (GIN индекс по search_vector)
+
+        Сортировка по релевантности, постраничность - keyset по (rank, id):
+        следующая страница не пересчитывает OFFSET, а продолжает с курсора.
+
+        Args:
+            query: Поисковый запрос (синтаксис websearch: "фраза", -слово, or)
+            limit: Размер страницы
+            cursor: Курсор из предыдущего ответа (None - первая страница)
+
+        Returns:
+            tuple: (анекдоты, курсор следующей страницы или None)
+        """
+        query = " ".join(query.lower().split())
+        key = (query, limit, cursor)
+        cached = self._search_cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._search_cache.move_to_end(key)
+            return cached[1], cached[2]
+
+        ts_query = func.websearch_to_tsquery("russian", query)
+        rank = func.ts_rank(Joke.search_vector, ts_query)
+        stmt = (
+            select(Joke, rank.label("rank"))
+            .where(Joke.search_vector.op("@@")(ts_query))
+            .order_by(rank.desc(), Joke.id.desc())
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            last_rank, last_id = self._decode_cursor(cursor)
+            stmt = stmt.where(tuple_(rank, Joke.id) < tuple_(last_rank, last_id))
+
         session = self.db.async_session()
         async with session:
-            result = await session.execute(
-                select(Joke).filter(Joke.category == category).order_by(func.random()).limit(1)
-            )
-            return result.scalar_one_or_none()
-    
-    async def add_joke(self, text: str, category: str = None) -> Joke:
-        """Добавить новый анекдот"""
+            rows = (await session.execute(stmt)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1].rank, rows[-1].Joke.id)
+        jokes = [row.Joke for row in rows]
+
+        self._search_cache[key] = (time.monotonic() + SEARCH_CACHE_TTL, jokes, next_cursor)
+        self._search_cache.move_to_end(key)
+        while len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return jokes, next_cursor
+
+    @staticmethod
+    def _prepare(joke_data: dict) -> dict:
+        """Хэш, MinHash сигнатура и LSH-корзины для нового анекдота"""
+        signature = minhash_signature(joke_data["text"])
+        return {
+            "text": joke_data["text"],
+            "category": joke_data.get("category"),
+            "text_hash": joke_text_hash(joke_data["text"]),
+            "minhash": signature_to_bytes(signature),
+            "_signature": signature,
+            "_buckets": lsh_buckets(signature),
+        }
+
+    @staticmethod
+    async def _bucket_signatures(session, buckets: set[int]) -> dict[int, list]:
+        """Сигнатуры уже сохраненных анекдотов, попавших в те же LSH-корзины"""
+        if not buckets:
+            return {}
+        result = await session.execute(
+            select(JokeLshBucket.bucket, Joke.text_hash, Joke.minhash)
+            .join(Joke, Joke.id == JokeLshBucket.joke_id)
+            .where(JokeLshBucket.bucket == any_(
+                bindparam("buckets", value=list(buckets), type_=ARRAY(BigInteger))
+            ))
+        )
+        by_bucket: dict[int, list] = {}
+        for bucket, text_hash, minhash in result:
+            if minhash is not None:
+                by_bucket.setdefault(bucket, []).append((text_hash, signature_from_bytes(minhash)))
+        return by_bucket
+
+    @staticmethod
+    def _find_duplicate(row: dict, by_bucket: dict[int, list]) -> Optional[str]:
+        """
+        Проверить анекдот по кандидатам из тех же LSH-корзин
+
+        Returns:
+            'exact' - такой же нормализованный текст, 'near' - похож выше порога, None - новый
+        """
+        near = False
+        for bucket in row["_buckets"]:
+            for text_hash, signature in by_bucket.get(bucket, ()):
+                if text_hash == row["text_hash"]:
+                    return "exact"
+                if not near and similarity(row["_signature"], signature) >= NEAR_DUPLICATE_THRESHOLD:
+                    near = True
+        return "near" if near else None
+
+    async def _insert_rows(self, session, rows: list[dict]) -> int:
+        """Вставить подготовленные анекдоты и их LSH-корзины, вернуть число вставленных"""
+        if not rows:
+            return 0
+        result = await session.execute(
+            pg_insert(Joke)
+            .values([{key: value for key, value in row.items() if not key.startswith("_")} for row in rows])
+            .on_conflict_do_nothing(index_elements=[Joke.text_hash])
+            .returning(Joke.id, Joke.text_hash)
+        )
+        inserted = result.fetchall()
+        buckets_by_hash = {row["text_hash"]: row["_buckets"] for row in rows}
+        bucket_rows = [
+            {"bucket": bucket, "joke_id": joke_id}
+            for joke_id, text_hash in inserted
+            for bucket in buckets_by_hash[text_hash]
+        ]
+        if bucket_rows:
+            # executemany: SQLAlchemy сам режет на многострочные INSERT в пределах лимита параметров
+            await session.execute(pg_insert(JokeLshBucket).on_conflict_do_nothing(), bucket_rows)
+        return len(inserted)
+
+    async def add_joke(self, text: str, category: str = None) -> Optional[Joke]:
+        """Добавить новый анекдот (None, если это дубль или почти-дубль)"""
+        row = self._prepare({"text": text, "category": category})
         session = self.db.async_session()
         async with session:
-            joke = Joke(text=text, category=category)
-            session.add(joke)
+            by_bucket = await self._bucket_signatures(session, set(row["_buckets"]))
+            if self._find_duplicate(row, by_bucket):
+                return None
+            if not await self._insert_rows(session, [row]):
+                return None
+            await session.commit()
+            result = await session.execute(select(Joke).where(Joke.text_hash == row["text_hash"]))
+            return result.scalar_one()
+
+    async def add_jokes(
+        self,
+        jokes: Union[Iterable[dict], AsyncIterable[dict]],
+        batch_size: int = ADD_JOKES_BATCH_SIZE
+    ) -> dict:
+        """
+        Массово добавить анекдоты без дублей
+
+        Анекдоты вставляются пачками одним многострочным INSERT ... ON CONFLICT
+        DO NOTHING по хэшу нормализованного текста. Почти-дубли отсекаются по
+        MinHash: кандидаты берутся только из тех же LSH-корзин, а не из всей таблицы.
+        В памяти держится только одна пачка, поэтому вход может быть сколь угодно большим.
+
+        Args:
+            jokes: Итератор (или асинхронный итератор) словарей {'text', 'category'}
+            batch_size: Размер пачки
+
+        Returns:
+            dict: {'inserted': добавлено, 'skipped': точных дублей, 'near_duplicates': почти-дублей}
+        """
+        stats = {"inserted": 0, "skipped": 0, "near_duplicates": 0}
+        batch = []
+
+        async def flush():
+            inserted, near_duplicates = await self._insert_batch(batch)
+            stats["inserted"] += inserted
+            stats["near_duplicates"] += near_duplicates
+            stats["skipped"] += len(batch) - inserted - near_duplicates
+            batch.clear()
+
+        if hasattr(jokes, "__aiter__"):
+            async for joke_data in jokes:
+                batch.append(joke_data)
+                if len(batch) >= batch_size:
+                    await flush()
+        else:
+            for joke_data in jokes:
+                batch.append(joke_data)
+                if len(batch) >= batch_size:
+                    await flush()
+        if batch:
+            await flush()
+        return stats
+
+    async def _insert_batch(self, batch: list[dict]) -> tuple[int, int]:
+        """Вставить пачку анекдотов, вернуть (вставлено, отброшено почти-дублей)"""
+        rows = [self._prepare(joke_data) for joke_data in batch]
+        session = self.db.async_session()
+        async with session:
+            by_bucket = await self._bucket_signatures(
+                session, {bucket for row in rows for bucket in row["_buckets"]}
+            )
+            kept = []
+            near_duplicates = 0
+            for row in rows:
+                duplicate = self._find_duplicate(row, by_bucket)
+                if duplicate == "near":
+                    near_duplicates += 1
+                if duplicate:
+                    continue
+                kept.append(row)
+                # Дубли внутри самой пачки тоже отсекаем
+                for bucket in row["_buckets"]:
+                    by_bucket.setdefault(bucket, []).append((row["text_hash"], row["_signature"]))
+
+            inserted = await self._insert_rows(session, kept)
             await session.commit()
-            await session.refresh(joke)
-            return joke
\ No newline at end of file
+        return inserted, near_duplicates
@@ -0,0 +1,79 @@
+import json
+import os
+from typing import Optional
+
+import aio_pika
+
+from db.database import Database
+from utils.blob_store import BlobStore, create_blob_store
+
+# Аудио до этого размера едет прямо телом RPC-ответа, больше - через хранилище блобов
+AUDIO_INLINE_MAX_BYTES = int(os.environ.get("AUDIO_INLINE_MAX_BYTES", str(1024 * 1024)))
+
+AUDIO_CONTENT_TYPE = "audio/ogg"
+JSON_CONTENT_TYPE = "application/json"
+# Заголовок с JSON результата, когда тело сообщения - аудио
+RESULT_HEADER = "x-result"
+# Заголовок запроса с дедлайном (unix time), по нему воркер выбрасывает просроченные задачи
+DEADLINE_HEADER = "x-deadline"
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Общее для процесса хранилище блобов (тип - AUDIO_BLOB_STORE: postgres | local)"""
+    global _blob_store
+    if _blob_store is None:
+        store_type = os.environ.get("AUDIO_BLOB_STORE", "postgres")
+        if store_type == "postgres":
+            _blob_store = create_blob_store(store_type, db=Database())
+        else:
+            _blob_store = create_blob_store(store_type, base_dir=os.environ.get("AUDIO_BLOB_DIR", "/app/data/blobs"))
+    return _blob_store
+
+
+async def build_result_message(result: dict, correlation_id: Optional[str]) -> aio_pika.Message:
+    """
+    RPC-ответ воркера
+
+    Если в результате есть аудио (result["audio"], bytes или memoryview):
+    небольшое отправляется телом сообщения как есть (без base64 и JSON),
+    остальные поля - в заголовке; крупное кладется в хранилище блобов,
+    а в JSON уходит ссылка audio_ref.
+    """
+    result = dict(result)
+    audio = result.pop("audio", None)
+    if audio is not None:
+        if len(audio) <= AUDIO_INLINE_MAX_BYTES:
+            # bytes уходят как есть; memoryview aio_pika сама соберет в bytes
+            # (кадрам AMQP нужен непрерывный буфер) - лишней копии здесь нет
+            return aio_pika.Message(
+                body=audio,
+                content_type=AUDIO_CONTENT_TYPE,
+                headers={RESULT_HEADER: json.dumps(result)},
+                correlation_id=correlation_id
+            )
+        result["audio_ref"] = await get_blob_store().put(audio)
+
+    return aio_pika.Message(
+        body=json.dumps(result).encode(),
+        content_type=JSON_CONTENT_TYPE,
+        correlation_id=correlation_id
+    )
+
+
+async def parse_result_message(message: aio_pika.abc.AbstractIncomingMessage) -> dict:
+    """Разобрать RPC-ответ воркера; аудио (если есть) - в result["audio"] как memoryview"""
+    if message.content_type == AUDIO_CONTENT_TYPE:
+        result = json.loads(message.headers[RESULT_HEADER])
+        # memoryview на тело сообщения - без копирования
+        result["audio"] = memoryview(message.body)
+        return result
+
+    result = json.loads(message.body.decode())
+    audio_ref = result.pop("audio_ref", None)
+    if audio_ref is not None:
+        audio = await get_blob_store().pop(audio_ref)
+        if audio is not None:
+            result["audio"] = memoryview(audio)
+    return result
@@ -0,0 +1,37 @@
+import os
+from collections import OrderedDict
+
+from db.database import Database
+from utils.seen_set import SeenSet
+
+
+class SeenJokesService:
+    """Учет анекдотов, которые пользователь уже получил (чтобы не повторяться)"""
+
+    def __init__(self, db: Database, cache_size: int = None):
+        """
+        Args:
+            db: Экземпляр Database
+            cache_size: Для скольких пользователей держим SeenSet в памяти
+        """
+        self.db = db
+        self.cache_size = cache_size or int(os.environ.get("SEEN_JOKES_CACHE_SIZE", "10000"))
+        self._cache: OrderedDict[int, SeenSet] = OrderedDict()
+
+    async def get(self, user_id: int) -> SeenSet:
+        """Получить множество просмотренных анекдотов пользователя"""
+        seen = self._cache.get(user_id)
+        if seen is None:
+            seen = SeenSet.from_bytes(await self.db.get_seen_jokes(user_id))
+            self._cache[user_id] = seen
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(user_id)
+        return seen
+
+    async def mark_seen(self, user_id: int, joke_id: int) -> None:
+        """Отметить анекдот как полученный и сохранить в БД"""
+        seen = await self.get(user_id)
+        seen.add(joke_id)
+        await self.db.save_seen_jokes(user_id, seen.to_bytes())
+
@@ -4,9 +4,14 @@ from services.ai_service import AIService
 from models.task_types import TaskTypeEnum
 from models.task import TaskStatusEnum
 import os
-import aiohttp
+from typing import Optional
+from utils.http_client import endpoint_timeout, get_http_session
 from utils.utils import log_debug
 
+# Результат TTS без файла (TTS_IN_MEMORY): в задаче только размер аудио
+MEMORY_RESULT_PREFIX = "memory:"
+
+
 class TaskService:
     
     def __init__(self):
@@ -14,28 +19,60 @@ class TaskService:
         self.file_manager = FileManager()
         self.ai_service = AIService()
         self.telegram_token = os.environ.get("TELEGRAM_TOKEN")
+        # TTS без файлов: аудио уходит боту в RPC-ответе (или через хранилище блобов)
+        self.tts_in_memory = os.environ.get("TTS_IN_MEMORY", "0") == "1"
 
     async def _download_telegram_file(self, file_id: str) -> bytes:
         """Скачивает файл из Telegram по file_id"""
-        # Получаем информацию о файле
-        async with aiohttp.ClientSession() as session:
-            # Получаем file_path
-            file_info_url = f"https://api.telegram.org/bot{self.telegram_token}/getFile"
-            async with session.get(file_info_url, params={"file_id": file_id}) as response:
-                file_info = await response.json()
-                if not file_info.get("ok"):
-                    raise ValueError(f"Failed to get file info: {file_info}")
-                file_path = file_info["result"]["file_path"]
-            
-            # Скачиваем файл
-            file_url = f"https://api.telegram.org/file/bot{self.telegram_token}/{file_path}"
-            async with session.get(file_url) as response:
-                if response.status != 200:
-                    raise ValueError(f"Failed to download file: {response.status}")
-                return await response.read()
+        # Общая сессия процесса: соединение с api.telegram.org переиспользуется
+        session = get_http_session()
+        timeout = endpoint_timeout("telegram_file")
+
+        # Получаем file_path
+        file_info_url = f"https://api.telegram.org/bot{self.telegram_token}/getFile"
+        async with session.get(file_info_url, params={"file_id": file_id}, timeout=timeout) as response:
+            file_info = await response.json()
+            if not file_info.get("ok"):
+                raise ValueError(f"Failed to get file info: {file_info}")
+            file_path = file_info["result"]["file_path"]
+        
+        # Скачиваем файл
+        file_url = f"https://api.telegram.org/file/bot{self.telegram_token}/{file_path}"
+        async with session.get(file_url, timeout=timeout) as response:
+            if response.status != 200:
+                raise ValueError(f"Failed to download file: {response.status}")
+            return await response.read()
 
-    async def process_task(self, task: dict) -> dict:
-        """Обработка задачи"""
+    def _cancelled(self, task_id: str, task_type: str) -> dict:
+        return {
+            "status": "error",
+            "message": "Задача отменена",
+            "task_id": task_id,
+            "type": task_type
+        }
+
+    async def _stored_result(self, db_task) -> dict:
+        """Результат уже выполненной задачи из БД (аудио в памяти - заново из кэша TTS)"""
+        task_type_enum = TaskTypeEnum(db_task.type)
+        result = {
+            "status": "success",
+            "message": db_task.result if task_type_enum == TaskTypeEnum.VOICE else "Текст успешно преобразован в речь",
+            "type": task_type_enum,
+            "result_file": db_task.result,
+            "cost": db_task.cost
+        }
+        if task_type_enum == TaskTypeEnum.TEXT and (db_task.result or "").startswith(MEMORY_RESULT_PREFIX):
+            # Файла нет: аудио берется из кэша TTS (при промахе - синтезируется заново)
+            result["audio"] = await self.ai_service.synthesize_audio(db_task.payload)
+        return result
+
+    async def process_task(self, task: dict) -> Optional[dict]:
+        """
+        Обработка задачи
+
+        None - задача уже доставлена пользователю (повторная доставка), отвечать не нужно.
+        Выполненная, но не доставленная задача не выполняется заново: отдается ее результат.
+        """
         user_id = task["user_id"]
         task_type = task["type"]
         data = task["data"]
@@ -53,8 +90,18 @@ class TaskService:
         if not db_task:
             raise ValueError(f"Task {task_id} not found")
             
-        # Обновляем статус задачи на processing
-        await self.db.update_task(task_id, TaskStatusEnum.PROCESSING)
+        # Обновляем статус задачи на processing (если бот ее еще не отменил и она еще не выполнена)
+        if not await self.db.claim_task(task_id):
+            if db_task.status == TaskStatusEnum.DELIVERED:
+                await self.db.log(user_id, "TASK_DUPLICATE", f"Task {task_id} already delivered, skipping", print_log=True)
+                return None
+            if db_task.status == TaskStatusEnum.COMPLETED:
+                # Выполнена, но результат мог не дойти (воркер упал или его отменили
+                # до отправки ответа) - отправляем сохраненный результат еще раз
+                await self.db.log(user_id, "TASK_REPUBLISH", f"Task {task_id} already completed, resending result", print_log=True)
+                return await self._stored_result(db_task)
+            await self.db.log(user_id, "TASK_CANCELLED", f"Task {task_id} was cancelled, skipping", print_log=True)
+            return self._cancelled(task_id, task_type)
         await self.db.log(user_id, "TASK_STARTED", f"Processing {task_type} task with task_id: {task_id}", print_log=True)
         
         # Конвертируем тип задачи в enum
@@ -95,12 +142,10 @@ class TaskService:
             await self.db.log(user_id, "TASK_DEBUG", f"Saved text result for task_id: {task_id}", print_log=True)
             
             await self.db.log(user_id, "TASK_DEBUG", f"Updating task status to completed for task_id: {task_id}", print_log=True)
-            await self.db.update_task(
-                task_id=task_id,
-                status=TaskStatusEnum.COMPLETED,
-                result=text,
-                cost=cost
-            )
+            if not await self.db.complete_task(task_id, result=text, cost=cost):
+                # Пока распознавали, задачу отменили - результат не нужен
+                await self.db.log(user_id, "TASK_CANCELLED", f"Task {task_id} was cancelled during processing", print_log=True)
+                return self._cancelled(task_id, task_type)
             
             await self.db.log(user_id, "TASK_COMPLETED", f"Task {task_type} completed successfully with task_id: {task_id}", print_log=True)
             return {
@@ -129,7 +174,13 @@ class TaskService:
             
             # Преобразуем текст в речь
             await self.db.log(user_id, "TASK_DEBUG", f"Starting TTS for task_id: {task_id}", print_log=True)
-            result_file = await self.ai_service.text_to_speech(text_content, user_id, task_id)
+            audio = None
+            if self.tts_in_memory:
+                audio = await self.ai_service.synthesize_audio(text_content)
+                # Файла нет - в задаче сохраняем только размер результата
+                result_file = f"{MEMORY_RESULT_PREFIX}{len(audio)}"
+            else:
+                result_file = await self.ai_service.text_to_speech(text_content, user_id, task_id)
             await self.db.log(user_id, "TASK_DEBUG", f"Completed TTS for task_id: {task_id}", print_log=True)
             
             # Списываем кредиты и обновляем задачу
@@ -138,20 +189,21 @@ class TaskService:
             # await self.db.log(user_id, "BALANCE_UPDATED", f"Spent {cost} credits for TTS", print_log=True)
             
             await self.db.log(user_id, "TASK_DEBUG", f"Updating task status to completed for task_id: {task_id}", print_log=True)
-            await self.db.update_task(
-                task_id=task_id,
-                status=TaskStatusEnum.COMPLETED,
-                result=result_file,
-                cost=cost
-            )
+            if not await self.db.complete_task(task_id, result=result_file, cost=cost):
+                # Пока синтезировали, задачу отменили - результат не нужен
+                await self.db.log(user_id, "TASK_CANCELLED", f"Task {task_id} was cancelled during processing", print_log=True)
+                return self._cancelled(task_id, task_type)
             
             await self.db.log(user_id, "TASK_COMPLETED", f"Task {task_type} completed successfully with task_id: {task_id}", print_log=True)
-            return {
+            result = {
                 "status": "success",
                 "message": "Текст успешно преобразован в речь",
                 "type": task_type_enum,
                 "result_file": result_file,
                 "cost": cost
             }
+            if audio is not None:
+                result["audio"] = audio
+            return result
         else:
             raise ValueError(f"Unknown task type: {task_type}") 
\ No newline at end of file
@@ -0,0 +1,5 @@
+# Параметры синтеза (входят в ключ кэша TTS и Telegram file_id).
+# Отдельный модуль: боту они нужны без AIService и клиента SpeechKit
+TTS_VOICE = "alena"
+TTS_LANG = "ru-RU"
+TTS_FORMAT = "oggopus"
@@ -7,6 +7,8 @@ setup(
     install_requires=[
         "aio-pika==9.3.0",
         "aiogram==3.3.0",
+        "aiohttp==3.9.5",
+        "beautifulsoup4==4.12.2",
         "SQLAlchemy==2.0.23",
         "alembic==1.13.0",
         "asyncpg==0.29.0",
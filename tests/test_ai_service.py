@@ -0,0 +1,90 @@
+import asyncio
+
+from db.database import Database
+from services.ai_service import AIService
+from utils.single_flight import SingleFlight
+
+
+class EvictingCache:
+    """Кэш, из которого файл пропадает между contains()/get() и чтением"""
+
+    def __init__(self, tmp_path):
+        self.path = tmp_path / "evicted.ogg"
+        self.stored = {}
+
+    async def contains(self, key):
+        return True
+
+    async def get(self, key):
+        # Путь отдаем, но файла уже нет - его вытеснили
+        return self.path
+
+    async def put_bytes(self, key, data):
+        self.stored[key] = data
+
+
+class FakeSpeech:
+    def __init__(self):
+        self.calls = 0
+
+    async def synthesize(self, text, voice, lang):
+        self.calls += 1
+        return b"audio"
+
+
+class FakeClaims:
+    """Заглушка Database: заявка занята другим воркером, пока не освободится"""
+
+    def __init__(self, busy_polls: int):
+        self.busy_polls = busy_polls
+        self.released = []
+
+    async def try_claim(self, name, ttl):
+        self.busy_polls -= 1
+        return self.busy_polls < 0
+
+    async def release_claim(self, name):
+        self.released.append(name)
+
+    claim = Database.claim
+
+
+def make_service(tmp_path, db=None) -> AIService:
+    service = AIService.__new__(AIService)
+    service.audio_cache = EvictingCache(tmp_path)
+    service.speech_service = FakeSpeech()
+    service.tts_flight = SingleFlight()
+    service.db = db
+    service.cross_worker_wait_timeout = 5
+    service.cross_worker_claim_ttl = 60
+    service.cross_worker_collapsed = 0
+    return service
+
+
+def test_evicted_cache_entry_is_synthesized_again(tmp_path):
+    service = make_service(tmp_path)
+    assert asyncio.run(service.synthesize_audio("анекдот")) == b"audio"
+    assert service.speech_service.calls == 1
+
+
+def test_claim_is_polled_and_released(tmp_path):
+    async def scenario():
+        db = FakeClaims(busy_polls=2)
+        async with db.claim("tts:key", timeout=5, poll_interval=0) as claimed:
+            assert claimed
+        assert db.released == ["tts:key"]
+
+        # Заявка так и не освободилась: работаем без нее и ничего не отпускаем
+        db = FakeClaims(busy_polls=10 ** 6)
+        async with db.claim("tts:key", timeout=0.05, poll_interval=0.01) as claimed:
+            assert not claimed
+        assert db.released == []
+
+    asyncio.run(scenario())
+
+
+def test_cross_worker_path_survives_eviction(tmp_path):
+    service = make_service(tmp_path, db=FakeClaims(busy_polls=0))
+    assert asyncio.run(service.synthesize_audio("анекдот")) == b"audio"
+    assert service.cross_worker_collapsed == 0
+    assert service.db.released == [f"tts:{next(iter(service.audio_cache.stored))}"]
@@ -0,0 +1,40 @@
+import asyncio
+import sqlite3
+
+from utils.audio_cache import AudioCache
+
+
+def test_running_total_and_eviction(tmp_path):
+    async def scenario():
+        cache = AudioCache(str(tmp_path), max_bytes=250, eviction_grace=0)
+        await cache.put_bytes("a", b"x" * 100)
+        await cache.put_bytes("b", b"x" * 100)
+        # Перезапись того же ключа меняет размер, а не добавляет запись
+        await cache.put_bytes("b", b"x" * 120)
+        assert cache.stats()["entries"] == 2
+        assert cache.stats()["bytes"] == 220
+
+        # Вытесняется самый давно использованный файл
+        await cache.put_bytes("c", b"x" * 100)
+        assert not await cache.contains("a")
+        assert await cache.get("b") is not None
+        assert cache.stats()["bytes"] == 220
+
+        db = sqlite3.connect(tmp_path / "index.db")
+        assert db.execute("SELECT SUM(size) FROM entries").fetchone()[0] == 220
+
+    asyncio.run(scenario())
+
+
+def test_access_time_is_flushed_in_batches(tmp_path):
+    async def scenario():
+        cache = AudioCache(str(tmp_path), max_bytes=10_000, access_flush_interval=3600)
+        await cache.put_bytes("a", b"x")
+        db = sqlite3.connect(tmp_path / "index.db")
+        written = db.execute("SELECT last_access FROM entries WHERE key = 'a'").fetchone()[0]
+
+        assert await cache.get("a") is not None
+        assert db.execute("SELECT last_access FROM entries WHERE key = 'a'").fetchone()[0] == written
+        assert "a" in cache._pending_access
+
+    asyncio.run(scenario())
@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+from services import billing_service
+from services.billing_service import BillingService
+
+
+class FakeDatabase:
+    """Заглушка Database: считает запросы к БД"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_task(self, task_id):
+        self.calls.append(("get_task", task_id))
+
+    async def adjust_balance(self, user_id, delta, reason, task_id=None):
+        self.calls.append(("adjust_balance", user_id, delta, task_id))
+        return SimpleNamespace(balance=10 + delta)
+
+
+def make_service(monkeypatch) -> BillingService:
+    monkeypatch.setattr(billing_service, "Database", FakeDatabase)
+    return BillingService()
+
+
+def test_charge_is_a_single_balance_update(monkeypatch):
+    service = make_service(monkeypatch)
+    balance = asyncio.run(service.charge_for_task("task-1", user_id=42, cost=3))
+    assert balance.balance == 7
+    assert service.db.calls == [("adjust_balance", 42, -3, "task-1")]
+
+
+def test_task_without_cost_is_not_charged(monkeypatch):
+    service = make_service(monkeypatch)
+    assert asyncio.run(service.charge_for_task("task-1", user_id=42, cost=None)) is None
+    assert service.db.calls == []
@@ -0,0 +1,35 @@
+import asyncio
+
+from utils.blob_store import LocalBlobStore, PostgresBlobStore
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.saved = {}
+
+    async def save_audio_blob(self, blob_id, data):
+        self.saved[blob_id] = data
+
+    async def pop_audio_blob(self, blob_id):
+        return self.saved.pop(blob_id, None)
+
+
+def test_local_store_round_trip(tmp_path):
+    async def scenario():
+        store = LocalBlobStore(str(tmp_path))
+        ref = await store.put(memoryview(b"audio"))
+        assert await store.pop(ref) == b"audio"
+        assert await store.pop(ref) is None
+        assert list(tmp_path.iterdir()) == []
+
+    asyncio.run(scenario())
+
+
+def test_postgres_store_passes_buffer_without_copy():
+    async def scenario():
+        db = FakeDatabase()
+        audio = memoryview(b"audio")
+        ref = await PostgresBlobStore(db).put(audio)
+        assert db.saved[ref] is audio
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.joke_crawler import JokeCrawler, JokeSource, ValidatorCache
+
+PAGES_WITH_JOKES = 5
+JOKES_PER_PAGE = 2
+
+
+def make_app(requests: list[tuple[int, int]]) -> web.Application:
+    """Сайт-фикстура: страницы 1..5 с анекдотами, дальше пустые; ETag и 304"""
+
+    async def page(request: web.Request) -> web.Response:
+        number = int(request.match_info["number"])
+        etag = f'"page-{number}"'
+        if request.headers.get("If-None-Match") == etag:
+            requests.append((number, 304))
+            return web.Response(status=304, headers={"ETag": etag})
+        requests.append((number, 200))
+        jokes = ""
+        if number <= PAGES_WITH_JOKES:
+            jokes = "".join(f'<div class="joke">Анекдот {number}.{i}</div>' for i in range(JOKES_PER_PAGE))
+        return web.Response(text=f"<html><body>{jokes}</body></html>", content_type="text/html", headers={"ETag": etag})
+
+    app = web.Application()
+    app.router.add_get("/page/{number}", page)
+    return app
+
+
+async def crawl(server: TestServer, cache: ValidatorCache) -> list[dict]:
+    source = JokeSource(
+        name="fixture",
+        url=str(server.make_url("/page/1")),
+        css_class="joke",
+        page_url=str(server.make_url("/page/")) + "{page}",
+        max_pages=10,
+    )
+    # Одна страница за раз - порядок запросов детерминирован
+    crawler = JokeCrawler([source], per_host_concurrency=1, per_host_rate=1000, validator_cache=cache)
+    return [joke async for joke in crawler.crawl()]
+
+
+async def crawl_twice(tmp_path) -> None:
+    requests: list[tuple[int, int]] = []
+    server = TestServer(make_app(requests))
+    await server.start_server()
+    try:
+        jokes = await crawl(server, ValidatorCache(tmp_path / "validators.json"))
+        assert len(jokes) == PAGES_WITH_JOKES * JOKES_PER_PAGE
+        assert requests == [(number, 200) for number in range(1, 7)]
+
+        # Второй запуск с сохраненными валидаторами: страницы с анекдотами - 304,
+        # пустая страница 6 скачивается заново и останавливает обход
+        requests.clear()
+        jokes = await crawl(server, ValidatorCache(tmp_path / "validators.json"))
+        assert jokes == []
+        assert requests == [(number, 304) for number in range(1, 6)] + [(6, 200)]
+    finally:
+        await server.close()
+
+
+def test_second_run_stops_at_empty_page(tmp_path):
+    asyncio.run(crawl_twice(tmp_path))
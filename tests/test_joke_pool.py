@@ -0,0 +1,55 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from services.joke_pool import MAX_SEEN_SKIPS, JokePool
+from utils.seen_set import SeenSet
+
+
+class FakeJokeService:
+    """Заглушка JokeService: анекдоты с id 1..n, прямые запросы считаются"""
+
+    def __init__(self):
+        self.direct = 0
+
+    async def get_random_jokes(self, count, category=None):
+        return [SimpleNamespace(id=i) for i in range(1, count + 1)]
+
+    async def get_random_joke(self, seen=None):
+        self.direct += 1
+        return SimpleNamespace(id=0)
+
+
+def test_seen_fallback_is_not_an_underflow():
+    async def scenario():
+        service = FakeJokeService()
+        pool = JokePool(service, size=20, low_water=5)
+        now = time.monotonic()
+        pool._pool(None).extend((now, SimpleNamespace(id=i)) for i in range(1, 21))
+
+        joke = await pool.get_joke(seen=SeenSet(range(1, 21)))
+        assert joke.id == 0 and service.direct == 1
+        stats = pool.stats()
+        assert stats["seen_fallbacks"] == 1
+        assert stats["underflows"] == 0
+        assert stats["seen_skipped"] == MAX_SEEN_SKIPS
+        # Пропущенные вернулись в пул, он выше low_water - долив не нужен
+        assert stats["pools"]["*"] == 20
+        assert not pool._refill_needed.is_set()
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+
+def test_empty_pool_is_an_underflow():
+    async def scenario():
+        service = FakeJokeService()
+        pool = JokePool(service, size=20, low_water=5)
+
+        await pool.get_joke()
+        assert pool.stats()["underflows"] == 1
+        assert pool.stats()["seen_fallbacks"] == 0
+        assert pool._refill_needed.is_set()
+        await pool.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+from utils.minhash import (
+    BANDS, NUM_PERM, lsh_buckets, minhash_signature, signature_from_bytes, signature_to_bytes, similarity
+)
+
+JOKE = (
+    "Встречаются два программиста. Один говорит: у меня код работает, а я не знаю почему. "
+    "Второй отвечает: а у меня не работает, и я тоже не знаю почему."
+)
+
+
+def test_signature_ignores_case_and_punctuation():
+    signature = minhash_signature(JOKE)
+    assert len(signature) == NUM_PERM
+    assert minhash_signature(JOKE.upper().replace(".", "!")) == signature
+    assert signature_from_bytes(signature_to_bytes(signature)) == signature
+
+
+def test_near_duplicate_shares_a_bucket():
+    original = minhash_signature(JOKE)
+    edited = minhash_signature(JOKE.replace("Второй отвечает", "Другой отвечает"))
+    unrelated = minhash_signature("Колобок повесился. Штирлиц долго смотрел в окно, потом пошел спать.")
+
+    assert similarity(original, edited) > 0.7
+    assert similarity(original, unrelated) < 0.2
+    assert set(lsh_buckets(original)) & set(lsh_buckets(edited))
+    assert not set(lsh_buckets(original)) & set(lsh_buckets(unrelated))
+
+
+def test_buckets_are_distinct_per_band():
+    buckets = lsh_buckets(minhash_signature(JOKE))
+    assert len(buckets) == BANDS
+    assert len(set(buckets)) == BANDS
+    assert all(-2 ** 63 <= bucket < 2 ** 63 for bucket in buckets)
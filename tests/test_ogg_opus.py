@@ -0,0 +1,66 @@
+import struct
+
+from utils.ogg_opus import OggPage, concat_ogg_opus, ogg_crc, parse_pages
+
+BOS = 0x02
+EOS = 0x04
+
+
+def make_stream(serial: int, audio_granules: list[int]) -> bytes:
+    """Ogg Opus поток-фикстура: OpusHead, OpusTags и страницы аудио по одному пакету"""
+    pages = [
+        OggPage(BOS, 0, serial, 0, bytes([19]), b"OpusHead" + bytes(11)),
+        OggPage(0, 0, serial, 1, bytes([16]), b"OpusTags" + bytes(8)),
+    ]
+    for number, granule in enumerate(audio_granules):
+        flags = EOS if number == len(audio_granules) - 1 else 0
+        pages.append(OggPage(flags, granule, serial, number + 2, bytes([3]), bytes([serial, number, 0])))
+    return b"".join(page.to_bytes() for page in pages)
+
+
+def test_concat_makes_one_logical_stream():
+    first = make_stream(11, [960, 1920])
+    second = make_stream(22, [960, 1920, 2880])
+    pages = parse_pages(concat_ogg_opus([first, second]))
+
+    # Заголовки только от первой части, затем все страницы аудио
+    assert len(pages) == 2 + 2 + 3
+    assert {page.serial for page in pages} == {11}
+    assert [page.sequence for page in pages] == list(range(len(pages)))
+    assert [page.granule for page in pages] == [0, 0, 960, 1920, 2880, 3840, 4800]
+    assert [page.body[:1] for page in pages[2:]] == [bytes([11])] * 2 + [bytes([22])] * 3
+
+    # BOS - только у первой страницы, EOS - только у последней
+    assert [page.flags & BOS != 0 for page in pages] == [True] + [False] * 6
+    assert [page.flags & EOS != 0 for page in pages] == [False] * 6 + [True]
+
+
+def test_pages_have_valid_crc():
+    data = concat_ogg_opus([make_stream(1, [960]), make_stream(2, [960])])
+    offset = 0
+    for page in parse_pages(data):
+        raw = bytearray(data[offset:offset + 27 + len(page.segments) + len(page.body)])
+        stored = struct.unpack_from("<I", raw, 22)[0]
+        struct.pack_into("<I", raw, 22, 0)
+        assert ogg_crc(bytes(raw)) == stored
+        offset += len(raw)
+    assert offset == len(data)
+
+
+def test_single_stream_is_returned_as_is():
+    stream = make_stream(5, [960])
+    assert concat_ogg_opus([stream]) is stream
+
+
+def test_crc_matches_bitwise_definition():
+    def reference(data: bytes) -> int:
+        crc = 0
+        for byte in data:
+            crc ^= byte << 24
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+                crc &= 0xFFFFFFFF
+        return crc
+
+    for data in (b"", b"OggS", bytes(range(256)) * 3):
+        assert ogg_crc(data) == reference(data)
@@ -0,0 +1,79 @@
+import asyncio
+import signal
+import time
+
+from prometheus_client import CollectorRegistry, generate_latest
+
+from utils.process_supervisor import ProcessSupervisor, _LocalCollector, processes_from_env
+
+
+# Функции дочерних процессов: запускаются через spawn, поэтому на уровне модуля
+def crash(index, stats_queue):
+    raise SystemExit(3)
+
+
+def sleep_forever(index, stats_queue):
+    time.sleep(60)
+
+
+def test_crashed_child_is_restarted_with_backoff():
+    supervisor = ProcessSupervisor(crash, 1, restart_base_delay=0.0, restart_reset=3600)
+    child = supervisor.children[0]
+    supervisor._start(child)
+    child.process.join(10)
+    assert child.process.exitcode == 3
+
+    # Первая проверка замечает падение и планирует перезапуск, вторая - перезапускает
+    supervisor._check(child)
+    assert child.failures == 1 and child.restart_at is not None
+    supervisor._check(child)
+    assert child.restarts == 1 and child.restart_at is None
+    child.process.join(10)
+
+    # Повторное падение подряд - пауза удваивается
+    supervisor.restart_base_delay = 1.0
+    supervisor._check(child)
+    assert child.failures == 2
+    assert child.restart_at - time.monotonic() > 1.5
+
+
+def test_drain_forwards_sigterm():
+    supervisor = ProcessSupervisor(sleep_forever, 2, drain_timeout=10)
+    for child in supervisor.children:
+        supervisor._start(child)
+    asyncio.run(supervisor._drain())
+    assert [child.process.exitcode for child in supervisor.children] == [-signal.SIGTERM] * 2
+
+
+def test_children_stats_in_health_and_metrics():
+    supervisor = ProcessSupervisor(sleep_forever, 2)
+    supervisor.stats_queue.put({"index": 1, "stats": {"tasks": {"processed": 3}, "note": "text"}})
+    deadline = time.monotonic() + 5
+    while not supervisor.children[1].stats and time.monotonic() < deadline:
+        supervisor._collect_stats()
+        time.sleep(0.01)
+
+    health = supervisor.health()
+    assert health["alive"] == 0
+    assert health["children"][1]["stats"] == {"tasks": {"processed": 3}, "note": "text"}
+
+    metrics = generate_latest(supervisor.registry).decode()
+    assert 'worker_tasks_processed{worker="1"} 3.0' in metrics
+    assert 'worker_process_alive{worker="0"} 0.0' in metrics
+    assert "note" not in metrics
+
+
+def test_processes_from_env(monkeypatch):
+    monkeypatch.setenv("WORKER_PROCESSES", "3")
+    assert processes_from_env() == 3
+    monkeypatch.setenv("WORKER_PROCESSES", "auto")
+    assert processes_from_env() >= 1
+
+
+def test_single_process_metrics_match_supervisor():
+    registry = CollectorRegistry()
+    registry.register(_LocalCollector("worker", lambda: {"tasks": {"processed": 2}, "note": "text"}))
+    metrics = generate_latest(registry).decode()
+    assert 'worker_tasks_processed{worker="0"} 2.0' in metrics
+    assert 'worker_process_alive{worker="0"} 1.0' in metrics
+    assert "note" not in metrics
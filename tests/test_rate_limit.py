@@ -0,0 +1,38 @@
+import asyncio
+
+from utils.rate_limit import AdaptiveTokenBucket, TokenBucket
+
+
+def test_fractional_capacity_still_grants_requests():
+    async def scenario():
+        # Например SPEECHKIT_BURST=5 на 8 процессов - 0.625 на процесс
+        bucket = TokenBucket(rate=100, capacity=0.625)
+        for _ in range(3):
+            await asyncio.wait_for(bucket.acquire(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_adaptive_rate_halves_on_throttle_and_grows_back():
+    bucket = AdaptiveTokenBucket(rate=8, min_rate=1, increase_step=1, decrease_cooldown=60)
+    bucket.on_throttle()
+    assert bucket.rate == 4
+    # Пачка ответов на уже отправленные запросы не снижает скорость повторно
+    bucket.on_throttle()
+    assert bucket.rate == 4
+    assert bucket.throttled == 2
+
+    bucket._increased_at -= 2
+    bucket.on_success()
+    assert bucket.rate == 5
+    for _ in range(10):
+        bucket._increased_at -= 1
+        bucket.on_success()
+    assert bucket.rate == bucket.max_rate == 8
+
+
+def test_adaptive_rate_not_below_min_rate():
+    bucket = AdaptiveTokenBucket(rate=2, min_rate=1.5, decrease_cooldown=0)
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 1.5
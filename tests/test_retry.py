@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from utils import retry
+from utils.retry import backoff_delay, retry_with_backoff
+
+
+class Transient(Exception):
+    pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Задержки вместо настоящего ожидания"""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    for attempt in range(10):
+        delays = [backoff_delay(attempt, 0.2, 5.0) for _ in range(200)]
+        assert all(0 <= delay <= min(5.0, 0.2 * 2 ** attempt) for delay in delays)
+    # Полный джиттер: задержки разбросаны от нуля до потолка, а не одинаковые
+    assert len({round(backoff_delay(3, 0.2, 5.0), 6) for _ in range(20)}) > 1
+
+
+def test_retries_transient_errors_until_success(sleeps):
+    calls = 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise Transient()
+        return "audio"
+
+    result = asyncio.run(retry_with_backoff(flaky, lambda e: isinstance(e, Transient), retries=3))
+    assert result == "audio"
+    assert calls == 3
+    assert len(sleeps) == 2
+
+
+def test_gives_up_after_retries_and_on_permanent_errors(sleeps):
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        raise Transient()
+
+    with pytest.raises(Transient):
+        asyncio.run(retry_with_backoff(failing, lambda e: isinstance(e, Transient), retries=2))
+    assert calls == 3
+
+    calls = 0
+    with pytest.raises(Transient):
+        asyncio.run(retry_with_backoff(failing, lambda e: False, retries=2))
+    assert calls == 1
+
+
+def test_retry_after_and_deadline(sleeps):
+    async def failing():
+        raise Transient()
+
+    with pytest.raises(Transient):
+        asyncio.run(retry_with_backoff(
+            failing, lambda e: True, retries=2, base_delay=0.01, retry_after=lambda e: 3.0
+        ))
+    # Сервер просит подождать дольше нашей задержки - ждем сколько просит
+    assert sleeps == [3.0, 3.0]
+
+    sleeps.clear()
+    loop_time = retry.time.monotonic()
+    with pytest.raises(Transient):
+        asyncio.run(retry_with_backoff(
+            failing, lambda e: True, retries=5, retry_after=lambda e: 10.0, deadline=loop_time + 1
+        ))
+    # Повтор не уложился бы в дедлайн - сразу отдаем ошибку
+    assert sleeps == []
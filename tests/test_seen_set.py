@@ -0,0 +1,80 @@
+from array import array
+
+from services import joke_service
+from services.joke_service import JokeService
+from utils.seen_set import SeenSet
+
+
+def test_serialized_size_does_not_depend_on_add_order():
+    ascending = SeenSet()
+    ascending.add(3)
+    ascending.add(999_999)
+
+    descending = SeenSet()
+    descending.add(999_999)
+    descending.add(3)
+
+    # Два id - массив uint32 (1 байт формата + 2 * 4), а не битовая карта до 999_999
+    assert len(ascending.to_bytes()) == 9
+    assert len(descending.to_bytes()) == 9
+    for seen in (ascending, descending):
+        assert 3 in seen and 999_999 in seen and 4 not in seen
+        assert len(seen) == 2
+
+
+def test_dense_ids_use_bitmap_and_round_trip():
+    seen = SeenSet(range(1000))
+    data = seen.to_bytes()
+    assert len(data) == 1 + 125
+
+    restored = SeenSet.from_bytes(data)
+    assert len(restored) == 1000
+    assert all(joke_id in restored for joke_id in range(1000))
+
+    # Большой id: битовая карта выросла бы до 125 КБ - возвращаемся к массиву
+    restored.add(999_999)
+    assert len(restored.to_bytes()) == 1 + 1001 * 4
+    assert 999_999 in restored and 500 in restored and 1000 not in restored
+
+
+def test_cursors_survive_serialization(monkeypatch):
+    # Без случайных проб каждый выбор идет через обход
+    monkeypatch.setattr(joke_service, "MAX_UNSEEN_SAMPLES", 0)
+    ids = array("q", range(1, 101))
+    seen = SeenSet(range(1, 91))
+    picked = {JokeService._pick_id(ids, seen) for _ in range(5)}
+    assert picked <= set(range(91, 101))
+    cursor = seen.cursors[None]
+    assert cursor.position > 0
+
+    seen.cursors["Штирлиц"] = seen.cursors[None]
+    restored = SeenSet.from_bytes(seen.to_bytes())
+    assert len(restored) == 90 and 90 in restored and 91 not in restored
+    assert set(restored.cursors) == {None, "Штирлиц"}
+    for key in (None, "Штирлиц"):
+        saved = restored.cursors[key]
+        assert (saved.offset, saved.stride, saved.size, saved.position, saved.last_id) == (
+            cursor.offset, cursor.stride, cursor.size, cursor.position, cursor.last_id
+        )
+
+
+def test_new_jokes_extend_the_cursor(monkeypatch):
+    monkeypatch.setattr(joke_service, "MAX_UNSEEN_SAMPLES", 0)
+    ids = array("q", range(1, 101))
+    seen = SeenSet(range(1, 101))
+    assert JokeService._pick_id(ids, seen) is None
+    cursor = seen.cursors[None]
+
+    # Добавился анекдот - обход продолжается с его позиции, а не заново
+    ids.append(101)
+    assert JokeService._pick_id(ids, seen) == 101
+    assert seen.cursors[None] is cursor
+    assert cursor.position == 101
+
+    # Анекдот удалили - позиции сдвинулись, обход начинается заново
+    del ids[0]
+    seen.add(101)
+    seen.add(102)
+    ids.append(102)
+    assert JokeService._pick_id(ids, seen) is None
+    assert seen.cursors[None] is not cursor
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_follower_survives_leader_cancellation():
+    async def scenario():
+        flight = SingleFlight()
+        started = 0
+        release = asyncio.Event()
+
+        async def fetch():
+            nonlocal started
+            started += 1
+            await release.wait()
+            return "audio"
+
+        leader = asyncio.create_task(flight.do("joke", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("joke", fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+        release.set()
+        assert await follower == "audio"
+        assert started == 1
+        assert flight.stats() == {"calls": 2, "collapsed": 1, "in_flight": 0}
+
+    asyncio.run(scenario())
+
+
+def test_shared_call_cancelled_when_nobody_waits():
+    async def scenario():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do("joke", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flight.stats()["in_flight"] == 0
+
+        # Следующий вызов с тем же ключом идет заново
+        async def fresh():
+            return "again"
+
+        assert await flight.do("joke", fresh) == "again"
+
+    asyncio.run(scenario())
+
+
+def test_exception_is_shared():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("tts failed")
+
+        results = await asyncio.gather(
+            flight.do("joke", fail), flight.do("joke", fail), return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats()["collapsed"] == 1
+
+    asyncio.run(scenario())
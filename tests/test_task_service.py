@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+from models.task import TaskStatusEnum
+from models.task_types import TaskTypeEnum
+from services.task_service import TaskService
+
+
+class FakeDatabase:
+    """Заглушка Database: задача уже не захватывается (выполнена или доставлена)"""
+
+    def __init__(self, db_task):
+        self.db_task = db_task
+        self.events = []
+
+    async def log(self, user_id, event, message, print_log=False):
+        self.events.append(event)
+
+    async def get_user(self, user_id):
+        return SimpleNamespace(id=user_id)
+
+    async def get_task(self, task_id):
+        return self.db_task
+
+    async def claim_task(self, task_id):
+        return False
+
+
+class FakeAIService:
+    def __init__(self):
+        self.synthesized = []
+
+    async def synthesize_audio(self, text):
+        self.synthesized.append(text)
+        return b"OggS" + text.encode()
+
+
+def make_service(db_task) -> TaskService:
+    service = TaskService.__new__(TaskService)
+    service.db = FakeDatabase(db_task)
+    service.ai_service = FakeAIService()
+    return service
+
+
+def make_task(status, task_type=TaskTypeEnum.TEXT, result="memory:10"):
+    return SimpleNamespace(id="task-1", user_id=42, type=task_type.value, status=status,
+                           payload="шутка", result=result, cost=2)
+
+
+def process(service):
+    task = {"user_id": 42, "type": service.db.db_task.type, "data": "шутка", "task_id": "task-1"}
+    return asyncio.run(service.process_task(task))
+
+
+def test_delivered_task_is_skipped():
+    service = make_service(make_task(TaskStatusEnum.DELIVERED))
+    assert process(service) is None
+    assert service.ai_service.synthesized == []
+
+
+def test_completed_task_in_memory_resends_audio():
+    service = make_service(make_task(TaskStatusEnum.COMPLETED))
+    result = process(service)
+    assert result["status"] == "success"
+    assert result["audio"] == "OggSшутка".encode()
+    assert result["cost"] == 2
+    assert "TASK_REPUBLISH" in service.db.events
+
+
+def test_completed_task_with_file_resends_path():
+    service = make_service(make_task(TaskStatusEnum.COMPLETED, result="/data/audio/task-1.ogg"))
+    result = process(service)
+    assert result["result_file"] == "/data/audio/task-1.ogg"
+    assert "audio" not in result
+    assert service.ai_service.synthesized == []
+
+
+def test_completed_stt_task_resends_text():
+    service = make_service(make_task(TaskStatusEnum.COMPLETED, TaskTypeEnum.VOICE, result="распознанный текст"))
+    result = process(service)
+    assert result["message"] == "распознанный текст"
+    assert result["type"] == TaskTypeEnum.VOICE
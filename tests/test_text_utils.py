@@ -0,0 +1,19 @@
+from utils.text_utils import _utf16_len, join_within_limit
+
+SEPARATOR = "\n\n———\n\n"
+
+
+def test_short_texts_are_joined_as_is():
+    assert join_within_limit(["раз", "два"], SEPARATOR, 4096) == "раз" + SEPARATOR + "два"
+
+
+def test_long_texts_are_truncated_to_fit():
+    texts = ["короткий анекдот", "а" * 3000, "б😀" * 2000]
+    page = join_within_limit(texts, SEPARATOR, 4096)
+    assert _utf16_len(page) <= 4096
+
+    short, first, second = page.split(SEPARATOR)
+    assert short == "короткий анекдот"
+    # Остаток лимита делится между длинными поровну
+    assert first.endswith("…") and second.endswith("…")
+    assert abs(_utf16_len(first) - _utf16_len(second)) <= 2
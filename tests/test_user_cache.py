@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from db.user_cache import UserCache
+
+
+def snapshot(balance: int):
+    return SimpleNamespace(role="CHILL_BOY"), SimpleNamespace(balance=balance)
+
+
+def test_lru_eviction_and_counters():
+    cache = UserCache(max_size=2, ttl=60)
+    cache.put(1, *snapshot(10))
+    cache.put(2, *snapshot(20))
+    assert cache.get(1) is not None  # 1 теперь самый свежий
+    cache.put(3, *snapshot(30))
+
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+    assert cache.stats() == {
+        "size": 2, "hits": 3, "misses": 1, "evictions": 1, "expirations": 0, "invalidations": 0,
+    }
+
+
+def test_expired_entry_is_a_miss():
+    cache = UserCache(max_size=10, ttl=-1)
+    cache.put(1, *snapshot(10))
+    assert cache.get(1) is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_balance_update_and_invalidation():
+    cache = UserCache(max_size=10, ttl=60)
+    cache.put(1, *snapshot(10))
+    cache.update_balance(1, SimpleNamespace(balance=7))
+    cache.update_balance(2, SimpleNamespace(balance=99))  # пользователя нет в кэше - ничего не делаем
+
+    user, balance = cache.get(1)
+    assert balance.balance == 7
+    assert cache.get(2) is None
+
+    cache.invalidate(1)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    assert cache.stats()["invalidations"] == 1
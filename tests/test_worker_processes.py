@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+pytest.importorskip("aio_pika")
+
+from worker import worker
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ("SPEECHKIT_TTS_RATE", "SPEECHKIT_STT_RATE", "SPEECHKIT_MIN_RATE", "SPEECHKIT_BURST"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("DB_POOL_SIZE", "100")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+    monkeypatch.setattr(worker, "WORKER_CONCURRENCY", 8)
+    monkeypatch.setattr(worker, "WORKER_MAX_PROCESSES", 8)
+    return monkeypatch
+
+
+def test_rates_are_split_and_burst_stays_at_least_one(env):
+    assert worker.configure_processes(8) == 8
+    assert float(os.environ["SPEECHKIT_TTS_RATE"]) == 5.0
+    assert float(os.environ["SPEECHKIT_MIN_RATE"]) == 0.125
+    # 5 / 8 < 1: bucket с такой емкостью не выдал бы ни одного токена
+    assert float(os.environ["SPEECHKIT_BURST"]) == 1.0
+    assert os.environ["DB_POOL_SIZE"] == "9"
+
+
+def test_pool_shrinks_to_fit_db_budget(env):
+    env.setenv("DB_POOL_SIZE", "20")
+    env.setenv("DB_MAX_OVERFLOW", "10")
+    # Процессов столько, сколько запрошено; 30 соединений делятся на 8 пулов по 3
+    assert worker.configure_processes(8) == 8
+    assert os.environ["DB_POOL_SIZE"] == "3"
+    assert os.environ["DB_MAX_OVERFLOW"] == "0"
+
+
+def test_processes_limited_by_max_processes(env):
+    assert worker.configure_processes(32) == 8
+
+
+def test_single_process_keeps_settings(env):
+    assert worker.configure_processes(1) == 1
+    assert os.environ["DB_POOL_SIZE"] == "100"
+    assert "SPEECHKIT_BURST" not in os.environ
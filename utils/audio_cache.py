@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+
+def tts_cache_key(text: str, voice: str, lang: str, audio_format: str) -> str:
+    """Ключ кэша: sha256 от текста (с нормализованными пробелами) и параметров синтеза"""
+    normalized = " ".join(text.split())
+    payload = "\x00".join([normalized, voice, lang, audio_format])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Контентно-адресуемый дисковый кэш синтезированного аудио
+
+    Файлы лежат в cache_dir как <key>.<ext>, метаданные (размер, время
+    последнего обращения) - в SQLite index.db рядом, поэтому кэш переживает
+    перезапуск и может использоваться несколькими процессами воркера.
+    При превышении max_bytes удаляются давно не использованные файлы.
+
+    Работа с индексом и файлами идет в asyncio.to_thread и не блокирует
+    цикл событий. Время обращения копится в памяти и пишется пачкой не чаще
+    раза в access_flush_interval секунд. Суммарный размер хранится в таблице
+    totals и поддерживается триггерами, так что put не пересчитывает SUM.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        ext: str = "ogg",
+        eviction_grace: float = 300.0,
+        access_flush_interval: float = 60.0
+    ):
+        """
+        Args:
+            cache_dir: Директория кэша
+            max_bytes: Максимальный суммарный размер файлов
+            ext: Расширение файлов
+            eviction_grace: Файлы, к которым обращались не раньше чем столько секунд назад,
+                не удаляются (их путь мог только что уйти боту)
+            access_flush_interval: Как часто записывать накопленное время обращений, секунды
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self.eviction_grace = eviction_grace
+        self.access_flush_interval = access_flush_interval
+
+        # Соединение используется из потоков to_thread - по одному за раз
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.cache_dir / "index.db", timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Схема и начальная сумма - в одной транзакции, чтобы процессы не создали их дважды
+        self._db.executescript(
+            "BEGIN IMMEDIATE;"
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, size INTEGER NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries (last_access);"
+            "CREATE TABLE IF NOT EXISTS totals ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1), entries INTEGER NOT NULL, bytes INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO totals SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM entries;"
+            "CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN"
+            " UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1; END;"
+            "CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN"
+            " UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1; END;"
+            "CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN"
+            " UPDATE totals SET bytes = bytes + NEW.size - OLD.size WHERE id = 1; END;"
+            "COMMIT;"
+        )
+
+        # Последние прочитанные из totals значения: stats() не ходит в индекс из цикла событий
+        self._entries, self._bytes = self._db.execute("SELECT entries, bytes FROM totals WHERE id = 1").fetchone()
+
+        # Время обращений, еще не записанное в индекс: key -> time.time()
+        self._pending_access: dict[str, float] = {}
+        self._access_flushed_at = time.monotonic()
+
+        # Счетчики
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.{self.ext}"
+
+    async def contains(self, key: str) -> bool:
+        """Есть ли файл в кэше (без учета обращения и счетчиков)"""
+        return await asyncio.to_thread(self._contains, key)
+
+    def _contains(self, key: str) -> bool:
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None and self.path_for(key).exists()
+
+    async def get(self, key: str) -> Optional[Path]:
+        """Путь к файлу из кэша или None"""
+        return await asyncio.to_thread(self._get, key)
+
+    def _get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        with self._lock:
+            row = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not path.exists():
+                if row is not None:
+                    # Файл удалили мимо кэша - чистим запись
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            self._pending_access[key] = time.time()
+            if time.monotonic() - self._access_flushed_at >= self.access_flush_interval:
+                self._flush_access()
+        self.hits += 1
+        return path
+
+    def _flush_access(self) -> None:
+        """Записать накопленное время обращений одним запросом (под self._lock)"""
+        if self._pending_access:
+            self._db.executemany(
+                "UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._access_flushed_at = time.monotonic()
+
+    def temp_path_for(self, key: str) -> Path:
+        """Временный путь для записи нового файла (потом put переносит его атомарно)"""
+        return self.cache_dir / f"{key}.{self.ext}.tmp-{os.getpid()}"
+
+    async def put(self, key: str, temp_path: Path) -> Path:
+        """Положить готовый файл в кэш и при необходимости вытеснить старые"""
+        return await asyncio.to_thread(self._put, key, temp_path)
+
+    def _put(self, key: str, temp_path: Path) -> Path:
+        path = self.path_for(key)
+        os.replace(temp_path, path)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO entries (key, size, created_at, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET size = excluded.size, last_access = excluded.last_access",
+                (key, path.stat().st_size, now, now)
+            )
+            self._evict()
+            self._entries, self._bytes = self._db.execute("SELECT entries, bytes FROM totals WHERE id = 1").fetchone()
+        return path
+
+    async def put_bytes(self, key: str, data: Union[bytes, memoryview]) -> Path:
+        """Записать аудио из памяти в кэш (через временный файл)"""
+        return await asyncio.to_thread(self._put_bytes, key, data)
+
+    def _put_bytes(self, key: str, data: Union[bytes, memoryview]) -> Path:
+        temp_path = self.temp_path_for(key)
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        return self._put(key, temp_path)
+
+    def _evict(self) -> None:
+        """Удалить давно не использованные файлы, пока кэш больше max_bytes (под self._lock)"""
+        total = self._db.execute("SELECT bytes FROM totals WHERE id = 1").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Перед выбором кандидатов записываем свежие обращения, чтобы не удалить нужное
+        self._flush_access()
+        protected_since = time.time() - self.eviction_grace
+        rows = self._db.execute(
+            "SELECT key, size FROM entries WHERE last_access < ? ORDER BY last_access",
+            (protected_since,)
+        )
+        for key, size in rows.fetchall():
+            if total <= self.max_bytes:
+                break
+            self.path_for(key).unlink(missing_ok=True)
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Счетчики кэша (размер - на момент последнего put)"""
+        return {
+            "entries": self._entries,
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Union
+
+
+class BlobStore(ABC):
+    """
+    Абстрактное хранилище для одноразовой передачи байтов между сервисами
+
+    Воркер кладет аудио (put) и отдает боту ссылку, бот забирает его
+    и удаляет (pop).
+    """
+
+    @abstractmethod
+    async def put(self, data: Union[bytes, memoryview]) -> str:
+        """
+        Сохраняет данные
+
+        Args:
+            data: Байты (или memoryview на них)
+
+        Returns:
+            str: Ссылка для pop
+        """
+        pass
+
+    @abstractmethod
+    async def pop(self, ref: str) -> Optional[bytes]:
+        """
+        Забирает данные и удаляет их из хранилища
+
+        Args:
+            ref: Ссылка из put
+
+        Returns:
+            Optional[bytes]: Данные или None, если их уже нет
+        """
+        pass
+
+
+class LocalBlobStore(BlobStore):
+    """Блобы файлами в общей директории (нужен общий том у бота и воркера)"""
+
+    def __init__(self, base_dir: str = "/app/data/blobs"):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+    async def put(self, data: Union[bytes, memoryview]) -> str:
+        # Файловые операции - в потоке, чтобы не блокировать цикл событий
+        return await asyncio.to_thread(self._put, data)
+
+    def _put(self, data: Union[bytes, memoryview]) -> str:
+        ref = uuid.uuid4().hex
+        temp_path = self.base_dir / f"{ref}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, self.base_dir / ref)
+        return ref
+
+    async def pop(self, ref: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._pop, ref)
+
+    def _pop(self, ref: str) -> Optional[bytes]:
+        path = self.base_dir / ref
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        path.unlink(missing_ok=True)
+        return data
+
+
+class PostgresBlobStore(BlobStore):
+    """Блобы в таблице audio_blobs (общий том не нужен)"""
+
+    def __init__(self, db, max_age: float = 3600.0, cleanup_every: int = 100):
+        """
+        Args:
+            db: Database
+            max_age: Через сколько секунд незабранный блоб считается мусором
+            cleanup_every: Раз в сколько put удалять мусор
+        """
+        self.db = db
+        self.max_age = max_age
+        self.cleanup_every = cleanup_every
+        self._puts = 0
+
+    async def put(self, data: Union[bytes, memoryview]) -> str:
+        ref = uuid.uuid4().hex
+        # asyncpg пишет bytea из любого буфера - memoryview не копируем
+        await self.db.save_audio_blob(ref, data)
+        self._puts += 1
+        if self._puts % self.cleanup_every == 0:
+            await self.db.delete_stale_audio_blobs(datetime.utcnow() - timedelta(seconds=self.max_age))
+        return ref
+
+    async def pop(self, ref: str) -> Optional[bytes]:
+        return await self.db.pop_audio_blob(ref)
+
+
+# Фабрика для создания хранилища
+def create_blob_store(
+    store_type: str = "postgres",
+    **kwargs
+) -> BlobStore:
+    """
+    Создает экземпляр хранилища блобов
+
+    Args:
+        store_type: Тип хранилища ('postgres' или 'local')
+        **kwargs: Параметры для конкретного хранилища
+
+    Returns:
+        BlobStore: Экземпляр хранилища
+    """
+    if store_type == "postgres":
+        return PostgresBlobStore(**kwargs)
+    elif store_type == "local":
+        return LocalBlobStore(**kwargs)
+    else:
+        raise ValueError(f"Unknown blob store type: {store_type}")
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+
+# Общая для процесса сессия и цикл событий, в котором она создана
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def http_settings_from_env() -> dict:
+    """Настройки пула HTTP-соединений из переменных окружения"""
+    return {
+        "limit": int(os.environ.get("HTTP_POOL_LIMIT", "100")),
+        "limit_per_host": int(os.environ.get("HTTP_POOL_LIMIT_PER_HOST", "20")),
+        "keepalive_timeout": float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", "30")),
+        "ttl_dns_cache": int(os.environ.get("HTTP_DNS_CACHE_TTL", "300")),
+    }
+
+
+# Таймауты по типам запросов (секунды на весь запрос)
+_ENDPOINT_TIMEOUTS = {
+    "tts": ("HTTP_TTS_TIMEOUT", "30"),
+    "stt": ("HTTP_STT_TIMEOUT", "30"),
+    "iam": ("HTTP_IAM_TIMEOUT", "10"),
+    "telegram_file": ("HTTP_TELEGRAM_FILE_TIMEOUT", "60"),
+}
+_CONNECT_TIMEOUT = 5
+
+
+def endpoint_timeout(endpoint: str) -> aiohttp.ClientTimeout:
+    """Таймаут для типа запроса: tts, stt, iam, telegram_file"""
+    env_name, default = _ENDPOINT_TIMEOUTS[endpoint]
+    return aiohttp.ClientTimeout(total=float(os.environ.get(env_name, default)), sock_connect=_CONNECT_TIMEOUT)
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Получить общую aiohttp-сессию процесса
+
+    Соединения (TCP + TLS) переиспользуются между запросами к SpeechKit,
+    IAM и Telegram, DNS кэшируется. Сессия создается лениво при первом
+    вызове внутри работающего цикла событий и пересоздается, если ее
+    закрыли или цикл сменился.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        settings = http_settings_from_env()
+        connector = aiohttp.TCPConnector(
+            limit=settings["limit"],
+            limit_per_host=settings["limit_per_host"],
+            keepalive_timeout=settings["keepalive_timeout"],
+            ttl_dns_cache=settings["ttl_dns_cache"],
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=60, sock_connect=_CONNECT_TIMEOUT)
+        )
+        _session_loop = loop
+    return _session
+
+
+async def close_http_session() -> None:
+    """Закрыть общую сессию (вызывать при остановке процесса)"""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
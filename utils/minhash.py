@@ -0,0 +1,72 @@
+import hashlib
+import random
+import zlib
+from array import array
+
+from utils.text_utils import normalize_joke_text
+
+# Параметры сигнатуры: NUM_PERM = BANDS * ROWS
+NUM_PERM = 64
+BANDS = 16
+ROWS = 4
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+
+# Коэффициенты перестановок фиксированы, чтобы сигнатуры в БД были сравнимы между запусками
+_rng = random.Random(20250505)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[int]:
+    """Хэши символьных k-грамм нормализованного текста"""
+    normalized = normalize_joke_text(text)
+    if len(normalized) <= size:
+        return {zlib.crc32(normalized.encode("utf-8"))}
+    return {
+        zlib.crc32(normalized[i:i + size].encode("utf-8"))
+        for i in range(len(normalized) - size + 1)
+    }
+
+
+def minhash_signature(text: str) -> array:
+    """MinHash сигнатура текста: NUM_PERM значений uint32"""
+    hashes = shingles(text)
+    signature = array("I")
+    for a, b in _PERMUTATIONS:
+        signature.append(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes))
+    return signature
+
+
+def signature_to_bytes(signature: array) -> bytes:
+    return signature.tobytes()
+
+
+def signature_from_bytes(data: bytes) -> array:
+    signature = array("I")
+    signature.frombytes(data)
+    return signature
+
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def lsh_buckets(signature: array) -> list[int]:
+    """
+    Ключи LSH-корзин: по одной на каждую полосу (band) из ROWS значений
+
+    Номер полосы входит в хэш, поэтому все корзины можно хранить в одной колонке.
+    Возвращает знаковые int64 (BigInteger в Postgres).
+    """
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
@@ -0,0 +1,141 @@
+"""
+Склейка Ogg Opus потоков без перекодирования (см. concat_ogg_opus)
+
+Известное ограничение: end-trim частей не переносится. В Ogg Opus
+обрезка хвоста задается только granule position последней страницы
+потока, а внутри склеенного потока ее выразить нельзя. Поэтому у всех
+частей, кроме последней, хвостовые сэмплы последнего пакета (до 20 мс
+тишины кодека) остаются, а granule position следующих частей отстает
+от числа декодированных сэмплов на эту величину. Длительность по
+заголовку выходит чуть меньше реальной.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Union
+
+# Заголовок страницы Ogg (RFC 3533): capture pattern, версия, флаги, granule position,
+# serial, номер страницы, CRC, число сегментов
+_PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+
+_FLAG_BOS = 0x02
+_FLAG_EOS = 0x04
+
+
+# Полином Ogg 0x04C11DB7 без отражения битов - это отраженный полином zlib (0xEDB88320),
+# поэтому CRC считаем в zlib по байтам с обратным порядком битов, а результат разворачиваем
+_REVERSED_BITS = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def ogg_crc(data: Union[bytes, bytearray]) -> int:
+    """CRC32 страницы Ogg (полином 0x04C11DB7, без отражения, начальное значение 0)"""
+    # Начальное значение 0xFFFFFFFF и финальный XOR отменяют инверсию внутри zlib.crc32
+    crc = zlib.crc32(data.translate(_REVERSED_BITS), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int.from_bytes(crc.to_bytes(4, "little").translate(_REVERSED_BITS), "big")
+
+
+@dataclass
+class OggPage:
+    flags: int
+    granule: int
+    serial: int
+    sequence: int
+    segments: bytes  # таблица сегментов (lacing values)
+    body: bytes
+
+    def to_bytes(self) -> bytes:
+        header = _PAGE_HEADER.pack(
+            b"OggS", 0, self.flags, self.granule, self.serial, self.sequence, 0, len(self.segments)
+        )
+        page = bytearray(header + self.segments + self.body)
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        return bytes(page)
+
+
+def parse_pages(data: bytes) -> list[OggPage]:
+    """Разобрать поток Ogg на страницы"""
+    pages = []
+    view = memoryview(data)
+    offset = 0
+    while offset < len(data):
+        if len(data) - offset < _PAGE_HEADER.size:
+            raise ValueError("Обрезанный заголовок страницы Ogg")
+        capture, version, flags, granule, serial, sequence, _crc, count = _PAGE_HEADER.unpack_from(data, offset)
+        if capture != b"OggS" or version != 0:
+            raise ValueError(f"Некорректная страница Ogg на смещении {offset}")
+        offset += _PAGE_HEADER.size
+        segments = bytes(view[offset:offset + count])
+        offset += count
+        body_size = sum(segments)
+        body = bytes(view[offset:offset + body_size])
+        if len(body) != body_size:
+            raise ValueError("Обрезанное тело страницы Ogg")
+        offset += body_size
+        pages.append(OggPage(flags, granule, serial, sequence, segments, body))
+    return pages
+
+
+def _header_page_count(pages: list[OggPage]) -> int:
+    """Сколько первых страниц занимают заголовки Opus (2 пакета: OpusHead и OpusTags)"""
+    packets = 0
+    for index, page in enumerate(pages):
+        # Пакет заканчивается на сегменте короче 255 байт
+        packets += sum(1 for lacing in page.segments if lacing < 255)
+        if packets >= 2:
+            return index + 1
+    return len(pages)
+
+
+def concat_ogg_opus(streams: list[bytes]) -> bytes:
+    """
+    Склеить несколько Ogg Opus потоков в один логический поток без перекодирования
+
+    Заголовки (OpusHead/OpusTags) берутся из первого потока, у остальных
+    отбрасываются; страницы аудио переносятся как есть, с общим serial,
+    сквозной нумерацией страниц и сдвигом granule position на длительность
+    предыдущих частей. Все части должны быть синтезированы с одинаковыми
+    параметрами (частота, число каналов). pre-skip следующих частей
+    не вырезается, end-trim предыдущих не переносится (см. docstring
+    модуля) - на стыке остаются несколько миллисекунд тишины кодека.
+    """
+    if len(streams) == 1:
+        return streams[0]
+
+    output = []
+    serial = None
+    sequence = 0
+    granule_offset = 0
+    last_page = None
+
+    for index, stream in enumerate(streams):
+        pages = parse_pages(stream)
+        if not pages:
+            continue
+        if serial is None:
+            serial = pages[0].serial
+
+        header_pages = _header_page_count(pages)
+        stream_granule = 0
+        for page_index, page in enumerate(pages):
+            is_header = page_index < header_pages
+            if index > 0 and is_header:
+                # Заголовки второй и следующих частей не нужны
+                continue
+
+            granule = page.granule
+            if granule != -1 and not is_header:
+                stream_granule = granule
+                granule += granule_offset
+
+            flags = page.flags & ~_FLAG_EOS
+            if index > 0:
+                flags &= ~_FLAG_BOS
+            last_page = OggPage(flags, granule, serial, sequence, page.segments, page.body)
+            output.append(last_page)
+            sequence += 1
+
+        granule_offset += stream_granule
+
+    if last_page is not None:
+        last_page.flags |= _FLAG_EOS
+    return b"".join(page.to_bytes() for page in output)
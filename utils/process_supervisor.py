@@ -0,0 +1,324 @@
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import signal
+import time
+from typing import Callable, Optional
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+# Дочерние процессы запускаются через spawn: без унаследованного цикла событий,
+# соединений и пулов родителя
+_mp = multiprocessing.get_context("spawn")
+
+
+def available_cpus() -> int:
+    """Сколько CPU доступно процессу: с учетом affinity и лимита cgroup (docker --cpus)"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        # cgroup v2: "<квота> <период>" или "max <период>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                cpus = min(cpus, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+    return max(1, cpus)
+
+
+def processes_from_env(name: str = "WORKER_PROCESSES", default: str = "auto") -> int:
+    """Число процессов из окружения: целое или auto (по числу доступных CPU)"""
+    value = os.environ.get(name, default).strip().lower()
+    if value in ("auto", "0"):
+        return available_cpus()
+    return max(1, int(value))
+
+
+def _flatten(stats: dict, prefix: str = "") -> list[tuple[str, float]]:
+    """Вложенный словарь счетчиков -> [(имя_метрики, число)], нечисловые значения пропускаются"""
+    items = []
+    for key, value in stats.items():
+        name = re.sub(r"[^a-zA-Z0-9_]", "_", f"{prefix}{key}")
+        if isinstance(value, dict):
+            items.extend(_flatten(value, f"{name}_"))
+        elif isinstance(value, (int, float)):
+            items.append((name, float(value)))
+    return items
+
+
+class _Child:
+    """Состояние одного дочернего процесса"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0  # падений подряд, от них зависит пауза перед перезапуском
+        self.restart_at: Optional[float] = None
+        self.stats: dict = {}
+        self.stats_at: Optional[float] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class _ChildrenCollector:
+    """Сводные метрики Prometheus по всем дочерним процессам (метка worker - номер процесса)"""
+
+    def __init__(self, supervisor: "ProcessSupervisor"):
+        self.supervisor = supervisor
+
+    def collect(self):
+        prefix = self.supervisor.name
+        alive = GaugeMetricFamily(f"{prefix}_process_alive", "Процесс жив", labels=["worker"])
+        restarts = GaugeMetricFamily(f"{prefix}_process_restarts", "Перезапусков процесса", labels=["worker"])
+        families: dict[str, GaugeMetricFamily] = {}
+        for child in self.supervisor.children:
+            label = [str(child.index)]
+            alive.add_metric(label, 1.0 if child.alive else 0.0)
+            restarts.add_metric(label, float(child.restarts))
+            for name, value in _flatten(child.stats):
+                if name not in families:
+                    families[name] = GaugeMetricFamily(f"{prefix}_{name}", name, labels=["worker"])
+                families[name].add_metric(label, value)
+        yield alive
+        yield restarts
+        yield from families.values()
+
+
+class _LocalCollector:
+    """Метрики одиночного процесса в том же виде, что и у супервизора (метка worker="0")"""
+
+    def __init__(self, name: str, stats: Callable[[], dict]):
+        self.name = name
+        self.stats = stats
+
+    def collect(self):
+        label = ["0"]
+        alive = GaugeMetricFamily(f"{self.name}_process_alive", "Процесс жив", labels=["worker"])
+        alive.add_metric(label, 1.0)
+        yield alive
+        for name, value in _flatten(self.stats()):
+            family = GaugeMetricFamily(f"{self.name}_{name}", name, labels=["worker"])
+            family.add_metric(label, value)
+            yield family
+
+
+async def _start_http(port: int, handle_health, handle_metrics) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    return runner
+
+
+async def serve_metrics(port: int, stats: Callable[[], dict], name: str = "worker") -> web.AppRunner:
+    """
+    /health и /metrics одиночного процесса (без супервизора)
+
+    Имена метрик те же, что у ProcessSupervisor, поэтому Prometheus
+    опрашивает один и тот же адрес при любом числе процессов.
+    Вызывающий останавливает сервер через runner.cleanup().
+    """
+    registry = CollectorRegistry()
+    registry.register(_LocalCollector(name, stats))
+
+    async def handle_health(request: web.Request) -> web.Response:
+        health = {"processes": 1, "alive": 1, "children": [{"index": 0, "pid": os.getpid(), "alive": True, "stats": stats()}]}
+        return web.Response(text=json.dumps(health, ensure_ascii=False), content_type="application/json")
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(body=generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+    runner = await _start_http(port, handle_health, handle_metrics)
+    print(f"[{name}] /health и /metrics на порту {port}")
+    return runner
+
+
+class ProcessSupervisor:
+    """
+    Запускает N копий процесса и следит за ними
+
+    target(index, stats_queue) вызывается в каждом дочернем процессе
+    (у каждого свой цикл событий и свои соединения). Упавший процесс
+    перезапускается с экспоненциальной паузой; если перед падением он
+    проработал дольше restart_reset секунд, пауза сбрасывается.
+    SIGTERM/SIGINT пересылаются детям как SIGTERM (они дорабатывают начатое),
+    через drain_timeout оставшиеся убиваются.
+
+    Дети периодически кладут свои счетчики в stats_queue (словарь
+    {"index": ..., "stats": {...}}); сводка отдается по HTTP:
+    /health - JSON по процессам (503, если кто-то не жив),
+    /metrics - метрики Prometheus с меткой worker.
+    """
+
+    def __init__(
+        self,
+        target: Callable[[int, multiprocessing.Queue], None],
+        processes: int,
+        name: str = "worker",
+        restart_base_delay: float = 1.0,
+        restart_max_delay: float = 60.0,
+        restart_reset: float = 60.0,
+        drain_timeout: float = 30.0,
+        metrics_port: int = 0
+    ):
+        """
+        Args:
+            target: Функция дочернего процесса (должна импортироваться по имени модуля)
+            processes: Сколько процессов держать запущенными
+            name: Префикс метрик и имен процессов
+            restart_base_delay: Пауза перед первым перезапуском, секунды
+            restart_max_delay: Максимальная пауза перед перезапуском
+            restart_reset: После скольких секунд работы падение не считается повторным
+            drain_timeout: Сколько ждать детей после SIGTERM
+            metrics_port: Порт /health и /metrics (0 - не поднимать)
+        """
+        self.target = target
+        self.name = name
+        self.restart_base_delay = restart_base_delay
+        self.restart_max_delay = restart_max_delay
+        self.restart_reset = restart_reset
+        self.drain_timeout = drain_timeout
+        self.metrics_port = metrics_port
+
+        self.children = [_Child(index) for index in range(processes)]
+        self.stats_queue = _mp.Queue()
+        self._stopping = asyncio.Event()
+
+        self.registry = CollectorRegistry()
+        self.registry.register(_ChildrenCollector(self))
+
+    def _start(self, child: _Child) -> None:
+        child.process = _mp.Process(
+            target=self.target,
+            args=(child.index, self.stats_queue),
+            name=f"{self.name}-{child.index}"
+        )
+        child.process.start()
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        print(f"[Supervisor] {self.name}-{child.index} запущен, pid {child.process.pid}")
+
+    def _check(self, child: _Child) -> None:
+        """Заметить упавший процесс и запланировать/выполнить перезапуск"""
+        now = time.monotonic()
+        if child.restart_at is not None:
+            if now >= child.restart_at:
+                child.restarts += 1
+                self._start(child)
+            return
+        if child.alive:
+            return
+
+        if now - child.started_at > self.restart_reset:
+            child.failures = 0
+        delay = min(self.restart_max_delay, self.restart_base_delay * 2 ** child.failures)
+        child.failures += 1
+        child.restart_at = now + delay
+        print(
+            f"[Supervisor] {self.name}-{child.index} завершился с кодом {child.process.exitcode}, "
+            f"перезапуск через {delay:.1f} с"
+        )
+
+    def _collect_stats(self) -> None:
+        while True:
+            try:
+                item = self.stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            child = self.children[item["index"]]
+            child.stats = item["stats"]
+            child.stats_at = time.monotonic()
+
+    def health(self) -> dict:
+        now = time.monotonic()
+        return {
+            "processes": len(self.children),
+            "alive": sum(1 for child in self.children if child.alive),
+            "children": [
+                {
+                    "index": child.index,
+                    "pid": child.process.pid if child.process is not None else None,
+                    "alive": child.alive,
+                    "uptime": round(now - child.started_at) if child.alive else None,
+                    "restarts": child.restarts,
+                    "stats_age": None if child.stats_at is None else round(now - child.stats_at),
+                    "stats": child.stats,
+                }
+                for child in self.children
+            ],
+        }
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        health = self.health()
+        status = 200 if health["alive"] == health["processes"] else 503
+        return web.Response(text=json.dumps(health, ensure_ascii=False), status=status, content_type="application/json")
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=generate_latest(self.registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+    async def _serve_metrics(self) -> Optional[web.AppRunner]:
+        if not self.metrics_port:
+            return None
+        runner = await _start_http(self.metrics_port, self._handle_health, self._handle_metrics)
+        print(f"[Supervisor] /health и /metrics на порту {self.metrics_port}")
+        return runner
+
+    async def _drain(self) -> None:
+        """Переслать SIGTERM детям и дождаться их (не дольше drain_timeout)"""
+        for child in self.children:
+            if child.alive:
+                os.kill(child.process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout
+        while any(child.alive for child in self.children) and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        for child in self.children:
+            if child.alive:
+                print(f"[Supervisor] {self.name}-{child.index} не завершился за {self.drain_timeout} с, kill")
+                child.process.kill()
+            if child.process is not None:
+                child.process.join()
+
+    async def run(self) -> None:
+        """Запустить процессы и следить за ними до SIGTERM/SIGINT"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        runner = await self._serve_metrics()
+        for child in self.children:
+            self._start(child)
+        try:
+            while not self._stopping.is_set():
+                self._collect_stats()
+                for child in self.children:
+                    self._check(child)
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+            print(f"[Supervisor] Остановка, ждем процессы (до {self.drain_timeout} с)")
+            await self._drain()
+        finally:
+            if runner is not None:
+                await runner.cleanup()
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket: не больше rate запросов в секунду со всплеском до capacity"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        # Токены копятся не выше capacity, а запрос тратит целый токен:
+        # при capacity < 1 acquire ждал бы вечно
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    Token bucket с подстройкой скорости по ответам сервера (AIMD)
+
+    Пока запросы проходят, скорость растет на increase_step в секунду
+    (не выше max_rate); при троттлинге (429/5xx) умножается на decrease_factor
+    (не ниже min_rate), не чаще раза в decrease_cooldown - иначе пачка
+    ответов на уже отправленные запросы обрушила бы скорость до минимума.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        min_rate: float = 1.0,
+        max_rate: float | None = None,
+        increase_step: float = 1.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0
+    ):
+        """
+        Args:
+            rate: Начальная скорость, запросов в секунду
+            capacity: Всплеск
+            min_rate: Нижняя граница скорости
+            max_rate: Верхняя граница скорости (квота), по умолчанию - rate
+            increase_step: Прирост скорости за секунду успешных запросов
+            decrease_factor: Во сколько раз снижать скорость при троттлинге
+            decrease_cooldown: Не снижать скорость чаще, чем раз в столько секунд
+        """
+        super().__init__(rate, capacity)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._increased_at = time.monotonic()
+        self._decreased_at = 0.0
+
+        # Счетчики
+        self.acquired = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def acquire(self) -> None:
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await super().acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.monotonic() - started
+        self.acquired += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def on_success(self) -> None:
+        """Запрос прошел: аддитивно увеличиваем скорость"""
+        now = time.monotonic()
+        elapsed = now - self._increased_at
+        self._increased_at = now
+        self.rate = min(self.max_rate, self.rate + self.increase_step * min(elapsed, 1.0))
+
+    def on_throttle(self) -> None:
+        """Сервер ответил 429/5xx: мультипликативно снижаем скорость"""
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._decreased_at < self.decrease_cooldown:
+            return
+        self._decreased_at = now
+        self._increased_at = now
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+    def stats(self) -> dict:
+        """Текущее состояние лимитера и время ожидания в очереди"""
+        return {
+            "rate": round(self.rate, 2),
+            "max_rate": self.max_rate,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "avg_wait_ms": round(self.wait_total * 1000 / self.acquired, 2) if self.acquired else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+        }
@@ -0,0 +1,53 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Экспоненциальная задержка с полным джиттером: random(0, min(max, base * 2^attempt))"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def retry_with_backoff(
+    fn: Callable[[], Awaitable[T]],
+    is_retryable: Callable[[Exception], bool],
+    retries: int = 3,
+    base_delay: float = 0.2,
+    max_delay: float = 5.0,
+    deadline: Optional[float] = None,
+    retry_after: Callable[[Exception], Optional[float]] = lambda e: None,
+    on_retry: Optional[Callable[[Exception, float], None]] = None
+) -> T:
+    """
+    Выполнить fn() с повторами при временных ошибках
+
+    Args:
+        fn: Вызов (должен быть идемпотентным)
+        is_retryable: Можно ли повторить после этого исключения
+        retries: Сколько раз повторять (всего попыток - retries + 1)
+        base_delay: Базовая задержка в секундах
+        max_delay: Максимальная задержка в секундах
+        deadline: Момент time.monotonic(), после которого повторов не будет
+        retry_after: Задержка, которую просит сервер (Retry-After), если есть
+        on_retry: Колбэк перед повтором (исключение, задержка)
+    """
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            server_delay = retry_after(e)
+            if server_delay is not None:
+                delay = max(delay, server_delay)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise
+            if on_retry is not None:
+                on_retry(e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,207 @@
+import math
+import random
+import struct
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+# Форматы сериализации
+_SPARSE = b"A"  # отсортированный массив uint32 - 4 байта на анекдот
+_DENSE = b"B"  # битовая карта по id - 1 бит на каждый id до максимального
+_WITH_CURSORS = b"C"  # множество (A или B) + сохраненные обходы непросмотренных
+
+# Обход: offset, stride, size, position, total, last_id (за ним - длина и ключ)
+_CURSOR = struct.Struct("<6Q")
+# Длина ключа обхода None (все анекдоты)
+_NO_KEY = 0xFFFF
+
+
+class UnseenCursor:
+    """
+    Обход позиций 0..total-1 в псевдослучайном порядке
+
+    Первые size позиций идут в порядке (offset + stride * i) mod size:
+    stride взаимно прост с size, поэтому каждая позиция встречается ровно
+    один раз. Позиции анекдотов, добавленных после начала обхода
+    (size..total-1), идут следом по порядку. Хранится в SeenSet
+    пользователя, и за полный круг анекдотов суммарно проходится не больше
+    total позиций.
+
+    Обход привязан к версии списка id: его длине в начале обхода и id
+    на последней позиции (last_id). Новые анекдоты дописываются в конец
+    отсортированного списка и версию не меняют; удаление или смена
+    категории сдвигают позиции - тогда обход начинается заново.
+    """
+
+    def __init__(self, size: int, last_id: int):
+        self.size = size
+        self.total = size
+        self.last_id = last_id
+        self.offset = random.randrange(size)
+        self.stride = 1
+        if size > 2:
+            self.stride = random.randrange(1, size)
+            while math.gcd(self.stride, size) != 1:
+                self.stride = random.randrange(1, size)
+        self.position = 0
+
+    def matches(self, ids) -> bool:
+        """Подходит ли обход к текущему списку id (тот же префикс, возможно с новыми в конце)"""
+        return len(ids) >= self.size and ids[self.size - 1] == self.last_id
+
+    def grow(self, total: int) -> None:
+        """Добавить в обход позиции новых анекдотов"""
+        self.total = max(self.total, total)
+
+    def next_index(self) -> Optional[int]:
+        if self.position >= self.total:
+            return None
+        if self.position < self.size:
+            index = (self.offset + self.stride * self.position) % self.size
+        else:
+            index = self.position
+        self.position += 1
+        return index
+
+    def pack(self) -> bytes:
+        return _CURSOR.pack(self.offset, self.stride, self.size, self.position, self.total, self.last_id)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "UnseenCursor":
+        cursor = cls.__new__(cls)
+        (cursor.offset, cursor.stride, cursor.size, cursor.position,
+         cursor.total, cursor.last_id) = _CURSOR.unpack(data)
+        return cursor
+
+
+class SeenSet:
+    """
+    Компактное множество id анекдотов, которые пользователь уже видел
+
+    Как контейнеры в roaring bitmap: пока id мало, хранится отсортированный
+    массив uint32, когда массив становится больше битовой карты - переходим
+    на битовую карту. Если битовая карта из-за большого id стала бы больше
+    массива - возвращаемся к массиву. Проверка принадлежности - O(log n) / O(1).
+    """
+
+    def __init__(self, ids: Iterable[int] = ()):
+        self._sparse = array("I", sorted(set(ids)))
+        self._bitmap: bytearray | None = None
+        self._count = len(self._sparse)
+        # Обходы непросмотренных (JokeService._pick_id) по ключу-категории, сбрасываются в clear()
+        self.cursors: dict[Optional[str], UnseenCursor] = {}
+        self._maybe_densify()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, joke_id: int) -> bool:
+        if self._bitmap is not None:
+            byte = joke_id >> 3
+            return byte < len(self._bitmap) and bool(self._bitmap[byte] & (1 << (joke_id & 7)))
+        i = bisect_left(self._sparse, joke_id)
+        return i < len(self._sparse) and self._sparse[i] == joke_id
+
+    def add(self, joke_id: int) -> None:
+        """Отметить анекдот как просмотренный"""
+        if joke_id in self:
+            return
+        self._count += 1
+        if self._bitmap is not None:
+            byte = joke_id >> 3
+            if byte >= len(self._bitmap):
+                if byte + 1 > self._count * 4:
+                    # Битовая карта стала бы больше массива - возвращаемся к массиву
+                    self._sparsify()
+                    self._sparse.insert(bisect_left(self._sparse, joke_id), joke_id)
+                    return
+                self._bitmap.extend(bytes(byte + 1 - len(self._bitmap)))
+            self._bitmap[byte] |= 1 << (joke_id & 7)
+            return
+        self._sparse.insert(bisect_left(self._sparse, joke_id), joke_id)
+        self._maybe_densify()
+
+    def clear(self) -> None:
+        """Начать заново (пользователь посмотрел все анекдоты)"""
+        self._sparse = array("I")
+        self._bitmap = None
+        self._count = 0
+        self.cursors = {}
+
+    def _maybe_densify(self) -> None:
+        """Перейти на битовую карту, если она уже меньше массива"""
+        if self._bitmap is not None or not self._sparse:
+            return
+        bitmap_size = (self._sparse[-1] >> 3) + 1
+        if bitmap_size >= len(self._sparse) * self._sparse.itemsize:
+            return
+        bitmap = bytearray(bitmap_size)
+        for joke_id in self._sparse:
+            bitmap[joke_id >> 3] |= 1 << (joke_id & 7)
+        self._bitmap = bitmap
+        self._sparse = array("I")
+
+    def _sparsify(self) -> None:
+        """Перейти с битовой карты на отсортированный массив"""
+        sparse = array("I")
+        for byte_index, byte in enumerate(self._bitmap):
+            while byte:
+                low = byte & -byte
+                sparse.append((byte_index << 3) + low.bit_length() - 1)
+                byte ^= low
+        self._sparse = sparse
+        self._bitmap = None
+
+    def to_bytes(self) -> bytes:
+        """Сериализация для хранения в bytea (вместе с обходами непросмотренных)"""
+        if self._bitmap is not None:
+            data = _DENSE + bytes(self._bitmap)
+        else:
+            data = _SPARSE + self._sparse.tobytes()
+        if not self.cursors:
+            return data
+
+        # Обходы - перед множеством: оно занимает весь остаток
+        parts = [_WITH_CURSORS, len(self.cursors).to_bytes(2, "little")]
+        for key, cursor in self.cursors.items():
+            encoded = b"" if key is None else key.encode("utf-8")
+            parts.append(cursor.pack())
+            parts.append((_NO_KEY if key is None else len(encoded)).to_bytes(2, "little"))
+            parts.append(encoded)
+        parts.append(data)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | None) -> "SeenSet":
+        """Десериализация из bytea"""
+        seen = cls()
+        if not data:
+            return seen
+        cursors = {}
+        if data[:1] == _WITH_CURSORS:
+            count = int.from_bytes(data[1:3], "little")
+            offset = 3
+            for _ in range(count):
+                cursor = UnseenCursor.unpack(data[offset:offset + _CURSOR.size])
+                offset += _CURSOR.size
+                key_size = int.from_bytes(data[offset:offset + 2], "little")
+                offset += 2
+                if key_size == _NO_KEY:
+                    key = None
+                else:
+                    key = data[offset:offset + key_size].decode("utf-8")
+                    offset += key_size
+                cursors[key] = cursor
+            data = data[offset:]
+        kind, payload = data[:1], data[1:]
+        if kind == _DENSE:
+            seen._bitmap = bytearray(payload)
+            seen._count = int.from_bytes(payload, "little").bit_count()
+        elif kind == _SPARSE:
+            seen._sparse = array("I")
+            seen._sparse.frombytes(payload)
+            seen._count = len(seen._sparse)
+        else:
+            raise ValueError(f"Unknown seen set format: {kind!r}")
+        seen.cursors = cursors
+        return seen
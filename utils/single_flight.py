@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    """Общий вызов: задача с fn() и число тех, кто ждет ее результат"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Схлопывание одинаковых одновременных вызовов
+
+    Пока вызов с ключом key выполняется, остальные вызовы с тем же ключом
+    не запускают свой, а ждут результат (или исключение) первого.
+    После завершения ключ освобождается - следующий вызов пойдет заново.
+
+    fn() выполняется в отдельной задаче, и все вызывающие (первый тоже)
+    ждут ее через shield: отмена любого из них не затрагивает остальных.
+    Общий вызов отменяется, только когда его результат не ждет никто.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, _Call] = {}
+
+        # Счетчики
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнить fn() или дождаться уже идущего вызова с тем же ключом"""
+        self.calls += 1
+        call = self._in_flight.get(key)
+        if call is None:
+            call = self._start(key, fn)
+        else:
+            self.collapsed += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Результат больше никому не нужен - отменяем и освобождаем ключ,
+                # чтобы следующий вызов не получил чужую отмену
+                call.task.cancel()
+                if self._in_flight.get(key) is call:
+                    del self._in_flight[key]
+
+    def _start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> _Call:
+        call = _Call(asyncio.ensure_future(fn()))
+        self._in_flight[key] = call
+
+        def on_done(task: asyncio.Future) -> None:
+            if self._in_flight.get(key) is call:
+                del self._in_flight[key]
+            if not task.cancelled():
+                # Исключение уже получили ждущие (или никто не ждал) - не пишем "never retrieved"
+                task.exception()
+
+        call.task.add_done_callback(on_done)
+        return call
+
+    def stats(self) -> dict:
+        """Счетчики: всего вызовов, схлопнуто, выполняется сейчас"""
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "in_flight": len(self._in_flight),
+        }
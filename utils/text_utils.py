@@ -0,0 +1,103 @@
+import hashlib
+import re
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_joke_text(text: str) -> str:
+    """
+    Нормализует текст анекдота для поиска дублей
+
+    Нижний регистр, ё -> е, вся пунктуация и пробелы схлопываются в один пробел.
+    """
+    text = text.lower().replace("ё", "е")
+    return _NON_WORD_RE.sub(" ", text).strip()
+
+
+def joke_text_hash(text: str) -> str:
+    """sha256 от нормализованного текста анекдота (hex)"""
+    return hashlib.sha256(normalize_joke_text(text).encode("utf-8")).hexdigest()
+
+
+# Границы, по которым режем текст для синтеза: сначала конец предложения/строки, затем паузы внутри
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+_CLAUSE_END_RE = re.compile(r"(?<=[,;:—])\s+")
+
+
+def _split_long(piece: str, max_chars: int) -> list[str]:
+    """Разрезать слишком длинное предложение: по запятым, затем по пробелам, затем жестко"""
+    for pattern in (_CLAUSE_END_RE, re.compile(r"\s+")):
+        parts = [part for part in pattern.split(piece) if part]
+        if len(parts) > 1:
+            return _pack(parts, max_chars)
+    return [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+
+
+def _pack(parts: list[str], max_chars: int) -> list[str]:
+    """Жадно собрать части в куски не длиннее max_chars"""
+    chunks = []
+    current = ""
+    for part in parts:
+        if len(part) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split_long(part, max_chars))
+        elif not current:
+            current = part
+        elif len(current) + 1 + len(part) <= max_chars:
+            current = f"{current} {part}"
+        else:
+            chunks.append(current)
+            current = part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text_for_tts(text: str, max_chars: int) -> list[str]:
+    """
+    Разбивает текст на куски для синтеза речи, не длиннее max_chars
+
+    Режет по границам предложений, длинные предложения - по запятым и
+    пробелам, слово длиннее max_chars - жестко. Порядок текста сохраняется.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    sentences = [sentence for sentence in _SENTENCE_END_RE.split(text) if sentence.strip()]
+    return _pack([sentence.strip() for sentence in sentences], max_chars)
+
+
+def _utf16_len(text: str) -> int:
+    """Длина в кодовых единицах UTF-16 - так Telegram считает длину сообщения"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _truncate(text: str, max_units: int) -> str:
+    """Обрезать текст до max_units единиц UTF-16, обрезанный заканчивается на «…»"""
+    if _utf16_len(text) <= max_units:
+        return text
+    text = text[:max_units - 1]
+    while text and _utf16_len(text) > max_units - 1:
+        text = text[:-1]
+    return text.rstrip() + "…"
+
+
+def join_within_limit(texts: list[str], separator: str, max_units: int) -> str:
+    """
+    Склеить тексты через separator так, чтобы результат уложился в max_units
+
+    Короткие тексты остаются целиком, длинные обрезаются поровну
+    остатком лимита. Длина считается в единицах UTF-16, как в Telegram.
+    """
+    budget = max_units - _utf16_len(separator) * max(0, len(texts) - 1)
+    fitted = {}
+    remaining = len(texts)
+    # От коротких к длинным: недобранное короткими достается длинным
+    for index in sorted(range(len(texts)), key=lambda i: _utf16_len(texts[i])):
+        share = budget // remaining
+        fitted[index] = _truncate(texts[index], share)
+        budget -= _utf16_len(fitted[index])
+        remaining -= 1
+    return separator.join(fitted[index] for index in range(len(texts)))
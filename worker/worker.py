@@ -1,19 +1,73 @@
 import os
 import json
 import asyncio
+import signal
+import time
 import aio_pika
 import uuid
-from db.database import Database
+from db.database import Database, db_stats
+from db.engine import dispose_engines
 from services.task_service import TaskService
+from services.result_transport import DEADLINE_HEADER, build_result_message
 from models.user import SYSTEM_USER_ID
 from models.task_types import RabbitMQQueueEnum
+from utils.http_client import close_http_session, get_http_session
+from utils.process_supervisor import ProcessSupervisor, processes_from_env, serve_metrics
 from utils.utils import log_debug
 
-# Инициализация сервисов
-task_service = TaskService()
+# Сервисы создаются в main() - в том процессе, который обрабатывает задачи
+# (супервизору и повторному импорту модуля в дочерних процессах они не нужны)
+task_service: TaskService = None
 
-async def main():
-    """Основная функция воркера"""
+# Как часто писать счетчики воркера в лог (секунды, 0 - не писать)
+WORKER_STATS_INTERVAL = float(os.environ.get("WORKER_STATS_INTERVAL", "60"))
+
+# Счетчики задач этого процесса
+task_counters = {"in_flight": 0, "processed": 0, "failed": 0, "expired": 0, "requeued": 0}
+
+
+def worker_stats() -> dict:
+    """Счетчики задач воркера и сервисов (схлопнутые запросы, кэш TTS, SpeechKit, БД)"""
+    return {"tasks": dict(task_counters), **task_service.ai_service.stats(), **db_stats()}
+
+
+async def report_stats(db: Database):
+    """Периодически пишет в лог счетчики воркера"""
+    while True:
+        await asyncio.sleep(WORKER_STATS_INTERVAL)
+        await db.log(SYSTEM_USER_ID, "WORKER_STATS", json.dumps(worker_stats()), print_log=True)
+
+
+async def publish_stats(index: int, stats_queue):
+    """Периодически отдает счетчики супервизору (режим нескольких процессов)"""
+    while True:
+        stats_queue.put({"index": index, "stats": worker_stats()})
+        await asyncio.sleep(WORKER_METRICS_INTERVAL)
+
+# Сколько задач обрабатываем одновременно и сколько сообщений брокер выдает вперед
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "8"))
+WORKER_PREFETCH = int(os.environ.get("WORKER_PREFETCH", str(WORKER_CONCURRENCY)))
+# Сколько секунд при остановке ждем завершения начатых задач
+WORKER_DRAIN_TIMEOUT = float(os.environ.get("WORKER_DRAIN_TIMEOUT", "30"))
+
+# Режим нескольких процессов: число процессов (auto - по числу CPU), порт /health и /metrics
+# супервизора (0 - не поднимать), как часто процессы отдают ему счетчики
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", "9100"))
+WORKER_MAX_PROCESSES = int(os.environ.get("WORKER_MAX_PROCESSES", "8"))
+WORKER_METRICS_INTERVAL = float(os.environ.get("WORKER_METRICS_INTERVAL", "5"))
+
+
+async def main(index: int = None, stats_queue=None):
+    """
+    Основная функция воркера
+
+    Args:
+        index: Номер процесса под супервизором (None - одиночный запуск)
+        stats_queue: Очередь multiprocessing для счетчиков супервизору
+    """
+    global task_service
+    if task_service is None:
+        task_service = TaskService()
     db = Database()
     
     # Подключаемся к RabbitMQ
@@ -21,41 +75,227 @@ async def main():
     connection = await aio_pika.connect_robust(os.environ["RABBITMQ_URL"])
     await db.log(SYSTEM_USER_ID, "WORKER_CONNECTED", "Connected to RabbitMQ", print_log=True)
     
-    # Создаем канал
+    # Создаем канал: брокер выдает не больше WORKER_PREFETCH неподтвержденных сообщений
     channel = await connection.channel()
-    await db.log(SYSTEM_USER_ID, "WORKER_CHANNEL", "Created channel", print_log=True)
+    await channel.set_qos(prefetch_count=WORKER_PREFETCH)
+    await db.log(SYSTEM_USER_ID, "WORKER_CHANNEL", f"Created channel, prefetch: {WORKER_PREFETCH}", print_log=True)
     
     # Объявляем очередь задач
     tasks_queue = await channel.declare_queue(RabbitMQQueueEnum.TASK_PROCESSING)
     await db.log(SYSTEM_USER_ID, "WORKER_QUEUES", f"Declared queue: {RabbitMQQueueEnum.TASK_PROCESSING}", print_log=True)
     
-    # Обработка сообщений
-    async with tasks_queue.iterator() as queue_iter:
-        await db.log(SYSTEM_USER_ID, "WORKER_READY", "Ready to process tasks", print_log=True)
-        async for message in queue_iter:
-            async with message.process():
-                # Получаем задачу
-                task = json.loads(message.body.decode())
-                await db.log(SYSTEM_USER_ID, "TASK_RECEIVED", f"Received task: {task}", print_log=True)
-                
+    # Общая HTTP-сессия для SpeechKit/IAM/Telegram живет столько же, сколько воркер
+    get_http_session()
+
+    # SIGTERM/SIGINT: перестаем брать новые задачи и дожидаемся начатых
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    background = []
+    if WORKER_STATS_INTERVAL > 0:
+        background.append(asyncio.create_task(report_stats(db)))
+    metrics_runner = None
+    if stats_queue is not None:
+        background.append(asyncio.create_task(publish_stats(index, stats_queue)))
+    elif WORKER_METRICS_PORT:
+        # Без супервизора /metrics отдает сам процесс - на том же порту и с теми же метриками
+        metrics_runner = await serve_metrics(WORKER_METRICS_PORT, worker_stats)
+    try:
+        await consume(db, channel, tasks_queue, stop_event, concurrency=WORKER_CONCURRENCY)
+    finally:
+        for background_task in background:
+            background_task.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await task_service.ai_service.speech_service.close()
+        # Дописываем буферизованные логи перед выходом
+        await db.close()
+        await dispose_engines()
+        await close_http_session()
+        await connection.close()
+
+async def consume(
+    db: Database,
+    channel: aio_pika.abc.AbstractChannel,
+    tasks_queue: aio_pika.abc.AbstractQueue,
+    stop_event: asyncio.Event,
+    concurrency: int = WORKER_CONCURRENCY,
+    drain_timeout: float = WORKER_DRAIN_TIMEOUT
+):
+    """
+    Обработка сообщений из очереди задач, до concurrency задач одновременно
+
+    Каждое сообщение обрабатывается в своей задаче asyncio и подтверждается
+    отдельно. После stop_event новые сообщения не принимаются, начатые
+    задачи дорабатываются (не дольше drain_timeout), а выданные брокером,
+    но не начатые, возвращаются в очередь.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    in_flight: set[asyncio.Task] = set()
+
+    async def on_message(message: aio_pika.abc.AbstractIncomingMessage) -> None:
+        task = asyncio.create_task(handle_message(db, channel, message, semaphore, stop_event))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    consumer_tag = await tasks_queue.consume(on_message)
+    await db.log(SYSTEM_USER_ID, "WORKER_READY", f"Ready to process tasks, concurrency: {concurrency}", print_log=True)
+
+    await stop_event.wait()
+
+    # Останавливаемся: новые сообщения не берем, начатые дорабатываем
+    await tasks_queue.cancel(consumer_tag)
+    await db.log(SYSTEM_USER_ID, "WORKER_DRAINING", f"Draining {len(in_flight)} tasks", print_log=True)
+    if in_flight:
+        done, pending = await asyncio.wait(set(in_flight), timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await db.log(SYSTEM_USER_ID, "WORKER_DRAIN_TIMEOUT", f"Cancelled {len(pending)} tasks", print_log=True)
+    await db.log(SYSTEM_USER_ID, "WORKER_STOPPED", "Worker stopped", print_log=True)
+
+async def handle_message(
+    db: Database,
+    channel: aio_pika.abc.AbstractChannel,
+    message: aio_pika.abc.AbstractIncomingMessage,
+    semaphore: asyncio.Semaphore,
+    stop_event: asyncio.Event
+):
+    """Обработка одного сообщения: задача, ответ в reply_to, подтверждение"""
+    async with semaphore:
+        if stop_event.is_set():
+            # Воркер останавливается - пусть задачу возьмет другой
+            await message.reject(requeue=True)
+            task_counters["requeued"] += 1
+            return
+
+        task_counters["in_flight"] += 1
+        try:
+            await process_message(db, channel, message)
+        finally:
+            task_counters["in_flight"] -= 1
+
+async def process_message(
+    db: Database,
+    channel: aio_pika.abc.AbstractChannel,
+    message: aio_pika.abc.AbstractIncomingMessage
+):
+    """Задача из сообщения -> результат в reply_to; сообщение подтверждается по выходу"""
+    # ignore_processed: отмененную задачу ниже уже вернули в очередь, повторно не отклоняем
+    published = False
+    async with message.process(ignore_processed=True):
+        try:
+            # Получаем задачу
+            task = json.loads(message.body.decode())
+            await db.log(SYSTEM_USER_ID, "TASK_RECEIVED", f"Received task: {task}", print_log=True)
+
+            # Дедлайн прошел - не тратим запрос к Yandex. RPC-клиент ответ уже не ждет,
+            # а клиенту без ожидания (очередь результатов) отвечаем ошибкой
+            deadline = (message.headers or {}).get(DEADLINE_HEADER)
+            if deadline is not None and time.time() > float(deadline):
+                await db.cancel_task(task["task_id"])
+                await db.log(SYSTEM_USER_ID, "TASK_EXPIRED", f"Task {task['task_id']} expired, skipping", print_log=True)
+                task_counters["expired"] += 1
+                result = {"status": "error", "message": "Не удалось обработать запрос вовремя, попробуйте позже", "task_id": task["task_id"]}
+            else:
                 # Обрабатываем задачу
-                result = await task_service.process_task(task)
-                
-                # Проверяем наличие адреса для ответа
-                reply_to = message.reply_to
-                if not reply_to:
-                    await db.log(SYSTEM_USER_ID, "ERROR", "No reply_to in message, cannot send result", print_log=True)
-                    continue
-                
-                # Отправляем результат в указанную очередь ответа
-                await channel.default_exchange.publish(
-                    aio_pika.Message(
-                        body=json.dumps(result).encode(),
-                        correlation_id=message.correlation_id
-                    ),
-                    routing_key=reply_to
-                )
-                await db.log(SYSTEM_USER_ID, "RESULT_SENT", f"Result sent to {reply_to} queue", print_log=True)
+                try:
+                    result = await task_service.process_task(task)
+                    if result is None:
+                        # Повторная доставка уже доставленной пользователю задачи - отвечать не нужно
+                        return
+                    task_counters["processed"] += 1
+                except Exception as e:
+                    task_counters["failed"] += 1
+                    # Ошибка одной задачи не должна останавливать воркер; клиенту - ответ с ошибкой
+                    await db.log(SYSTEM_USER_ID, "TASK_FAILED", f"Task {task['task_id']} failed: {e}", print_log=True)
+                    result = {"status": "error", "message": "Ошибка при обработке задачи", "task_id": task["task_id"]}
+        
+            # Проверяем наличие адреса для ответа
+            reply_to = message.reply_to
+            if not reply_to:
+                await db.log(SYSTEM_USER_ID, "ERROR", "No reply_to in message, cannot send result", print_log=True)
+                return
+        
+            # Отправляем результат в указанную очередь ответа
+            # (аудио в памяти уходит телом ответа или через хранилище блобов)
+            await channel.default_exchange.publish(
+                await build_result_message(result, message.correlation_id),
+                routing_key=reply_to
+            )
+            published = True
+            await db.log(SYSTEM_USER_ID, "RESULT_SENT", f"Result sent to {reply_to} queue", print_log=True)
+        except asyncio.CancelledError:
+            if published:
+                # Результат уже отправлен - задача выполнена, повторять ее не нужно
+                await message.ack()
+                raise
+            # Не успели за WORKER_DRAIN_TIMEOUT - возвращаем задачу в очередь, ее доделает другой воркер
+            await message.reject(requeue=True)
+            task_counters["requeued"] += 1
+            raise
+
+
+def configure_processes(requested: int) -> int:
+    """
+    Сколько процессов запускать и настройки для них (через окружение, его наследуют дочерние)
+
+    Число процессов ограничено только WORKER_MAX_PROCESSES (и минимальным пулом
+    в 2 соединения на процесс). Общий бюджет DB_POOL_SIZE + DB_MAX_OVERFLOW делится
+    между процессами: пул каждого - до WORKER_CONCURRENCY + 1 (соединение на задачу
+    и одно на логи/счетчики), а если бюджета не хватает, меньше - задачи держат
+    соединение только на время запроса к БД и при нехватке ждут его в пуле.
+    Квоты SpeechKit (SPEECHKIT_*_RATE, SPEECHKIT_MIN_RATE) делятся между процессами,
+    чтобы вместе они не превышали квоту; всплеск SPEECHKIT_BURST тоже, но не меньше
+    одного запроса на процесс.
+    """
+    budget = int(os.environ.get("DB_POOL_SIZE", "20")) + int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    max_overflow = 0
+
+    processes = min(requested, WORKER_MAX_PROCESSES, max(1, budget // 2))
+    if processes < requested:
+        print(
+            f"[Worker] Запрошено процессов: {requested}, запускаем {processes} "
+            f"(WORKER_MAX_PROCESSES={WORKER_MAX_PROCESSES}, бюджет соединений с БД {budget})"
+        )
+    if processes <= 1:
+        # Один процесс - как без супервизора, с общими DB_POOL_SIZE/DB_MAX_OVERFLOW
+        return 1
+
+    pool_size = min(WORKER_CONCURRENCY + 1, budget // processes)
+    if pool_size < WORKER_CONCURRENCY + 1:
+        print(
+            f"[Worker] Бюджет соединений с БД {budget} на {processes} процессов: "
+            f"пул процесса {pool_size} вместо {WORKER_CONCURRENCY + 1}"
+        )
+
+    os.environ["DB_POOL_SIZE"] = str(pool_size)
+    os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+    for name, default in (("SPEECHKIT_TTS_RATE", "40"), ("SPEECHKIT_STT_RATE", "40"),
+                          ("SPEECHKIT_MIN_RATE", "1")):
+        os.environ[name] = str(float(os.environ.get(name, default)) / processes)
+    # Всплеск меньше 1 не накопит ни одного токена - bucket ждал бы вечно
+    os.environ["SPEECHKIT_BURST"] = str(max(1.0, float(os.environ.get("SPEECHKIT_BURST", "5")) / processes))
+    return processes
+
+
+def run_worker_process(index: int, stats_queue) -> None:
+    """Точка входа дочернего процесса супервизора: свой цикл событий и свои соединения"""
+    asyncio.run(main(index, stats_queue))
+
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    processes = configure_processes(processes_from_env("WORKER_PROCESSES"))
+    if processes == 1:
+        asyncio.run(main())
+    else:
+        # Несколько процессов: супервизор перезапускает упавшие и пересылает им SIGTERM
+        supervisor = ProcessSupervisor(
+            run_worker_process,
+            processes,
+            drain_timeout=WORKER_DRAIN_TIMEOUT + 5,
+            metrics_port=WORKER_METRICS_PORT
+        )
+        asyncio.run(supervisor.run())